@@ -0,0 +1,126 @@
+"""
+Compare the psutil and /proc collector engines.
+
+For every engine the script runs a number of collection cycles (CPU, memory,
+processes and network - disks are collected the same way by both engines) and
+reports the CPU time spent per cycle and the memory allocated per cycle, then
+times every collector method on its own. The synthetic engine used by the
+load tests is measured too, so its cost can be told apart from the backend's.
+
+    python bench_collectors.py --cycles 50 --json collectors.json
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from procfs import procfs_available
+from synthetic import SyntheticCollector
+from system_info import SystemInfoCollector
+
+METHODS = ("get_cpu_usage", "get_memory_info", "get_disk_usage", "get_running_processes",
+           "get_network_stats")
+
+
+def make_collector(engine: str) -> SystemInfoCollector:
+    if engine == "synthetic":
+        return SyntheticCollector("http://localhost", 0)
+    return SystemInfoCollector("http://localhost", engine=engine)
+
+
+def run_cycle(collector: SystemInfoCollector):
+    collector.get_cpu_usage()
+    collector.get_memory_info()
+    collector.get_running_processes()
+    collector.get_network_stats()
+
+
+def bench_methods(collector: SystemInfoCollector, cycles: int) -> dict:
+    """Wall time of every collector method and of a whole snapshot, in microseconds."""
+    calls = {method: getattr(collector, method) for method in METHODS}
+    calls["collect_system_info"] = lambda: collector.collect_system_info(0)
+    result = {}
+    for name, call in calls.items():
+        call()
+        timings = []
+        for _ in range(cycles):
+            started = time.perf_counter()
+            call()
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        result[name] = {
+            "us_mean": sum(timings) / len(timings) * 1e6,
+            "us_p50": timings[len(timings) // 2] * 1e6,
+            "us_p99": timings[min(int(len(timings) * 0.99), len(timings) - 1)] * 1e6,
+        }
+    return result
+
+
+def bench_engine(engine: str, cycles: int) -> dict:
+    collector = make_collector(engine)
+    # Прогревочный цикл заполняет кэши процессов
+    run_cycle(collector)
+
+    cpu_times = []
+    for _ in range(cycles):
+        started = time.process_time()
+        run_cycle(collector)
+        cpu_times.append(time.process_time() - started)
+
+    tracemalloc.start()
+    allocated = []
+    for _ in range(min(cycles, 10)):
+        before = tracemalloc.take_snapshot()
+        run_cycle(collector)
+        after = tracemalloc.take_snapshot()
+        stats = after.compare_to(before, "filename")
+        allocated.append(sum(stat.size_diff for stat in stats if stat.size_diff > 0))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    cpu_times.sort()
+    return {
+        "engine": collector.engine,
+        "cycles": cycles,
+        "cpu_ms_mean": sum(cpu_times) / len(cpu_times) * 1000,
+        "cpu_ms_p50": cpu_times[len(cpu_times) // 2] * 1000,
+        "cpu_ms_max": cpu_times[-1] * 1000,
+        "allocated_kb_per_cycle": sum(allocated) / len(allocated) / 1024,
+        "peak_traced_kb": peak / 1024,
+        "methods": bench_methods(collector, cycles),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=50)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    engines = ["psutil"]
+    if procfs_available():
+        engines.append("procfs")
+    else:
+        print("/proc is not available, benchmarking psutil only")
+    engines.append("synthetic")
+
+    results = [bench_engine(engine, args.cycles) for engine in engines]
+
+    print(f"{'engine':<8} {'cpu ms/cycle':>13} {'p50 ms':>8} {'max ms':>8} {'alloc KB/cycle':>15} {'peak KB':>9}")
+    for result in results:
+        print(f"{result['engine']:<8} {result['cpu_ms_mean']:>13.2f} {result['cpu_ms_p50']:>8.2f} "
+              f"{result['cpu_ms_max']:>8.2f} {result['allocated_kb_per_cycle']:>15.1f} "
+              f"{result['peak_traced_kb']:>9.1f}")
+
+    print()
+    print(f"{'method':<22}" + "".join(f" {result['engine'] + ' p50 us':>16}" for result in results))
+    for method in results[0]["methods"]:
+        print(f"{method:<22}" + "".join(f" {result['methods'][method]['us_p50']:>16.1f}" for result in results))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import logging
+import os
+import select
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from fnmatch import fnmatch
+from math import ceil
+from typing import Dict, Iterable, List, Optional
+
+import psutil
+
+# Виртуальные и служебные файловые системы: места на диске они не занимают
+DEFAULT_EXCLUDE_FSTYPES = (
+    "autofs", "binfmt_misc", "bpf", "cgroup", "cgroup2", "configfs", "debugfs", "devpts", "devtmpfs",
+    "efivarfs", "fusectl", "hugetlbfs", "mqueue", "nsfs", "overlay", "proc", "pstore", "ramfs",
+    "rpc_pipefs", "securityfs", "selinuxfs", "squashfs", "sysfs", "tmpfs", "tracefs",
+)
+# Корень учитывается при любой файловой системе: в контейнере это overlay, в live-системе squashfs
+ROOT_MOUNT = "/"
+# Точки монтирования контейнеров и снапов дублируют диски хоста
+DEFAULT_EXCLUDE_MOUNTS = (
+    "/proc/*", "/sys/*", "/dev/*", "/run/*", "/snap/*",
+    "/var/lib/docker/*", "/var/lib/containers/*", "/var/lib/kubelet/*",
+)
+
+MOUNTS_FILE = "/proc/self/mounts"
+
+
+class MountTable:
+    """
+    Tells when the mount table may have changed.
+
+    On Linux the kernel flags /proc/self/mounts with POLLPRI on every mount
+    and unmount, so checking costs one non-blocking poll. Elsewhere the
+    partition list is simply re-read every ``refresh_interval`` seconds.
+    """
+
+    def __init__(self, refresh_interval: float = 300.0, path: str = MOUNTS_FILE):
+        self.refresh_interval = refresh_interval
+        self._poll = None
+        self._file = None
+        self._read_at: Optional[float] = None
+        if hasattr(select, "poll") and os.path.exists(path):
+            try:
+                self._file = open(path, "rb")
+                self._poll = select.poll()
+                self._poll.register(self._file, select.POLLPRI | select.POLLERR)
+            except OSError:
+                self._poll = None
+
+    def changed(self) -> bool:
+        if self._read_at is None:
+            return True
+        if self._poll is not None:
+            return bool(self._poll.poll(0))
+        return time.monotonic() - self._read_at >= self.refresh_interval
+
+    def mark_read(self):
+        self._read_at = time.monotonic()
+
+
+class DiskCollector:
+    """
+    Disk usage of the mounted filesystems that matter, without ever blocking
+    on a hung mount.
+
+    The filtered partition list is cached until the mount table changes.
+    ``disk_usage`` runs for every mount in a worker pool and a mount that
+    does not answer within ``timeout`` seconds is left out of this sample.
+    After ``quarantine_after`` timeouts in a row a mount is skipped for
+    ``quarantine_seconds`` and then tried once again. A thread stuck in a
+    hung statfs cannot be interrupted, so a mount is never submitted again
+    while its previous call is still running, and the pool is replaced when
+    all of its threads are stuck.
+    """
+
+    def __init__(self, timeout: float = 2.0, workers: int = 4,
+                 exclude_fstypes: Iterable[str] = DEFAULT_EXCLUDE_FSTYPES,
+                 exclude_mounts: Iterable[str] = DEFAULT_EXCLUDE_MOUNTS,
+                 quarantine_after: int = 3, quarantine_seconds: float = 600.0,
+                 mount_table: Optional[MountTable] = None):
+        self.timeout = timeout
+        self.workers = workers
+        self.exclude_fstypes = set(exclude_fstypes)
+        self.exclude_mounts = tuple(exclude_mounts)
+        self.quarantine_after = quarantine_after
+        self.quarantine_seconds = quarantine_seconds
+        self.mount_table = mount_table or MountTable()
+
+        self.mounts: List[str] = []
+        self._strikes: Dict[str, int] = {}
+        self._quarantined: Dict[str, float] = {}
+        self._running: Dict[str, Future] = {}
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="disk")
+        self._stuck = 0
+
+    def _excluded(self, partition) -> bool:
+        if partition.mountpoint == ROOT_MOUNT:
+            return False
+        if partition.fstype in self.exclude_fstypes:
+            return True
+        return any(partition.mountpoint == pattern.rstrip("/*") or fnmatch(partition.mountpoint, pattern)
+                   for pattern in self.exclude_mounts)
+
+    def refresh_mounts(self):
+        mounts, devices = [], set()
+        # Короткие пути первыми: из дублей (bind mount одного устройства) остается корневой
+        for partition in sorted(psutil.disk_partitions(all=True), key=lambda p: len(p.mountpoint)):
+            if self._excluded(partition) or partition.mountpoint in mounts:
+                continue
+            # Устройства вида "none" у разных FUSE-систем дублями не считаются
+            if "/" in partition.device:
+                if partition.device in devices:
+                    continue
+                devices.add(partition.device)
+            mounts.append(partition.mountpoint)
+        self.mount_table.mark_read()
+        if mounts != self.mounts:
+            logging.info(f"Monitoring disk usage of {len(mounts)} mounts: {', '.join(mounts)}")
+        # Состояние снятых точек монтирования больше не нужно
+        for mount in set(self._strikes).difference(mounts):
+            self._strikes.pop(mount, None)
+            self._quarantined.pop(mount, None)
+        self.mounts = mounts
+
+    def _timed_out(self, mount: str):
+        strikes = self._strikes.get(mount, 0) + 1
+        self._strikes[mount] = strikes
+        if strikes >= self.quarantine_after:
+            self._quarantined[mount] = time.monotonic() + self.quarantine_seconds
+            logging.warning(f"Disk {mount} timed out {strikes} times in a row, "
+                            f"skipping it for {self.quarantine_seconds:.0f} seconds")
+        else:
+            logging.warning(f"Disk {mount} did not answer within {self.timeout} seconds")
+
+    def _still_running(self, mount: str, future: Future):
+        self._running[mount] = future
+        self._stuck += 1
+        pool = self._pool
+
+        def finished(_):
+            if self._running.get(mount) is future:
+                del self._running[mount]
+            if self._pool is pool:
+                self._stuck -= 1
+
+        future.add_done_callback(finished)
+
+    def _replace_pool_if_stuck(self):
+        if self._stuck < self.workers:
+            return
+        # Потоки старого пула так и останутся в зависшем вызове; новых для этих дисков не будет
+        logging.warning(f"All {self.workers} disk workers are stuck, starting a new pool")
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="disk")
+        self._stuck = 0
+
+    def usage(self) -> Dict[str, Dict]:
+        if self.mount_table.changed():
+            self.refresh_mounts()
+        self._replace_pool_if_stuck()
+
+        now = time.monotonic()
+        started: Dict[str, float] = {}
+        futures: Dict[Future, str] = {}
+        for mount in self.mounts:
+            if self._quarantined.get(mount, 0) > now:
+                continue
+            if mount in self._running:
+                # Прошлый вызов еще висит - это тоже таймаут
+                self._timed_out(mount)
+                continue
+            futures[self._pool.submit(_disk_usage, mount, started)] = mount
+
+        disk_info = {}
+        pending = set(futures)
+        # Ожидающие в очереди пула получают время на свою очередь
+        deadline = now + self.timeout * (ceil(len(futures) / self.workers) + 1)
+        while pending:
+            now = time.monotonic()
+            expired = {future for future in pending
+                       if futures[future] in started and started[futures[future]] + self.timeout <= now}
+            if now >= deadline:
+                expired = pending
+            for future in expired:
+                mount = futures[future]
+                if future.cancel():
+                    continue
+                self._timed_out(mount)
+                self._still_running(mount, future)
+            pending -= expired
+            if not pending:
+                break
+            wake = min((started[futures[future]] + self.timeout for future in pending if futures[future] in started),
+                       default=deadline)
+            done, pending = wait(pending, timeout=max(min(wake, deadline) - now, 0.001), return_when=FIRST_COMPLETED)
+            for future in done:
+                mount = futures[future]
+                usage = future.result()
+                self._strikes.pop(mount, None)
+                self._quarantined.pop(mount, None)
+                if usage is not None:
+                    disk_info[mount] = usage
+        # Порядок как в списке дисков, а не по времени ответа
+        return {mount: disk_info[mount] for mount in self.mounts if mount in disk_info}
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _disk_usage(mount: str, started: Dict[str, float]) -> Optional[Dict]:
+    started[mount] = time.monotonic()
+    try:
+        usage = psutil.disk_usage(mount)
+    except Exception:
+        # Нет доступа или точка монтирования уже снята
+        return None
+    return {
+        "total": usage.total / (1024 ** 3),  # GB
+        "used": usage.used / (1024 ** 3),    # GB
+        "percent": usage.percent
+    }
+
+
+def _env_list(name: str, default: Iterable[str]) -> List[str]:
+    value = os.getenv(name)
+    if value is None:
+        return list(default)
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def disk_collector_from_env() -> DiskCollector:
+    return DiskCollector(
+        timeout=float(os.getenv('SYSTEM_INFO_DISK_TIMEOUT', 2.0)),
+        workers=int(os.getenv('SYSTEM_INFO_DISK_WORKERS', 4)),
+        exclude_fstypes=_env_list('SYSTEM_INFO_DISK_EXCLUDE_FSTYPES', DEFAULT_EXCLUDE_FSTYPES),
+        exclude_mounts=_env_list('SYSTEM_INFO_DISK_EXCLUDE_MOUNTS', DEFAULT_EXCLUDE_MOUNTS),
+        quarantine_after=int(os.getenv('SYSTEM_INFO_DISK_QUARANTINE_AFTER', 3)),
+        quarantine_seconds=float(os.getenv('SYSTEM_INFO_DISK_QUARANTINE_SECONDS', 600)),
+    )
@@ -0,0 +1,79 @@
+import json
+import logging
+import os
+from typing import Optional
+
+
+class ComputerNotFound(Exception):
+    """The backend does not know the computer id the agent is using."""
+
+    def __init__(self, computer_id: int):
+        super().__init__(f"Computer {computer_id} is not registered on the backend")
+        self.computer_id = computer_id
+
+
+class IdentityCache:
+    """
+    Remembers the computer id the backend assigned to this machine, so a
+    restarted agent can start sending right away instead of registering again.
+
+    The id is only reused for the same backend URL and the same hostname/MAC
+    fingerprint; a renamed or cloned machine registers anew.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self, api_url: str, hostname: str, mac_address: str) -> Optional[int]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                identity = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable identity file {self.path}: {e}")
+            return None
+
+        expected = {"api_url": api_url, "hostname": hostname, "mac_address": mac_address}
+        if any(identity.get(key) != value for key, value in expected.items()):
+            return None
+        computer_id = identity.get("computer_id")
+        return computer_id if isinstance(computer_id, int) else None
+
+    def save(self, computer_id: int, api_url: str, hostname: str, mac_address: str):
+        identity = {
+            "computer_id": computer_id,
+            "api_url": api_url,
+            "hostname": hostname,
+            "mac_address": mac_address,
+        }
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Запись через временный файл, чтобы сбой не оставил файл наполовину записанным
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(identity, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.warning(f"Could not save identity file {self.path}: {e}")
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning(f"Could not remove identity file {self.path}: {e}")
+
+
+def default_identity_path() -> str:
+    return os.path.join(os.path.expanduser("~"), ".system_info_agent", "identity.json")
+
+
+def identity_from_env() -> Optional[IdentityCache]:
+    path = os.getenv('SYSTEM_INFO_IDENTITY_FILE', default_identity_path())
+    if not path:
+        return None
+    return IdentityCache(path)
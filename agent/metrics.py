@@ -0,0 +1,110 @@
+import logging
+import os
+import random
+from typing import Optional
+
+try:
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, start_http_server, write_to_textfile
+except ImportError:  # prometheus_client нужен только для собственных метрик агента
+    CollectorRegistry = None
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def payload_log_sampled(rate: Optional[float] = None) -> bool:
+    """Whether to log this payload: DEBUG only, SYSTEM_INFO_PAYLOAD_LOG_SAMPLE_RATE of samples."""
+    if not logging.getLogger().isEnabledFor(logging.DEBUG):
+        return False
+    if rate is None:
+        rate = float(os.getenv('SYSTEM_INFO_PAYLOAD_LOG_SAMPLE_RATE', 0.01))
+    return random.random() < rate
+
+
+class AgentMetrics:
+    """
+    Self-metrics of the agent in Prometheus format: collector durations, send
+    latency, retries and spool backlog. Without prometheus_client every call
+    is a no-op, so the agent runs the same with or without it.
+    """
+
+    def __init__(self):
+        self.enabled = CollectorRegistry is not None
+        self.textfile: Optional[str] = None
+        if not self.enabled:
+            return
+        self.registry = CollectorRegistry(auto_describe=True)
+        self.collector_seconds = Histogram(
+            "agent_collector_duration_seconds", "Time one collector run takes",
+            ["collector"], buckets=LATENCY_BUCKETS, registry=self.registry
+        )
+        self.collector_errors = Counter(
+            "agent_collector_errors_total", "Collector runs that raised", ["collector"], registry=self.registry
+        )
+        self.request_seconds = Histogram(
+            "agent_request_duration_seconds", "Latency of requests to the backend",
+            ["kind", "outcome"], buckets=LATENCY_BUCKETS, registry=self.registry
+        )
+        self.retries = Counter(
+            "agent_retries_total", "Retried uploads and registrations", ["reason"], registry=self.registry
+        )
+        self.dropped = Counter(
+            "agent_samples_dropped_total", "Samples lost: spool disabled or rejected by the backend", registry=self.registry
+        )
+        self.backlog_bytes = Gauge(
+            "agent_spool_backlog_bytes", "Unsent samples waiting in the spool", registry=self.registry
+        )
+
+    def collector_finished(self, collector: str, seconds: float, ok: bool = True):
+        if self.enabled:
+            self.collector_seconds.labels(collector).observe(seconds)
+            if not ok:
+                self.collector_errors.labels(collector).inc()
+
+    def request_finished(self, kind: str, seconds: float, status: Optional[int]):
+        # status None - запрос не дошел до backend (таймаут, обрыв соединения)
+        if self.enabled:
+            outcome = "error" if status is None else f"{status // 100}xx"
+            self.request_seconds.labels(kind, outcome).observe(seconds)
+
+    def retried(self, reason: str):
+        if self.enabled:
+            self.retries.labels(reason).inc()
+
+    def sample_dropped(self):
+        if self.enabled:
+            self.dropped.inc()
+
+    def set_backlog(self, pending_bytes: int):
+        if self.enabled:
+            self.backlog_bytes.set(pending_bytes)
+
+    def serve(self, port: int, address: str = "127.0.0.1"):
+        if self.enabled:
+            start_http_server(port, addr=address, registry=self.registry)
+
+    def write(self):
+        """Rewrite the metrics file (for node_exporter's textfile collector), if one is configured."""
+        if self.enabled and self.textfile:
+            try:
+                write_to_textfile(self.textfile, self.registry)
+            except OSError as e:
+                logging.warning(f"Failed to write metrics to {self.textfile}: {e}")
+
+
+agent_metrics = AgentMetrics()
+
+
+def metrics_from_env():
+    """Expose agent_metrics on SYSTEM_INFO_METRICS_PORT and/or write them to SYSTEM_INFO_METRICS_FILE."""
+    port = os.getenv('SYSTEM_INFO_METRICS_PORT')
+    textfile = os.getenv('SYSTEM_INFO_METRICS_FILE')
+    if not (port or textfile):
+        return
+    if not agent_metrics.enabled:
+        logging.warning("prometheus_client is not installed, agent metrics are disabled")
+        return
+    if port:
+        address = os.getenv('SYSTEM_INFO_METRICS_ADDRESS', '127.0.0.1')
+        agent_metrics.serve(int(port), address)
+        logging.info(f"Serving agent metrics on {address}:{port}")
+    agent_metrics.textfile = textfile or None
@@ -0,0 +1,231 @@
+import heapq
+import os
+import sys
+import threading
+import time
+from operator import itemgetter
+from typing import Dict, List, Optional
+
+from samplers import PROCESS_SORT_KEYS
+
+PROC = "/proc"
+
+# Позиция ключа сортировки в кортеже (cpu_percent, rss, io_bytes, pid, name)
+_SORT_FIELD_INDEX = {"cpu": 0, "rss": 1, "io": 2}
+
+
+def procfs_available() -> bool:
+    return sys.platform.startswith("linux") and os.access(f"{PROC}/stat", os.R_OK)
+
+
+class ProcFile:
+    """
+    A /proc file that stays open between cycles and is re-read from offset 0
+    into the same buffer, so a refresh costs one seek and one read syscall.
+
+    The file offset and the buffer are shared, so reads are serialized: the
+    memory collector in the event loop and the process collector in a pool
+    thread both read /proc/meminfo.
+    """
+
+    def __init__(self, path: str, size: int = 16384):
+        self._file = open(path, "rb", buffering=0)
+        self._buf = bytearray(size)
+        self._lock = threading.Lock()
+
+    def read(self) -> bytes:
+        with self._lock:
+            return self._read()
+
+    def _read(self) -> bytes:
+        self._file.seek(0)
+        view = memoryview(self._buf)
+        n = 0
+        while True:
+            chunk = self._file.readinto(view[n:])
+            if not chunk:
+                break
+            n += chunk
+            if n == len(self._buf):
+                # Файл не поместился: увеличиваем буфер и дочитываем
+                view.release()
+                self._buf.extend(bytes(len(self._buf)))
+                view = memoryview(self._buf)
+        view.release()
+        return bytes(self._buf[:n])
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class ProcfsCollector:
+    """
+    Linux-only collector that parses /proc directly instead of going through
+    psutil. System-wide files are kept open; per-process files are read with
+    raw os.open/os.readv into one buffer that only :meth:`processes` uses.
+
+    Values match what the psutil path reports: CPU percent is the utilisation
+    since the previous call, memory "used" follows psutil's formula and process
+    CPU may exceed 100% on multi-core hosts.
+    """
+
+    def __init__(self, exclude_pids: Optional[set] = None):
+        self._stat = ProcFile(f"{PROC}/stat")
+        self._meminfo = ProcFile(f"{PROC}/meminfo")
+        self._net_dev = ProcFile(f"{PROC}/net/dev")
+        self._pid_buf = bytearray(4096)
+
+        self._clock_ticks = os.sysconf("SC_CLK_TCK")
+        self._page_size = os.sysconf("SC_PAGE_SIZE")
+        self._exclude_pids = exclude_pids or set()
+
+        self._mem_total = 0
+        self._cpu_last = self._read_cpu_times()
+        # pid -> (starttime, utime + stime, read + write bytes)
+        self._process_last: Dict[int, tuple] = {}
+        self._process_last_time = time.monotonic()
+
+    # --- system-wide -------------------------------------------------------
+
+    def _read_cpu_times(self) -> tuple:
+        data = self._stat.read()
+        fields = data[:data.index(b"\n")].split()[1:]
+        values = [int(value) for value in fields]
+        # user nice system idle iowait irq softirq steal guest guest_nice
+        total = sum(values[:8])
+        idle = values[3] + (values[4] if len(values) > 4 else 0)
+        return total - idle, total
+
+    def cpu_usage(self) -> float:
+        busy, total = self._read_cpu_times()
+        busy_then, total_then = self._cpu_last
+        self._cpu_last = (busy, total)
+
+        total_delta = total - total_then
+        if total_delta <= 0:
+            return 0.0
+        return round(min(max(busy - busy_then, 0) / total_delta * 100, 100.0), 1)
+
+    def memory_bytes(self) -> Dict[str, int]:
+        values = {}
+        for line in self._meminfo.read().splitlines():
+            key, _, rest = line.partition(b":")
+            if key in (b"MemTotal", b"MemFree", b"Buffers", b"Cached", b"SReclaimable"):
+                values[key] = int(rest.split()[0]) * 1024
+
+        total = values.get(b"MemTotal", 0)
+        free = values.get(b"MemFree", 0)
+        cached = values.get(b"Cached", 0) + values.get(b"SReclaimable", 0)
+        used = total - free - cached - values.get(b"Buffers", 0)
+        if used < 0:
+            used = total - free
+        self._mem_total = total
+        return {"total": total, "used": used}
+
+    def network_counters(self) -> Dict[str, int]:
+        bytes_recv = packets_recv = bytes_sent = packets_sent = 0
+        # Первые две строки - заголовок таблицы
+        for line in self._net_dev.read().splitlines()[2:]:
+            fields = line[line.rindex(b":") + 1:].split()
+            bytes_recv += int(fields[0])
+            packets_recv += int(fields[1])
+            bytes_sent += int(fields[8])
+            packets_sent += int(fields[9])
+        return {
+            "bytes_sent": bytes_sent,
+            "bytes_recv": bytes_recv,
+            "packets_sent": packets_sent,
+            "packets_recv": packets_recv,
+        }
+
+    # --- processes -----------------------------------------------------------
+
+    def _read_pid_file(self, pid: bytes, name: bytes) -> Optional[bytes]:
+        try:
+            fd = os.open(b"%s/%s/%s" % (PROC.encode(), pid, name), os.O_RDONLY)
+        except OSError:
+            return None
+        try:
+            n = os.readv(fd, [self._pid_buf])
+        except OSError:
+            return None
+        finally:
+            os.close(fd)
+        return bytes(self._pid_buf[:n])
+
+    def _read_pid_io(self, pid: bytes) -> int:
+        data = self._read_pid_file(pid, b"io")
+        if not data:
+            return 0
+        total = 0
+        for line in data.splitlines():
+            if line.startswith(b"read_bytes:") or line.startswith(b"write_bytes:"):
+                total += int(line.split()[1])
+        return total
+
+    def processes(self, limit: int = 10, sort_by: str = "cpu") -> List[Dict]:
+        if sort_by not in PROCESS_SORT_KEYS:
+            raise ValueError(f"Unknown process sort key: {sort_by}")
+        collect_io = sort_by == "io"
+        if not self._mem_total:
+            self.memory_bytes()
+
+        now = time.monotonic()
+        elapsed_ticks = (now - self._process_last_time) * self._clock_ticks
+        self._process_last_time = now
+
+        previous = self._process_last
+        current = {}
+        processes = []
+        for entry in os.scandir(PROC.encode()):
+            if not entry.name.isdigit():
+                continue
+            pid = int(entry.name)
+            if pid in self._exclude_pids:
+                continue
+            data = self._read_pid_file(entry.name, b"stat")
+            if not data:
+                # Процесс завершился между scandir и чтением
+                continue
+
+            rpar = data.rindex(b")")
+            name = data[data.index(b"(") + 1:rpar]
+            fields = data[rpar + 2:].split()
+            cpu_ticks = int(fields[11]) + int(fields[12])
+            starttime = int(fields[19])
+            rss = int(fields[21]) * self._page_size
+            io_total = self._read_pid_io(entry.name) if collect_io else 0
+
+            last = previous.get(pid)
+            if last is not None and last[0] == starttime and elapsed_ticks > 0:
+                cpu_percent = round((cpu_ticks - last[1]) / elapsed_ticks * 100, 1)
+                io_bytes = max(io_total - last[2], 0)
+            else:
+                # Новый процесс (или pid переиспользован) - интервала для расчета еще нет
+                cpu_percent = 0.0
+                io_bytes = 0
+            current[pid] = (starttime, cpu_ticks, io_total)
+            processes.append((cpu_percent, rss, io_bytes, pid, name))
+
+        self._process_last = current
+
+        # Словари собираем только для попавших в топ процессов
+        top = heapq.nlargest(limit, processes, key=itemgetter(_SORT_FIELD_INDEX[sort_by]))
+        result = []
+        for cpu_percent, rss, io_bytes, pid, name in top:
+            info = {
+                "pid": pid,
+                "name": name.decode("utf-8", "replace"),
+                "cpu_percent": cpu_percent,
+                "memory_percent": rss / self._mem_total * 100 if self._mem_total else 0.0,
+                "memory_rss": rss,
+            }
+            if collect_io:
+                info["io_bytes"] = io_bytes
+            result.append(info)
+        return result
+
+    def close(self):
+        for proc_file in (self._stat, self._meminfo, self._net_dev):
+            proc_file.close()
@@ -0,0 +1,415 @@
+"""
+Relay between agents of one site and the backend.
+
+Agents point SYSTEM_INFO_API_URL at the relay instead of the backend. The
+relay serves the part of the API the agent uses: registration, single
+samples and batches. Samples are queued in an on-disk spool and forwarded
+upstream in batches over a small pool of keep-alive connections, so a site
+of hundreds of machines costs the backend a few requests per second instead
+of one request per machine and interval. While the backend is unreachable
+the spool keeps filling, and the backlog is replayed once the backend is back.
+
+    python relay.py --upstream http://backend:8000/api/v1 --port 8100
+    SYSTEM_INFO_API_URL=http://relay:8100/api/v1 python system_info.py
+
+Registrations are forwarded upstream and cached, so agents restarting during
+an outage still get their computer id.
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Set, Tuple
+
+import requests
+
+from scheduler import backoff_delay
+from spool import Spool
+from wire import JSON, MSGPACK, choose_content_type, encode_body, msgpack, rejected_permanently
+
+REGISTRATIONS_FILE = "registrations.json"
+# Поля, без которых backend все равно отклонит замер
+REQUIRED_FIELDS = ("cpu_usage", "memory_total", "memory_used", "disk_usage", "running_processes", "network_stats")
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+REGISTER_PATH = re.compile(r"^/system-info/computers/?$")
+SAMPLE_PATH = re.compile(r"^/system-info/computers/(\d+)/system-info/?$")
+
+
+class RelayError(Exception):
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+class RegistrationCache:
+    """Upstream registration responses by hostname, kept in a JSON file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self._computers: Dict[str, Dict] = json.load(f)
+        except (OSError, ValueError):
+            self._computers = {}
+
+    def __len__(self) -> int:
+        return len(self._computers)
+
+    def get(self, hostname: str) -> Optional[Dict]:
+        with self._lock:
+            return self._computers.get(hostname)
+
+    def put(self, hostname: str, computer: Dict):
+        with self._lock:
+            self._computers[hostname] = computer
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._computers, f)
+            os.replace(tmp_path, self.path)
+
+
+class Relay:
+    """
+    Spools samples from agents and forwards them to ``upstream`` in batches.
+
+    One forwarder thread sends the spool oldest first: a batch goes out once
+    ``batch_size`` samples are waiting or every ``flush_interval`` seconds,
+    and a failed upload is retried with backoff while the spool grows.
+    Computers the backend reports as unknown get 404 on their next sample,
+    so their agents register again through the relay.
+    """
+
+    def __init__(self, upstream: str, spool: Spool, registrations: RegistrationCache,
+                 batch_size: int = 500, flush_interval: float = 1.0, connections: int = 4):
+        self.upstream = upstream.rstrip("/")
+        self.spool = spool
+        self.registrations = registrations
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.session = requests.Session()
+        # При занятых соединениях запросы ждут свободное, а не открывают новые
+        self.session.mount(self.upstream, requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=connections, pool_block=True
+        ))
+        self.content_type = None
+        self.upstream_available = False
+
+        self._unknown: Set[int] = set()
+        self._queued = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._forwarder: Optional[threading.Thread] = None
+
+    # --- запросы агентов ------------------------------------------------------
+
+    def register(self, computer: Dict) -> Dict:
+        hostname = computer.get("hostname")
+        if not hostname:
+            raise RelayError(400, "Hostname cannot be empty")
+        cached = self.registrations.get(hostname)
+        if cached is not None and cached.get("id") not in self._unknown and all(
+            cached.get(key) == computer.get(key) for key in ("ip_address", "mac_address", "os_info")
+        ):
+            return cached
+
+        try:
+            response = self.session.post(f"{self.upstream}/system-info/computers/", json=computer, timeout=10)
+        except requests.exceptions.RequestException as e:
+            if cached is not None:
+                # Backend недоступен: агент получит прежний id, замеры подождут в буфере
+                logging.warning(f"Upstream unavailable, answering registration of {hostname} from cache: {e}")
+                return cached
+            raise RelayError(503, "Upstream unavailable")
+        if response.status_code >= 400:
+            raise RelayError(response.status_code, response.text)
+
+        registered = response.json()
+        with self._lock:
+            self._unknown.discard(registered.get("id"))
+        self.registrations.put(hostname, registered)
+        logging.info(f"Registered {hostname} upstream as computer {registered.get('id')}")
+        return registered
+
+    def accept(self, records: List[Dict]) -> List[bool]:
+        """
+        Spool samples for forwarding.
+
+        :return: per sample, False if its computer is unknown to the backend
+        :raises RelayError: 422 if a sample lacks required fields
+        """
+        for record in records:
+            missing = [field for field in REQUIRED_FIELDS if field not in record]
+            if missing:
+                raise RelayError(422, f"Missing fields: {', '.join(missing)}")
+        accepted = [record.get("computer_id") not in self._unknown for record in records]
+        for record, ok in zip(records, accepted):
+            if ok:
+                self.spool.append(record)
+        with self._lock:
+            self._queued += sum(accepted)
+            queued = self._queued
+        if queued >= self.batch_size:
+            self._wake.set()
+        return accepted
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def status(self) -> Dict:
+        return {
+            "upstream": self.upstream,
+            "upstream_available": self.upstream_available,
+            "pending_bytes": self.spool.pending_bytes(),
+            "registrations": len(self.registrations),
+            "unknown_computers": sorted(self._unknown),
+        }
+
+    # --- отправка на backend -------------------------------------------------
+
+    def _negotiate(self):
+        try:
+            response = self.session.get(f"{self.upstream}/system-info/wire-formats", timeout=10)
+            response.raise_for_status()
+            self.content_type = choose_content_type(response.json())
+        except (requests.exceptions.RequestException, ValueError):
+            self.content_type = JSON
+        logging.info(f"Forwarding to {self.upstream} as {self.content_type}")
+
+    def _post_batch(self, records: List[Dict]) -> requests.Response:
+        body, headers = encode_body({"items": records}, self.content_type)
+        return self.session.post(f"{self.upstream}/system-info/batch", data=body, headers=headers, timeout=30)
+
+    def _send(self, records: List[Dict]) -> Tuple[int, List[int]]:
+        """
+        Send one batch; returns (accepted, ids of unknown computers).
+
+        A batch the backend refuses for good (422 for an invalid sample, 413
+        for its size, any 4xx except 404, 408 and 429) is split in halves until
+        the refused samples are isolated, and those are dropped, so one bad
+        sample or an oversized batch cannot block the spool forever.
+        """
+        response = self._post_batch(records)
+        if rejected_permanently(response.status_code):
+            if len(records) == 1:
+                logging.warning(f"Upstream rejected a sample of computer {records[0].get('computer_id')} "
+                                f"with {response.status_code}, dropping it: {response.text[:500]}")
+                return 0, []
+            middle = len(records) // 2
+            first_accepted, first_unknown = self._send(records[:middle])
+            second_accepted, second_unknown = self._send(records[middle:])
+            return first_accepted + second_accepted, first_unknown + second_unknown
+        response.raise_for_status()
+        result = response.json()
+        unknown = [item["computer_id"] for item in result["items"] if item["status"] == "not_found"]
+        return result["accepted"], unknown
+
+    def flush(self) -> int:
+        """Forward everything spooled; stops at the first failed request."""
+        if self.content_type is None:
+            self._negotiate()
+        sent = 0
+        while True:
+            records, cursor = self.spool.read_batch(self.batch_size)
+            if not records:
+                with self._lock:
+                    self._queued = 0
+                return sent
+            accepted, unknown = self._send(records)
+            self.upstream_available = True
+            if unknown:
+                # Замеры удаленных компьютеров отбрасываются, агенты зарегистрируются заново
+                logging.warning(f"Upstream does not know computers {sorted(set(unknown))}, "
+                                f"dropped {len(records) - accepted} samples")
+                with self._lock:
+                    self._unknown.update(unknown)
+            self.spool.commit(cursor)
+            sent += len(records)
+            with self._lock:
+                self._queued = max(self._queued - len(records), 0)
+
+    def _forward_loop(self):
+        failures = 0
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                failures = 0
+            except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                failures += 1
+                self.upstream_available = False
+                # Формат мог измениться, пока backend был недоступен
+                self.content_type = None
+                delay = backoff_delay(failures, base=self.flush_interval, cap=60)
+                logging.warning(f"Upstream unavailable ({e}), {self.spool.pending_bytes()} bytes waiting "
+                                f"in spool. Retrying in {delay:.1f} seconds...")
+                self._stopping.wait(delay)
+
+    def start(self):
+        self._forwarder = threading.Thread(target=self._forward_loop, name="forwarder", daemon=True)
+        self._forwarder.start()
+
+    def stop(self):
+        """Stop forwarding after one last attempt to send the backlog."""
+        self._stopping.set()
+        self._wake.set()
+        if self._forwarder is not None:
+            self._forwarder.join()
+        try:
+            self.flush()
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            logging.warning(f"Backlog left in spool on shutdown: {e}")
+        self.spool.close()
+
+
+class RelayHandler(BaseHTTPRequestHandler):
+    # keep-alive: агент держит одно соединение с relay
+    protocol_version = "HTTP/1.1"
+    relay: Relay = None
+    prefix = "/api/v1"
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} {format % args}")
+
+    def _reply(self, status: int, payload):
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", JSON)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _path(self) -> Optional[str]:
+        path = self.path.split("?", 1)[0]
+        if not path.startswith(self.prefix):
+            return None
+        return path[len(self.prefix):]
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if length > MAX_BODY_BYTES:
+            raise RelayError(413, "Request body too large")
+        body = self.rfile.read(length)
+        is_msgpack = self.headers.get("Content-Type", JSON).split(";")[0].strip() == MSGPACK
+        if is_msgpack and msgpack is None:
+            raise RelayError(415, "msgpack is not installed on the relay")
+        try:
+            if self.headers.get("Content-Encoding", "").lower() == "gzip":
+                body = gzip.decompress(body)
+            # Ошибки разбора msgpack - подклассы ValueError
+            return msgpack.unpackb(body) if is_msgpack else json.loads(body)
+        except (OSError, EOFError, ValueError) as e:
+            raise RelayError(400, f"Malformed body: {e}")
+
+    def do_GET(self):
+        path = self._path()
+        if path == "/system-info/wire-formats":
+            # Дельта-кадрам нужен id сохраненного снимка, а relay отвечает до записи
+            content_types = [JSON, MSGPACK] if msgpack is not None else [JSON]
+            self._reply(200, {"content_types": content_types, "content_encodings": ["gzip"], "delta_frames": False})
+        elif path == "/relay/status":
+            self._reply(200, self.relay.status())
+        else:
+            self._reply(404, {"detail": "Not Found"})
+
+    def do_POST(self):
+        path = self._path()
+        try:
+            body = self._read_body()
+            if path is None:
+                raise RelayError(404, "Not Found")
+            if REGISTER_PATH.match(path):
+                self._reply(200, self.relay.register(body))
+                return
+            match = SAMPLE_PATH.match(path)
+            if match:
+                computer_id = int(match.group(1))
+                if not isinstance(body, dict):
+                    raise RelayError(422, "Sample must be an object")
+                if not self.relay.accept([dict(body, computer_id=computer_id)])[0]:
+                    raise RelayError(404, "Computer not found")
+                self._reply(202, {"status": "queued", "computer_id": computer_id, "queued": self.relay.queued})
+                return
+            if path == "/system-info/batch":
+                items = body.get("items") if isinstance(body, dict) else None
+                if not items or not all(isinstance(item, dict) and "computer_id" in item for item in items):
+                    raise RelayError(422, "Batch items must be objects with computer_id")
+                accepted = self.relay.accept(items)
+                self._reply(200, {
+                    "accepted": sum(accepted),
+                    "rejected": len(items) - sum(accepted),
+                    "items": [
+                        {"index": index, "computer_id": item["computer_id"], "status": "queued"} if ok else
+                        {"index": index, "computer_id": item["computer_id"], "status": "not_found",
+                         "detail": "Computer not found"}
+                        for index, (item, ok) in enumerate(zip(items, accepted))
+                    ],
+                })
+                return
+            raise RelayError(404, "Not Found")
+        except RelayError as e:
+            self._reply(e.status, {"detail": e.detail})
+        except Exception as e:
+            logging.error(f"Failed to handle {self.command} {self.path}: {e}")
+            self._reply(500, {"detail": str(e)})
+
+
+class RelayServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Очередь по умолчанию (5 соединений) переполняется, когда агенты площадки стартуют разом
+    request_queue_size = 128
+
+
+def default_relay_dir() -> str:
+    return os.path.join(os.path.expanduser("~"), ".system_info_relay")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--upstream", default=os.getenv('SYSTEM_INFO_RELAY_UPSTREAM', 'http://localhost:8000/api/v1'),
+                        help="backend API URL")
+    parser.add_argument("--address", default=os.getenv('SYSTEM_INFO_RELAY_ADDRESS', '0.0.0.0'))
+    parser.add_argument("--port", type=int, default=int(os.getenv('SYSTEM_INFO_RELAY_PORT', 8100)))
+    parser.add_argument("--prefix", default="/api/v1", help="API prefix agents use in SYSTEM_INFO_API_URL")
+    parser.add_argument("--dir", default=os.getenv('SYSTEM_INFO_RELAY_DIR', default_relay_dir()),
+                        help="spool and registration cache directory")
+    parser.add_argument("--spool-max-mb", type=int, default=int(os.getenv('SYSTEM_INFO_RELAY_SPOOL_MAX_MB', 1024)))
+    parser.add_argument("--fsync", action="store_true",
+                        help="fsync every sample (survives power loss, costs a disk flush per request)")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv('SYSTEM_INFO_RELAY_BATCH_SIZE', 500)))
+    parser.add_argument("--flush-interval", type=float,
+                        default=float(os.getenv('SYSTEM_INFO_RELAY_FLUSH_INTERVAL', 1.0)), help="seconds")
+    parser.add_argument("--connections", type=int, default=4, help="keep-alive connections to the backend")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    os.makedirs(args.dir, exist_ok=True)
+    spool = Spool(os.path.join(args.dir, "spool"), max_bytes=args.spool_max_mb * 1024 * 1024, fsync=args.fsync)
+    relay = Relay(args.upstream, spool, RegistrationCache(os.path.join(args.dir, REGISTRATIONS_FILE)),
+                  batch_size=args.batch_size, flush_interval=args.flush_interval, connections=args.connections)
+
+    RelayHandler.relay = relay
+    RelayHandler.prefix = args.prefix.rstrip("/")
+    server = RelayServer((args.address, args.port), RelayHandler)
+    relay.start()
+    logging.info(f"Relaying {args.address}:{args.port}{args.prefix} to {args.upstream}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        relay.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import heapq
+from operator import itemgetter
+from typing import Dict, List, Optional
+
+import psutil
+
+# Ключи сортировки списка процессов -> поле в отчете
+PROCESS_SORT_KEYS = {
+    "cpu": "cpu_percent",
+    "rss": "memory_rss",
+    "io": "io_bytes",
+}
+
+
+class CpuSampler:
+    """
+    Non-blocking CPU utilisation sampler.
+
+    Each call returns the average utilisation since the previous call, computed
+    from cumulative cpu_times() deltas, so the collection loop never sleeps.
+    Unlike psutil.cpu_percent(interval=None) it keeps its own baseline, so
+    several samplers can run side by side without resetting each other.
+    """
+
+    def __init__(self):
+        self._last = psutil.cpu_times()
+
+    @staticmethod
+    def _busy_and_total(times) -> tuple:
+        total = sum(times)
+        # guest и guest_nice уже учтены в user и nice (Linux)
+        total -= getattr(times, 'guest', 0) + getattr(times, 'guest_nice', 0)
+        idle = times.idle + getattr(times, 'iowait', 0)
+        return total - idle, total
+
+    def sample(self) -> float:
+        current = psutil.cpu_times()
+        busy_now, total_now = self._busy_and_total(current)
+        busy_then, total_then = self._busy_and_total(self._last)
+        self._last = current
+
+        total_delta = total_now - total_then
+        if total_delta <= 0:
+            return 0.0
+        busy_delta = max(busy_now - busy_then, 0.0)
+        return round(min(busy_delta / total_delta * 100, 100.0), 1)
+
+
+class ProcessSampler:
+    """
+    Keeps psutil.Process handles alive between collection cycles.
+
+    Per-process CPU is the delta since the previous cycle (psutil remembers the
+    last cpu_times on the cached handle), so values are meaningful from the
+    second cycle on without any sleeping. Dead pids are evicted and the top-N is
+    picked with a partial selection instead of sorting every process.
+    """
+
+    def __init__(self, sort_by: str = "cpu", exclude_pids: Optional[set] = None):
+        if sort_by not in PROCESS_SORT_KEYS:
+            raise ValueError(f"Unknown process sort key: {sort_by}")
+        self.sort_by = sort_by
+        self._exclude_pids = exclude_pids or set()
+        self._processes: Dict[int, psutil.Process] = {}
+        self._io_totals: Dict[int, int] = {}
+
+    def _refresh(self) -> set:
+        pids = set(psutil.pids()) - self._exclude_pids
+        for pid in self._processes.keys() - pids:
+            self._evict(pid)
+        new_pids = pids - self._processes.keys()
+        for pid in new_pids:
+            try:
+                proc = psutil.Process(pid)
+                # Первый вызов задает точку отсчета для следующего замера
+                proc.cpu_percent(interval=None)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            self._processes[pid] = proc
+        return new_pids
+
+    def _evict(self, pid: int):
+        self._processes.pop(pid, None)
+        self._io_totals.pop(pid, None)
+
+    def _io_delta(self, pid: int, proc: psutil.Process) -> int:
+        try:
+            counters = proc.io_counters()
+        except (psutil.AccessDenied, AttributeError):
+            return 0
+        total = counters.read_bytes + counters.write_bytes
+        previous = self._io_totals.get(pid, total)
+        self._io_totals[pid] = total
+        return max(total - previous, 0)
+
+    def sample(self, limit: int = 10, sort_by: Optional[str] = None) -> List[Dict]:
+        sort_by = sort_by or self.sort_by
+        if sort_by not in PROCESS_SORT_KEYS:
+            raise ValueError(f"Unknown process sort key: {sort_by}")
+        collect_io = sort_by == "io"
+
+        new_pids = self._refresh()
+        processes = []
+        for pid, proc in list(self._processes.items()):
+            try:
+                with proc.oneshot():
+                    memory = proc.memory_info()
+                    info = {
+                        "pid": pid,
+                        "name": proc.name(),
+                        # У только что найденных процессов еще нет интервала для расчета
+                        "cpu_percent": 0.0 if pid in new_pids else proc.cpu_percent(interval=None),
+                        "memory_percent": proc.memory_percent(),
+                        "memory_rss": memory.rss,
+                    }
+                    if collect_io:
+                        info["io_bytes"] = self._io_delta(pid, proc)
+            except psutil.NoSuchProcess:
+                self._evict(pid)
+                continue
+            except psutil.AccessDenied:
+                continue
+            processes.append(info)
+
+        return heapq.nlargest(limit, processes, key=itemgetter(PROCESS_SORT_KEYS[sort_by]))
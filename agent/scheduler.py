@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional
+
+import requests
+
+from identity import ComputerNotFound
+from metrics import agent_metrics
+from spool import Spool
+from summaries import IntervalSummaries
+
+# Интервалы сбора по умолчанию, секунды. Быстрые коллекторы опрашиваются
+# каждую секунду: в отправку идут сводки за интервал, а не каждый замер
+DEFAULT_INTERVALS = {
+    "cpu": 1,
+    "memory": 1,
+    "network": 1,
+    "processes": 15,
+    "disk": 300,
+}
+
+# Быстрые коллекторы выполняются прямо в цикле событий, остальные - в пуле потоков
+FAST_COLLECTORS = {"cpu", "memory", "network"}
+
+
+def intervals_from_env() -> Dict[str, float]:
+    return {
+        name: float(os.getenv(f'SYSTEM_INFO_{name.upper()}_INTERVAL', default))
+        for name, default in DEFAULT_INTERVALS.items()
+    }
+
+
+def backoff_delay(failures: int, base: float = 1.0, cap: float = 300.0) -> float:
+    """Exponential backoff with jitter, so agents don't retry in lockstep."""
+    delay = min(cap, base * 2 ** max(failures - 1, 0))
+    return delay * random.uniform(0.5, 1.5)
+
+
+class CollectionScheduler:
+    """
+    Runs every collector of a SystemInfoCollector on its own interval.
+
+    The latest value of each collector is kept in memory; every
+    ``upload_interval`` seconds a sample is assembled from those values, put
+    into the spool and uploaded. Slow collectors (disks, processes) run in a
+    thread pool so they never delay the fast ones, and uploads run in their
+    own single thread, retrying with jittered exponential backoff.
+
+    Every reading of the fast collectors also goes into fixed-size buffers,
+    and each sample carries their min/max/mean/p95/last over the upload
+    interval (``cpu_summary``, ``memory_summary``, ``network_summary``), so
+    short spikes between two samples are not lost.
+    """
+
+    def __init__(self, collector, spool: Optional[Spool], upload_interval: float,
+                 intervals: Optional[Dict[str, float]] = None, batch_size: int = 500,
+                 max_workers: int = 4, summaries: bool = True):
+        self.collector = collector
+        self.spool = spool
+        self.upload_interval = upload_interval
+        self.intervals = intervals or dict(DEFAULT_INTERVALS)
+        self.batch_size = batch_size
+        self.latest: Dict[str, object] = {}
+        self.computer_id: Optional[int] = None
+        self.summaries = None
+        if summaries:
+            self.summaries = IntervalSummaries.for_intervals(
+                upload_interval, [self.intervals[name] for name in FAST_COLLECTORS]
+            )
+
+        self._collectors = {
+            "cpu": collector.get_cpu_usage,
+            "memory": collector.get_memory_info,
+            "network": collector.get_network_stats,
+            "processes": collector.get_running_processes,
+            "disk": collector.get_disk_usage,
+        }
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="collector")
+        self._uploader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="uploader")
+        self._pending = None
+
+    async def _collect(self, name: str, summarize: bool = True):
+        started = time.perf_counter()
+        try:
+            if name in FAST_COLLECTORS:
+                self.latest[name] = self._collectors[name]()
+                if summarize and self.summaries is not None:
+                    self.summaries.add(name, self.latest[name])
+            else:
+                loop = asyncio.get_running_loop()
+                self.latest[name] = await loop.run_in_executor(self._pool, self._collectors[name])
+        except Exception as e:
+            agent_metrics.collector_finished(name, time.perf_counter() - started, ok=False)
+            logging.error(f"Collector {name} failed: {e}")
+        else:
+            # Для медленных коллекторов сюда входит и ожидание свободного потока пула
+            agent_metrics.collector_finished(name, time.perf_counter() - started)
+
+    async def _collect_loop(self, name: str, interval: float):
+        loop = asyncio.get_running_loop()
+        # Первый проход выполнен в run(); повтор сразу за ним дал бы замер CPU
+        # за доли миллисекунды, то есть 0 или 100%
+        started = loop.time()
+        while True:
+            await asyncio.sleep(max(interval - (loop.time() - started), 0))
+            started = loop.time()
+            await self._collect(name)
+
+    def build_sample(self) -> Optional[Dict]:
+        """The sample for this interval, or None while some collector has no value yet."""
+        missing = [name for name in self._collectors if name not in self.latest]
+        if missing:
+            logging.warning(f"No data from collectors {', '.join(missing)} yet, skipping this sample")
+            if self.summaries is not None:
+                # Сводки относятся к пропущенному интервалу
+                self.summaries.take()
+            return None
+        memory_info = self.latest["memory"]
+        sample = {
+            "computer_id": self.computer_id,
+            "cpu_usage": self.latest["cpu"],
+            "memory_total": memory_info['total'],
+            "memory_used": memory_info['used'],
+            "disk_usage": self.latest["disk"],
+            "running_processes": self.latest["processes"],
+            "network_stats": self.latest["network"],
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        if self.summaries is not None:
+            sample.update(self.summaries.take())
+        return sample
+
+    async def _reregister(self):
+        # Backend не знает наш id (например, база была пересоздана)
+        logging.warning(f"Computer {self.computer_id} is unknown to the backend, registering again")
+        agent_metrics.retried("reregister")
+        loop = asyncio.get_running_loop()
+        self.computer_id = await loop.run_in_executor(self._uploader, self.collector.ensure_registered, True)
+
+    async def _sample_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.upload_interval)
+            sample = self.build_sample()
+            # Файл метрик обновляется раз за интервал отправки
+            agent_metrics.write()
+            if sample is None:
+                continue
+            if self.spool is None:
+                try:
+                    await loop.run_in_executor(self._uploader, self.collector.send_system_info, self.computer_id, sample)
+                except ComputerNotFound:
+                    await self._reregister()
+                    agent_metrics.sample_dropped()
+                    logging.warning("Sample dropped during re-registration (spool is disabled)")
+                except requests.exceptions.RequestException:
+                    agent_metrics.sample_dropped()
+                    logging.warning("Failed to send system info, sample dropped (spool is disabled)")
+                continue
+            await loop.run_in_executor(self._uploader, self.spool.append, sample)
+            self._pending.set()
+
+    async def _flush_loop(self):
+        loop = asyncio.get_running_loop()
+        failures = 0
+        while True:
+            await self._pending.wait()
+            self._pending.clear()
+            try:
+                await loop.run_in_executor(self._uploader, self.collector.flush_spool, self.batch_size)
+                failures = 0
+                agent_metrics.set_backlog(self.spool.pending_bytes())
+            except ComputerNotFound:
+                await self._reregister()
+                self._pending.set()
+            except Exception as e:
+                failures += 1
+                agent_metrics.retried("upload")
+                delay = backoff_delay(failures, base=min(self.upload_interval, 5), cap=self.upload_interval * 5)
+                if not isinstance(e, requests.exceptions.RequestException):
+                    logging.error(f"Failed to flush spool: {e}")
+                pending_bytes = self.spool.pending_bytes()
+                agent_metrics.set_backlog(pending_bytes)
+                logging.warning(f"Backend unavailable, {pending_bytes} bytes waiting in spool. "
+                                f"Retrying in {delay:.1f} seconds...")
+                await asyncio.sleep(delay)
+                self._pending.set()
+
+    async def run(self, computer_id: int):
+        self.computer_id = computer_id
+        self._pending = asyncio.Event()
+        # Первый проход по всем коллекторам, чтобы первый замер был полным. В сводки
+        # он не попадает: у CPU и сети еще нет предыдущего значения для разности
+        await asyncio.gather(*(self._collect(name, summarize=False) for name in self._collectors))
+
+        tasks = [
+            asyncio.create_task(self._collect_loop(name, self.intervals[name]))
+            for name in self._collectors
+        ]
+        tasks.append(asyncio.create_task(self._sample_loop()))
+        if self.spool is not None:
+            # Отправляем накопленное за время простоя сразу после старта
+            self._pending.set()
+            tasks.append(asyncio.create_task(self._flush_loop()))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._uploader.shutdown(wait=True)
@@ -0,0 +1,208 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+SEGMENT_SUFFIX = ".seg"
+CURSOR_FILE = "cursor.json"
+
+Cursor = Tuple[int, int]
+
+
+class Spool:
+    """
+    Bounded, crash-safe on-disk queue for collected samples.
+
+    Records are appended as JSON lines to numbered segment files. A separate
+    cursor file remembers how far the backlog has been acknowledged, so after
+    a crash or restart replay resumes from the first unsent record. A record
+    torn by a crash mid-write is cut off when the spool is reopened.
+
+    The spool is bounded by total size and by age: the oldest segments are
+    evicted first, even if they have not been sent yet.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 50 * 1024 * 1024,
+                 max_age: float = 7 * 24 * 3600, segment_bytes: int = 1024 * 1024,
+                 fsync: bool = True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self._lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._cursor = self._load_cursor()
+        segments = self._segments()
+        self._active_seq = segments[-1] if segments else self._cursor[0]
+        self._active = self._open_segment(self._active_seq)
+
+    # --- запись ---------------------------------------------------------------
+
+    def append(self, record: Dict):
+        line = json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
+        with self._lock:
+            if self._active.tell() >= self.segment_bytes:
+                self._rotate()
+            self._active.write(line)
+            self._active.flush()
+            if self.fsync:
+                os.fsync(self._active.fileno())
+            self._evict()
+
+    # --- чтение и подтверждение ---------------------------------------------
+
+    def read_batch(self, max_items: int) -> Tuple[List[Dict], Cursor]:
+        """
+        Return up to ``max_items`` unacknowledged records, oldest first, plus the
+        cursor to pass to :meth:`commit` once they have been delivered.
+        """
+        records = []
+        with self._lock:
+            seq, offset = self._cursor
+            for segment in self._segments():
+                if segment < seq:
+                    continue
+                if segment > seq:
+                    seq, offset = segment, 0
+                with open(self._segment_path(segment), "rb") as f:
+                    f.seek(offset)
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break
+                        offset += len(line)
+                        try:
+                            records.append(json.loads(line))
+                        except ValueError:
+                            logging.warning(f"Skipping corrupted spool record in segment {segment}")
+                            continue
+                        if len(records) >= max_items:
+                            return records, (seq, offset)
+        return records, (seq, offset)
+
+    def commit(self, cursor: Cursor):
+        """Acknowledge everything up to ``cursor`` and drop fully sent segments."""
+        with self._lock:
+            self._cursor = cursor
+            self._save_cursor()
+            for segment in self._segments():
+                if segment < cursor[0] and segment != self._active_seq:
+                    self._remove_segment(segment)
+
+    def pending_bytes(self) -> int:
+        with self._lock:
+            total = 0
+            for segment in self._segments():
+                if segment < self._cursor[0]:
+                    continue
+                total += os.path.getsize(self._segment_path(segment))
+                if segment == self._cursor[0]:
+                    total -= self._cursor[1]
+            return max(total, 0)
+
+    def close(self):
+        with self._lock:
+            self._active.close()
+
+    # --- служебное ----------------------------------------------------------
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"{seq:020d}{SEGMENT_SUFFIX}")
+
+    def _segments(self) -> List[int]:
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.endswith(SEGMENT_SUFFIX):
+                try:
+                    segments.append(int(name[:-len(SEGMENT_SUFFIX)]))
+                except ValueError:
+                    continue
+        return sorted(segments)
+
+    def _open_segment(self, seq: int):
+        path = self._segment_path(seq)
+        f = open(path, "ab+")
+        self._truncate_torn_tail(f)
+        return f
+
+    @staticmethod
+    def _truncate_torn_tail(f):
+        # После аварийного завершения последняя запись может быть записана не полностью
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        f.seek(0)
+        data = f.read()
+        f.truncate(data.rfind(b"\n") + 1)
+        f.seek(0, os.SEEK_END)
+        logging.warning("Truncated incomplete record at the end of the spool")
+
+    def _rotate(self):
+        self._active.close()
+        self._active_seq += 1
+        self._active = self._open_segment(self._active_seq)
+
+    def _remove_segment(self, seq: int):
+        try:
+            os.remove(self._segment_path(seq))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        segments = self._segments()
+        sizes = {seq: os.path.getsize(self._segment_path(seq)) for seq in segments}
+        total = sum(sizes.values())
+        oldest_allowed = time.time() - self.max_age
+
+        for seq in segments:
+            if seq == self._active_seq:
+                break
+            expired = os.path.getmtime(self._segment_path(seq)) < oldest_allowed
+            if total <= self.max_bytes and not expired:
+                break
+            if seq >= self._cursor[0]:
+                logging.warning(f"Spool limit reached, dropping unsent segment {seq}")
+            self._remove_segment(seq)
+            total -= sizes[seq]
+            if seq >= self._cursor[0]:
+                self._cursor = (seq + 1, 0)
+                self._save_cursor()
+
+    def _load_cursor(self) -> Cursor:
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILE)) as f:
+                data = json.load(f)
+            return int(data["segment"]), int(data["offset"])
+        except (OSError, ValueError, KeyError):
+            return 0, 0
+
+    def _save_cursor(self):
+        path = os.path.join(self.directory, CURSOR_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"segment": self._cursor[0], "offset": self._cursor[1]}, f)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+
+def default_spool_dir() -> str:
+    return os.path.join(os.path.expanduser("~"), ".system_info_agent", "spool")
+
+
+def spool_from_env() -> Optional[Spool]:
+    directory = os.getenv('SYSTEM_INFO_SPOOL_DIR', default_spool_dir())
+    if not directory:
+        return None
+    return Spool(
+        directory,
+        max_bytes=int(os.getenv('SYSTEM_INFO_SPOOL_MAX_MB', 50)) * 1024 * 1024,
+        max_age=float(os.getenv('SYSTEM_INFO_SPOOL_MAX_AGE_HOURS', 168)) * 3600,
+    )
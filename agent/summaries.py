@@ -0,0 +1,105 @@
+from array import array
+from math import ceil
+from typing import Dict, Iterable, Optional
+
+# Скорости из network_stats, для которых считаются сводки за интервал
+NETWORK_SUMMARY_KEYS = (
+    "bytes_sent_per_sec",
+    "bytes_recv_per_sec",
+    "packets_sent_per_sec",
+    "packets_recv_per_sec",
+)
+
+
+class SampleBuffer:
+    """
+    Fixed-size ring buffer of float readings backed by ``array('d')``.
+
+    Memory does not grow with the sampling rate: once ``capacity`` readings
+    are stored, each new one overwrites the oldest.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("Buffer capacity must be positive")
+        self._values = array('d', bytes(8 * capacity))
+        self._next = 0
+        self._count = 0
+        self._last = 0.0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, value: float):
+        value = float(value)
+        self._values[self._next] = value
+        self._next = (self._next + 1) % len(self._values)
+        self._count = min(self._count + 1, len(self._values))
+        self._last = value
+
+    def summary(self) -> Optional[Dict]:
+        """count/min/max/mean/p95 (nearest rank)/last of the stored readings, None if empty."""
+        if not self._count:
+            return None
+        values = sorted(self._values[:self._count])
+        return {
+            "count": self._count,
+            "min": values[0],
+            "max": values[-1],
+            "mean": sum(values) / self._count,
+            "p95": values[max(ceil(0.95 * self._count) - 1, 0)],
+            "last": self._last,
+        }
+
+    def clear(self):
+        self._next = 0
+        self._count = 0
+
+
+class IntervalSummaries:
+    """
+    High-rate CPU, memory and network readings between two uploads.
+
+    The scheduler feeds every fast collector result in; ``take`` returns the
+    per-interval summaries in the shape of the ``*_summary`` sample fields and
+    starts the next interval.
+    """
+
+    def __init__(self, capacity: int):
+        self.cpu = SampleBuffer(capacity)
+        self.memory = SampleBuffer(capacity)
+        self.network = {key: SampleBuffer(capacity) for key in NETWORK_SUMMARY_KEYS}
+
+    @classmethod
+    def for_intervals(cls, upload_interval: float, sample_intervals: Iterable[float]) -> "IntervalSummaries":
+        # Запас в два раза: интервал отправки может растянуться, пока цикл занят
+        fastest = min(sample_intervals)
+        return cls(max(ceil(upload_interval / fastest) * 2, 1) if fastest > 0 else 1)
+
+    def add(self, name: str, value):
+        if name == "cpu":
+            self.cpu.append(value)
+        elif name == "memory":
+            self.memory.append(value["used"])
+        elif name == "network":
+            for key, buffer in self.network.items():
+                # Скоростей нет в первом замере после запуска
+                if key in value:
+                    buffer.append(value[key])
+
+    def take(self) -> Dict:
+        summaries = {}
+        cpu = self.cpu.summary()
+        if cpu is not None:
+            summaries["cpu_summary"] = cpu
+        memory = self.memory.summary()
+        if memory is not None:
+            summaries["memory_summary"] = memory
+        network = {key: buffer.summary() for key, buffer in self.network.items() if len(buffer)}
+        if network:
+            summaries["network_summary"] = network
+        self.cpu.clear()
+        self.memory.clear()
+        for buffer in self.network.values():
+            buffer.clear()
+        return summaries
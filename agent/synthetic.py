@@ -0,0 +1,158 @@
+"""
+Synthetic collectors for load tests: realistic payloads without touching the
+machine the benchmark runs on.
+"""
+import random
+import time
+from typing import Dict, List
+
+import requests
+
+from identity import IdentityCache
+from samplers import PROCESS_SORT_KEYS
+from spool import Spool
+from summaries import IntervalSummaries
+from system_info import SystemInfoCollector
+from wire import JSON
+
+PROCESS_NAMES = (
+    "systemd", "sshd", "nginx", "postgres", "python3", "java", "node", "dockerd",
+    "containerd", "chrome", "code", "bash", "cron", "rsyslogd", "redis-server", "kworker",
+)
+MOUNTPOINTS = ("/", "/boot", "/home", "/var", "/data", "/srv")
+MEMORY_SIZES_GB = (4, 8, 16, 32, 64, 128)
+DISK_SIZES_GB = (32, 128, 256, 512, 1024, 2048)
+
+
+def _walk(rng: random.Random, value: float, step: float, low: float, high: float) -> float:
+    # Случайное блуждание с отражением от границ
+    value += rng.uniform(-step, step)
+    if value < low:
+        return 2 * low - value
+    if value > high:
+        return 2 * high - value
+    return value
+
+
+class SyntheticCollector(SystemInfoCollector):
+    """
+    Collector of a virtual machine number ``index``. Readings are bounded
+    random walks seeded by the index, so every run sends the same sequence;
+    registration, wire format negotiation, spooling and sending are the
+    regular agent code. With ``summary_readings`` every sample also carries
+    interval summaries over that many extra high-rate readings.
+    """
+
+    def __init__(self, api_url: str, index: int, spool: Spool = None, process_sort: str = "cpu",
+                 identity: IdentityCache = None, mounts: int = 3, processes: int = 40,
+                 hostname_prefix: str = "synthetic", summary_readings: int = 0):
+        # Базовый конструктор не вызывается: он опрашивает систему через psutil и /proc
+        self.api_url = api_url
+        self.spool = spool
+        self.process_sort = process_sort
+        self.identity = identity
+        self.computer_id = None
+        self.session = requests.Session()
+        self.session.mount(api_url, requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.hostname = f"{hostname_prefix}-{index:05d}"
+        self.ip_address = f"10.{(index >> 16) & 0xff}.{(index >> 8) & 0xff}.{index & 0xff}"
+        self.mac_address = "02:00:" + ":".join(f"{(index >> shift) & 0xff:02x}" for shift in (24, 16, 8, 0))
+        self.os_info = "Linux 6.1.0-synthetic"
+        self.procfs = None
+        self.engine = "synthetic"
+
+        self.wire_formats = None
+        self.content_type = JSON
+        self.delta = None
+        self._network_last = None
+
+        self.random = random.Random(index)
+        rng = self.random
+        self._cpu = rng.uniform(2, 60)
+        self._memory_total = float(rng.choice(MEMORY_SIZES_GB))
+        self._memory_used = self._memory_total * rng.uniform(0.2, 0.7)
+        self._disks = {}
+        for mountpoint in MOUNTPOINTS[:max(mounts, 1)]:
+            total = float(rng.choice(DISK_SIZES_GB))
+            self._disks[mountpoint] = [total, total * rng.uniform(0.1, 0.8)]
+        self._counters = {
+            "bytes_sent": rng.randrange(10 ** 9), "bytes_recv": rng.randrange(10 ** 10),
+            "packets_sent": rng.randrange(10 ** 7), "packets_recv": rng.randrange(10 ** 8),
+        }
+        # Средняя скорость интерфейса в байтах в секунду
+        self._bandwidth = rng.uniform(1e4, 5e7)
+        self._counters_at = time.monotonic()
+        self._processes = [
+            {"pid": rng.randrange(2, 4 * 10 ** 6), "name": rng.choice(PROCESS_NAMES),
+             "cpu_percent": rng.expovariate(1.0), "memory_percent": rng.expovariate(2.0),
+             "memory_rss": rng.randrange(10 ** 6, 2 * 10 ** 9), "io_bytes": 0}
+            for _ in range(processes)
+        ]
+        self.summary_readings = summary_readings
+        self.summaries = IntervalSummaries(summary_readings) if summary_readings else None
+
+    def get_cpu_usage(self) -> float:
+        self._cpu = _walk(self.random, self._cpu, 8.0, 0.0, 100.0)
+        return round(self._cpu, 1)
+
+    def get_memory_info(self) -> Dict[str, float]:
+        self._memory_used = _walk(self.random, self._memory_used, self._memory_total * 0.02,
+                                  self._memory_total * 0.05, self._memory_total * 0.98)
+        return {"total": self._memory_total, "used": self._memory_used}
+
+    def get_disk_usage(self) -> Dict[str, Dict]:
+        disk_info = {}
+        for mountpoint, disk in self._disks.items():
+            total, used = disk
+            # Диски в основном заполняются, изредка освобождаются
+            disk[1] = used = min(max(used + self.random.uniform(-0.002, 0.01), 0.0), total)
+            disk_info[mountpoint] = {"total": total, "used": used, "percent": round(used / total * 100, 1)}
+        return disk_info
+
+    def get_running_processes(self, limit: int = 10, sort_by: str = None) -> List[Dict]:
+        sort_by = sort_by or self.process_sort
+        if sort_by not in PROCESS_SORT_KEYS:
+            raise ValueError(f"Unknown process sort key: {sort_by}")
+        rng = self.random
+        for process in self._processes:
+            process["cpu_percent"] = round(_walk(rng, process["cpu_percent"], 1.0, 0.0, 100.0), 1)
+            process["memory_percent"] = _walk(rng, process["memory_percent"], 0.05, 0.0, 50.0)
+            process["io_bytes"] = int(rng.expovariate(1e-5))
+        key = PROCESS_SORT_KEYS[sort_by]
+        top = sorted(self._processes, key=lambda process: process[key], reverse=True)[:limit]
+        # Как и настоящие семплеры, io_bytes отдается только при сортировке по io
+        fields = None if sort_by == "io" else ("pid", "name", "cpu_percent", "memory_percent", "memory_rss")
+        return [dict(process) if fields is None else {field: process[field] for field in fields}
+                for process in top]
+
+    def get_network_stats(self) -> Dict:
+        now = time.monotonic()
+        elapsed = now - self._counters_at
+        self._counters_at = now
+        received = self._bandwidth * elapsed * self.random.uniform(0.5, 1.5)
+        sent = received * self.random.uniform(0.1, 0.6)
+        counters = self._counters
+        counters["bytes_recv"] += int(received)
+        counters["bytes_sent"] += int(sent)
+        counters["packets_recv"] += int(received / 1200)
+        counters["packets_sent"] += int(sent / 800)
+        return self._add_network_rates(dict(counters))
+
+    def _interval_summaries(self) -> Dict:
+        rng = self.random
+        for _ in range(self.summary_readings):
+            self.summaries.add("cpu", self.get_cpu_usage())
+            self.summaries.add("memory", self.get_memory_info())
+            received = self._bandwidth * rng.uniform(0.5, 1.5)
+            sent = received * rng.uniform(0.1, 0.6)
+            self.summaries.add("network", {
+                "bytes_sent_per_sec": sent, "bytes_recv_per_sec": received,
+                "packets_sent_per_sec": sent / 800, "packets_recv_per_sec": received / 1200,
+            })
+        return self.summaries.take()
+
+    def collect_system_info(self, computer_id: int) -> Dict:
+        sample = super().collect_system_info(computer_id)
+        if self.summaries is not None:
+            sample.update(self._interval_summaries())
+        return sample
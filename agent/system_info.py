@@ -1,6 +1,7 @@
 import psutil
 import platform
 import requests
+import asyncio
 import time
 import socket
 import uuid
@@ -9,20 +10,67 @@ from typing import Dict, List
 import os
 import logging
 
+from disks import DiskCollector, disk_collector_from_env
+from identity import ComputerNotFound, IdentityCache, identity_from_env
+from metrics import agent_metrics, metrics_from_env, payload_log_sampled
+from procfs import ProcfsCollector, procfs_available
+from samplers import CpuSampler, ProcessSampler
+from scheduler import CollectionScheduler, backoff_delay, intervals_from_env
+from spool import Spool, spool_from_env
+from wire import JSON, DeltaEncoder, choose_content_type, encode_body, rejected_permanently
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO, 
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+COLLECTOR_ENGINES = ("auto", "psutil", "procfs")
+
+
+def drop_rejected(response: requests.Response, what: str):
+    agent_metrics.sample_dropped()
+    logging.warning(f"Backend rejected {what} with {response.status_code}, dropping it: {response.text[:500]}")
+
 class SystemInfoCollector:
-    def __init__(self, api_url: str):
+    def __init__(self, api_url: str, spool: Spool = None, process_sort: str = "cpu",
+                 engine: str = "auto", identity: IdentityCache = None, disks: DiskCollector = None):
+        if engine not in COLLECTOR_ENGINES:
+            raise ValueError(f"Unknown collector engine: {engine}")
         self.api_url = api_url
+        self.spool = spool
+        self.process_sort = process_sort
+        self.identity = identity
+        self.computer_id = None
+        # Одна сессия с keep-alive на все запросы к backend
+        self.session = requests.Session()
+        self.session.mount(api_url, requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=2))
         self.hostname = socket.gethostname()
         self.ip_address = socket.gethostbyname(self.hostname)
         self.mac_address = ':'.join(['{:02x}'.format((uuid.getnode() >> elements) & 0xff)
                                    for elements in range(0,2*6,2)][::-1])
         self.os_info = f"{platform.system()} {platform.release()}"
+        # Семплеры хранят состояние между циклами и не блокируют цикл сбора
+        own_pids = {os.getpid()}
+        self.cpu_sampler = CpuSampler()
+        self.process_sampler = ProcessSampler(sort_by=process_sort, exclude_pids=own_pids)
+        # Список дисков кэшируется, зависшая точка монтирования не блокирует сбор
+        self.disks = disks or DiskCollector()
+
+        # На Linux CPU, память, сеть и процессы читаются напрямую из /proc
+        self.procfs = None
+        if engine != "psutil":
+            if procfs_available():
+                self.procfs = ProcfsCollector(exclude_pids=own_pids)
+            elif engine == "procfs":
+                logging.warning("/proc is not available, falling back to psutil collector")
+        self.engine = "procfs" if self.procfs is not None else "psutil"
+
+        # Компактный формат включается только после согласования с backend
+        self.wire_formats = None
+        self.content_type = JSON
+        self.delta = None
+        self._network_last = None
 
     def register_computer(self):
         computer_data = {
@@ -32,12 +80,12 @@ class SystemInfoCollector:
             "os_info": self.os_info
         }
         try:
-            response = requests.post(f"{self.api_url}/system-info/computers/", 
-                                     json=computer_data, 
-                                     timeout=10)  # Добавляем таймаут
+            response = self._timed("register", self.session.post, f"{self.api_url}/system-info/computers/",
+                                   json=computer_data,
+                                   timeout=10)  # Добавляем таймаут
             response.raise_for_status()
             logging.info(f"Successfully registered computer: {computer_data}")
-            logging.info(f"Response from server: {response.json()}")
+            logging.debug(f"Response from server: {response.json()}")
             return response.json().get('id')
         except requests.exceptions.RequestException as e:
             logging.error(f"Failed to register computer: {e}")
@@ -45,10 +93,46 @@ class SystemInfoCollector:
             logging.error(f"Request data: {computer_data}")
             raise
 
+    def ensure_registered(self, force: bool = False) -> int:
+        """
+        Return the computer id, registering only if no id is cached for this
+        machine and backend (or ``force`` is set, e.g. after the backend
+        answered 404 for the cached id).
+        """
+        if not force:
+            if self.computer_id is not None:
+                return self.computer_id
+            if self.identity is not None:
+                cached_id = self.identity.load(self.api_url, self.hostname, self.mac_address)
+                if cached_id is not None:
+                    logging.info(f"Using cached computer id {cached_id}, skipping registration")
+                    self.computer_id = cached_id
+                    return cached_id
+        else:
+            self.computer_id = None
+            if self.identity is not None:
+                self.identity.clear()
+
+        self.computer_id = self.register_computer()
+        if self.delta is not None:
+            # Базовый снимок принадлежал прежнему id
+            self.delta.reset()
+        if self.identity is not None:
+            self.identity.save(self.computer_id, self.api_url, self.hostname, self.mac_address)
+        return self.computer_id
+
     def get_cpu_usage(self) -> float:
-        return psutil.cpu_percent(interval=1)
+        if self.procfs is not None:
+            return self.procfs.cpu_usage()
+        return self.cpu_sampler.sample()
 
     def get_memory_info(self) -> Dict[str, float]:
+        if self.procfs is not None:
+            memory = self.procfs.memory_bytes()
+            return {
+                "total": memory["total"] / (1024 ** 3),  # GB
+                "used": memory["used"] / (1024 ** 3)     # GB
+            }
         memory = psutil.virtual_memory()
         return {
             "total": memory.total / (1024 ** 3),  # GB
@@ -56,98 +140,261 @@ class SystemInfoCollector:
         }
 
     def get_disk_usage(self) -> Dict[str, Dict]:
-        disk_info = {}
-        for partition in psutil.disk_partitions():
-            try:
-                usage = psutil.disk_usage(partition.mountpoint)
-                disk_info[partition.mountpoint] = {
-                    "total": usage.total / (1024 ** 3),  # GB
-                    "used": usage.used / (1024 ** 3),    # GB
-                    "percent": usage.percent
-                }
-            except Exception:
-                continue
-        return disk_info
-
-    def get_running_processes(self, limit: int = 10) -> list:
-        processes = []
-        for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-            try:
-                processes.append(proc.info)
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                pass
-        return sorted(processes, key=lambda x: x.get('cpu_percent', 0), reverse=True)[:limit]
+        return self.disks.usage()
+
+    def get_running_processes(self, limit: int = 10, sort_by: str = None) -> list:
+        if self.procfs is not None:
+            return self.procfs.processes(limit=limit, sort_by=sort_by or self.process_sort)
+        return self.process_sampler.sample(limit=limit, sort_by=sort_by)
 
     def get_network_stats(self) -> Dict:
-        network_stats = psutil.net_io_counters()
-        return {
-            "bytes_sent": network_stats.bytes_sent,
-            "bytes_recv": network_stats.bytes_recv,
-            "packets_sent": network_stats.packets_sent,
-            "packets_recv": network_stats.packets_recv
-        }
+        if self.procfs is not None:
+            network_stats = self.procfs.network_counters()
+        else:
+            counters = psutil.net_io_counters()
+            network_stats = {
+                "bytes_sent": counters.bytes_sent,
+                "bytes_recv": counters.bytes_recv,
+                "packets_sent": counters.packets_sent,
+                "packets_recv": counters.packets_recv
+            }
+        return self._add_network_rates(network_stats)
+
+    def _add_network_rates(self, network_stats: Dict) -> Dict:
+        # Скорости считаются на агенте, чтобы backend не читал предыдущие замеры
+        now = time.monotonic()
+        last = self._network_last
+        self._network_last = (now, dict(network_stats))
+        if last is None or now <= last[0]:
+            return network_stats
+
+        elapsed = now - last[0]
+        for key in ("bytes_sent", "bytes_recv", "packets_sent", "packets_recv"):
+            # Счетчики могут сброситься (перезапуск интерфейса) - тогда скорость 0
+            delta = network_stats[key] - last[1][key]
+            network_stats[f"{key}_per_sec"] = round(max(delta, 0) / elapsed, 2)
+        return network_stats
+
+    def negotiate_wire_format(self):
+        """Switch to msgpack/gzip and delta frames if the backend supports them."""
+        try:
+            response = self.session.get(f"{self.api_url}/system-info/wire-formats", timeout=10)
+            response.raise_for_status()
+            wire_formats = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logging.info(f"Compact wire format is not available, using plain JSON: {e}")
+            return
+
+        self.wire_formats = wire_formats
+        self.content_type = choose_content_type(wire_formats)
+        self.delta = DeltaEncoder() if wire_formats.get("delta_frames") else None
+        logging.info(f"Using {self.content_type} wire format, delta frames: {self.delta is not None}")
+
+    @staticmethod
+    def _timed(kind: str, request, *args, **kwargs) -> requests.Response:
+        started = time.perf_counter()
+        status = None
+        try:
+            response = request(*args, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            agent_metrics.request_finished(kind, time.perf_counter() - started, status)
+
+    def _post(self, kind: str, url: str, payload, timeout: float) -> requests.Response:
+        if self.wire_formats is None:
+            return self._timed(kind, self.session.post, url, json=payload, timeout=timeout)
+        body, headers = encode_body(payload, self.content_type)
+        return self._timed(kind, self.session.post, url, data=body, headers=headers, timeout=timeout)
 
     def send_system_info(self, computer_id: int, system_info: Dict):
-        logging.info(f"Sending system info for computer {computer_id}")
-        logging.info(f"System info data: {system_info}")
+        logging.debug(f"Sending system info for computer {computer_id}")
+        if payload_log_sampled():
+            logging.debug(f"System info data: {system_info}")
+
+        if self.delta is not None:
+            return self._send_system_info_frame(computer_id, system_info)
         
         try:
-            response = requests.post(
-                f"{self.api_url}/system-info/computers/{computer_id}/system-info/", 
-                json=system_info, 
+            response = self._post(
+                "single",
+                f"{self.api_url}/system-info/computers/{computer_id}/system-info/",
+                system_info,
                 timeout=10
             )
+            if response.status_code == 404:
+                raise ComputerNotFound(computer_id)
+            if rejected_permanently(response.status_code):
+                # Повтор получит тот же ответ и задержит все следующие замеры
+                drop_rejected(response, "a sample")
+                return
             response.raise_for_status()
-            logging.info("System info sent successfully")
-            logging.info(f"Server response: {response.json()}")
+            logging.debug(f"System info sent successfully, server response: {response.text}")
         except requests.exceptions.RequestException as e:
             logging.error(f"Failed to send system info: {e}")
             logging.error(f"URL: {self.api_url}/system-info/computers/{computer_id}/system-info/")
-            logging.error(f"Data: {system_info}")
+            if payload_log_sampled():
+                logging.debug(f"Data: {system_info}")
             raise
 
-    def collect_and_send_info(self, computer_id: int):
+    def _send_system_info_frame(self, computer_id: int, system_info: Dict):
+        url = f"{self.api_url}/system-info/computers/{computer_id}/system-info/frame"
         try:
-            memory_info = self.get_memory_info()
-            data = {
-                "computer_id": computer_id,
-                "cpu_usage": self.get_cpu_usage(),
-                "memory_total": memory_info['total'],
-                "memory_used": memory_info['used'],
-                "disk_usage": self.get_disk_usage(),
-                "running_processes": self.get_running_processes(),
-                "network_stats": self.get_network_stats(),
-                "timestamp": datetime.now().isoformat()
-            }
-            self.send_system_info(computer_id, data)
-        except Exception as e:
-            logging.error(f"Failed to collect and send system info: {e}")
+            response = self._post("frame", url, self.delta.frame(system_info), timeout=10)
+            if response.status_code == 409:
+                # Backend не знает базовый снимок - отправляем полный кадр
+                agent_metrics.retried("frame_base")
+                self.delta.reset()
+                response = self._post("frame", url, self.delta.frame(system_info), timeout=10)
+            if response.status_code == 404:
+                raise ComputerNotFound(computer_id)
+            if rejected_permanently(response.status_code):
+                drop_rejected(response, "a sample frame")
+                return
+            response.raise_for_status()
+            ack = response.json()
+            self.delta.acknowledge(ack['id'], system_info)
+            logging.debug(f"System info frame acknowledged as snapshot {ack['id']}")
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Failed to send system info frame: {e}")
+            logging.error(f"URL: {url}")
+            raise
+
+    def send_system_info_batch(self, items: List[Dict]) -> Dict:
+        logging.debug(f"Sending batch of {len(items)} system info samples")
+
+        try:
+            result = self._send_batch(items)
+            logging.info(f"Batch sent: {result['accepted']} accepted, {result['rejected']} rejected")
+
+            if self.delta is not None:
+                # Последний принятый снимок становится базой для следующих дельта-кадров
+                created = [item for item in result['items'] if item['status'] == 'created']
+                if created:
+                    self.delta.acknowledge(created[-1]['id'], items[created[-1]['index']])
+            return result
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Failed to send system info batch: {e}")
+            logging.error(f"URL: {self.api_url}/system-info/batch")
             raise
 
+    def _send_batch(self, items: List[Dict], offset: int = 0) -> Dict:
+        """
+        Post one batch. A batch the backend refuses for good (422 for an
+        invalid sample, 413 for its size) is split in halves until the refused
+        samples are isolated; those are reported as ``rejected`` items.
+        """
+        response = self._post("batch", f"{self.api_url}/system-info/batch", {"items": items}, timeout=30)
+        if rejected_permanently(response.status_code):
+            if len(items) == 1:
+                drop_rejected(response, "a spooled sample")
+                return {"accepted": 0, "rejected": 1, "items": [{
+                    "index": offset, "computer_id": items[0].get("computer_id"),
+                    "status": "rejected", "detail": response.text
+                }]}
+            middle = len(items) // 2
+            first = self._send_batch(items[:middle], offset)
+            second = self._send_batch(items[middle:], offset + middle)
+            return {
+                "accepted": first["accepted"] + second["accepted"],
+                "rejected": first["rejected"] + second["rejected"],
+                "items": first["items"] + second["items"],
+            }
+        response.raise_for_status()
+        result = response.json()
+        for item in result["items"]:
+            item["index"] += offset
+        return result
+
+    def collect_system_info(self, computer_id: int) -> Dict:
+        memory_info = self.get_memory_info()
+        return {
+            "computer_id": computer_id,
+            "cpu_usage": self.get_cpu_usage(),
+            "memory_total": memory_info['total'],
+            "memory_used": memory_info['used'],
+            "disk_usage": self.get_disk_usage(),
+            "running_processes": self.get_running_processes(),
+            "network_stats": self.get_network_stats(),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    def flush_spool(self, batch_size: int = 500) -> int:
+        """
+        Replay spooled samples oldest first. A lone pending sample goes through the
+        regular endpoint, a backlog goes out in batches of ``batch_size``.
+        Stops at the first failed request; unsent samples stay in the spool.
+        Samples the backend refuses for good are dropped, not retried.
+        """
+        sent = 0
+        while True:
+            records, cursor = self.spool.read_batch(batch_size)
+            if not records:
+                return sent
+
+            if self.computer_id is not None:
+                # Замеры могли попасть в буфер до повторной регистрации под новым id
+                for record in records:
+                    record['computer_id'] = self.computer_id
+
+            if len(records) == 1:
+                self.send_system_info(records[0]['computer_id'], records[0])
+            else:
+                result = self.send_system_info_batch(records)
+                unknown = [item for item in result['items'] if item['status'] == 'not_found']
+                if unknown:
+                    # Оставляем пачку в буфере: после регистрации она уйдет под новым id
+                    raise ComputerNotFound(unknown[0]['computer_id'])
+                if result['rejected']:
+                    logging.warning(f"Backend rejected {result['rejected']} spooled samples, dropping them")
+
+            self.spool.commit(cursor)
+            sent += len(records)
+
 def main():
     API_URL = os.getenv('SYSTEM_INFO_API_URL', 'http://localhost:8000/api/v1')
     INTERVAL = int(os.getenv('SYSTEM_INFO_INTERVAL', 60))
     MAX_RETRIES = int(os.getenv('SYSTEM_INFO_MAX_RETRIES', 5))
+    BATCH_SIZE = int(os.getenv('SYSTEM_INFO_BATCH_SIZE', 500))
+    PROCESS_SORT = os.getenv('SYSTEM_INFO_PROCESS_SORT', 'cpu')
+    ENGINE = os.getenv('SYSTEM_INFO_COLLECTOR_ENGINE', 'auto')
+    WIRE_FORMAT = os.getenv('SYSTEM_INFO_WIRE_FORMAT', 'compact')
+    SUMMARIES = os.getenv('SYSTEM_INFO_SUMMARIES', '1') != '0'
 
-    collector = SystemInfoCollector(API_URL)
+    spool = spool_from_env()
+    metrics_from_env()
+    collector = SystemInfoCollector(API_URL, spool=spool, process_sort=PROCESS_SORT, engine=ENGINE,
+                                    identity=identity_from_env(), disks=disk_collector_from_env())
+    logging.info(f"Using {collector.engine} collector engine")
+    scheduler = CollectionScheduler(
+        collector,
+        spool=spool,
+        upload_interval=INTERVAL,
+        intervals=intervals_from_env(),
+        batch_size=BATCH_SIZE,
+        summaries=SUMMARIES
+    )
     
     retry_count = 0
-    while retry_count < MAX_RETRIES:
-        try:
-            computer_id = collector.register_computer()
-            
-            while True:
-                try:
-                    collector.collect_and_send_info(computer_id)
-                    time.sleep(INTERVAL)
-                except requests.exceptions.RequestException:
-                    logging.warning(f"Failed to send system info. Retrying in {INTERVAL} seconds...")
-                    time.sleep(INTERVAL)
-        
-        except requests.exceptions.RequestException as e:
-            retry_count += 1
-            logging.warning(f"Registration failed (attempt {retry_count}/{MAX_RETRIES}): {e}")
-            time.sleep(INTERVAL)
+    try:
+        while retry_count < MAX_RETRIES:
+            try:
+                computer_id = collector.ensure_registered()
+                if WIRE_FORMAT == 'compact':
+                    collector.negotiate_wire_format()
+                retry_count = 0
+
+                # Сбор и отправка идут в цикле asyncio, каждый коллектор со своим интервалом
+                asyncio.run(scheduler.run(computer_id))
+
+            except requests.exceptions.RequestException as e:
+                retry_count += 1
+                agent_metrics.retried("register")
+                delay = backoff_delay(retry_count, base=5, cap=INTERVAL)
+                logging.warning(f"Registration failed (attempt {retry_count}/{MAX_RETRIES}): {e}")
+                time.sleep(delay)
+    finally:
+        scheduler.shutdown()
     
     logging.error("Failed to register computer after maximum retries")
 
@@ -0,0 +1,43 @@
+from collections import namedtuple
+
+import psutil
+
+from disks import DiskCollector
+
+Partition = namedtuple("Partition", "device mountpoint fstype opts")
+
+
+def monitored(monkeypatch, partitions):
+    monkeypatch.setattr(psutil, "disk_partitions", lambda all=False: [Partition(*p, "rw") for p in partitions])
+    collector = DiskCollector()
+    try:
+        collector.refresh_mounts()
+        return collector.mounts
+    finally:
+        collector.shutdown()
+
+
+def test_container_root_on_overlay_is_kept(monkeypatch):
+    assert monitored(monkeypatch, [
+        ("overlay", "/", "overlay"),
+        ("proc", "/proc", "proc"),
+        ("tmpfs", "/dev", "tmpfs"),
+        ("/dev/sda1", "/etc/hosts", "ext4"),
+        ("overlay", "/var/lib/app", "overlay"),
+    ]) == ["/", "/etc/hosts"]
+
+
+def test_live_root_on_squashfs_is_kept(monkeypatch):
+    assert monitored(monkeypatch, [
+        ("/dev/loop0", "/", "squashfs"),
+        ("/dev/loop1", "/snap/core/1", "squashfs"),
+        ("/dev/sda2", "/home", "ext4"),
+    ]) == ["/", "/home"]
+
+
+def test_bind_mounts_of_one_device_are_counted_once(monkeypatch):
+    assert monitored(monkeypatch, [
+        ("/dev/sda1", "/srv/data", "ext4"),
+        ("/dev/sda1", "/", "ext4"),
+        ("/dev/sdb1", "/var/lib/docker/overlay2", "xfs"),
+    ]) == ["/"]
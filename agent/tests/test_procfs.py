@@ -0,0 +1,50 @@
+import threading
+
+import pytest
+
+from procfs import ProcFile, ProcfsCollector, procfs_available
+
+
+def test_proc_file_grows_buffer(tmp_path):
+    path = tmp_path / "meminfo"
+    content = b"".join(b"Line%05d: %d kB\n" % (i, i) for i in range(2000))
+    path.write_bytes(content)
+
+    proc_file = ProcFile(str(path), size=64)
+    assert proc_file.read() == content
+    assert proc_file.read() == content
+    proc_file.close()
+
+
+def test_proc_file_concurrent_reads(tmp_path):
+    path = tmp_path / "meminfo"
+    content = b"".join(b"Line%05d: %d kB\n" % (i, i) for i in range(2000))
+    path.write_bytes(content)
+    proc_file = ProcFile(str(path), size=64)
+    results = []
+
+    def reader():
+        results.extend(proc_file.read() for _ in range(50))
+
+    # Цикл событий и поток пула читают один и тот же файл
+    threads = [threading.Thread(target=reader) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    proc_file.close()
+
+    assert len(results) == 400
+    assert all(result == content for result in results)
+
+
+@pytest.mark.skipif(not procfs_available(), reason="needs Linux /proc")
+def test_collector_reads_proc():
+    collector = ProcfsCollector()
+    memory = collector.memory_bytes()
+    assert 0 < memory["used"] <= memory["total"]
+    assert 0.0 <= collector.cpu_usage() <= 100.0
+    processes = collector.processes(limit=3, sort_by="rss")
+    assert 0 < len(processes) <= 3
+    assert processes == sorted(processes, key=lambda info: info["memory_rss"], reverse=True)
+    collector.close()
@@ -0,0 +1,109 @@
+import json
+
+import pytest
+import requests
+
+from identity import ComputerNotFound
+from metrics import agent_metrics
+from system_info import SystemInfoCollector
+from wire import rejected_permanently
+
+API_URL = "http://backend.test/api/v1"
+
+
+def make_response(status_code, payload=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(payload if payload is not None else {"detail": "error"}).encode("utf-8")
+    return response
+
+
+class FakeSession:
+    """Answers POST requests with a handler and remembers what was sent."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.posts = []
+
+    def post(self, url, json=None, **kwargs):
+        self.posts.append((url, json))
+        return self.handler(url, json)
+
+
+@pytest.fixture
+def collector():
+    collector = SystemInfoCollector(API_URL, engine="psutil")
+    collector.session.close()
+    return collector
+
+
+@pytest.fixture
+def dropped(monkeypatch):
+    calls = []
+    monkeypatch.setattr(agent_metrics, "sample_dropped", lambda: calls.append(1))
+    return calls
+
+
+def test_rejected_permanently():
+    for status in (400, 413, 422):
+        assert rejected_permanently(status)
+    for status in (200, 404, 408, 429, 500, 503):
+        assert not rejected_permanently(status)
+
+
+def test_send_system_info_drops_rejected_sample(collector, dropped):
+    collector.session = FakeSession(lambda url, payload: make_response(422))
+
+    collector.send_system_info(1, {"cpu_usage": 1.0})
+
+    assert len(dropped) == 1
+    assert len(collector.session.posts) == 1
+
+
+def test_send_system_info_retries_unknown_computer(collector):
+    collector.session = FakeSession(lambda url, payload: make_response(404))
+    with pytest.raises(ComputerNotFound):
+        collector.send_system_info(1, {"cpu_usage": 1.0})
+
+
+def test_send_system_info_raises_on_server_error(collector):
+    collector.session = FakeSession(lambda url, payload: make_response(503))
+    with pytest.raises(requests.exceptions.HTTPError):
+        collector.send_system_info(1, {"cpu_usage": 1.0})
+
+
+def batch_handler(url, payload):
+    items = payload["items"]
+    if any(item.get("bad") for item in items):
+        return make_response(422)
+    return make_response(200, {
+        "accepted": len(items),
+        "rejected": 0,
+        "items": [{"index": i, "computer_id": item["computer_id"], "status": "created", "id": 100 + item["n"]}
+                  for i, item in enumerate(items)],
+    })
+
+
+def test_send_batch_isolates_rejected_sample(collector, dropped):
+    collector.session = FakeSession(batch_handler)
+    items = [{"computer_id": 1, "n": n, "bad": n == 5} for n in range(8)]
+
+    result = collector.send_system_info_batch(items)
+
+    assert result["accepted"] == 7
+    assert result["rejected"] == 1
+    assert len(dropped) == 1
+    by_index = {item["index"]: item for item in result["items"]}
+    assert sorted(by_index) == list(range(8))
+    assert by_index[5]["status"] == "rejected"
+    # Индексы после деления пачки указывают на исходные позиции
+    for index, item in by_index.items():
+        if index != 5:
+            assert item["id"] == 100 + index
+
+
+def test_send_batch_raises_on_retryable_error(collector):
+    collector.session = FakeSession(lambda url, payload: make_response(429))
+    with pytest.raises(requests.exceptions.HTTPError):
+        collector.send_system_info_batch([{"computer_id": 1, "n": 0}])
+    assert len(collector.session.posts) == 1
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+import requests
+
+from relay import RegistrationCache, Relay
+from spool import Spool
+from wire import JSON
+
+
+def make_response(status_code, payload):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(payload).encode("utf-8")
+    return response
+
+
+class FakeUpstream:
+    """Batch endpoint of the backend; ``refuse`` returns the status for a batch or None."""
+
+    def __init__(self, refuse):
+        self.refuse = refuse
+        self.batches = []
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        items = json.loads(data)["items"]
+        self.batches.append([item["n"] for item in items])
+        status = self.refuse(items)
+        if status is not None:
+            return make_response(status, {"detail": "refused"})
+        return make_response(200, {
+            "accepted": len(items),
+            "rejected": 0,
+            "items": [{"index": i, "computer_id": item["computer_id"], "status": "created"}
+                      for i, item in enumerate(items)],
+        })
+
+
+@pytest.fixture
+def relay(tmp_path):
+    relay = Relay("http://backend.test/api/v1", Spool(str(tmp_path / "spool"), fsync=False),
+                  RegistrationCache(str(tmp_path / "registrations.json")), batch_size=100)
+    relay.session.close()
+    relay.content_type = JSON
+    yield relay
+    relay.spool.close()
+
+
+def records(count):
+    return [{"computer_id": 1, "n": n} for n in range(count)]
+
+
+def test_oversized_batch_is_split(relay):
+    relay.session = FakeUpstream(lambda items: 413 if len(items) > 2 else None)
+
+    assert relay._send(records(8)) == (8, [])
+    assert sorted(n for batch in relay.session.batches if len(batch) <= 2 for n in batch) == list(range(8))
+
+
+def test_refused_sample_is_dropped(relay):
+    relay.session = FakeUpstream(lambda items: 422 if any(item["n"] == 3 for item in items) else None)
+
+    assert relay._send(records(8)) == (7, [])
+
+
+def test_other_client_errors_are_permanent(relay):
+    relay.session = FakeUpstream(lambda items: 400)
+
+    assert relay._send(records(2)) == (0, [])
+
+
+@pytest.mark.parametrize("status", [404, 408, 429, 503])
+def test_retryable_errors_keep_the_batch(relay, status):
+    relay.session = FakeUpstream(lambda items: status)
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        relay._send(records(4))
+    assert relay.session.batches == [[0, 1, 2, 3]]
@@ -0,0 +1,107 @@
+import json
+import os
+
+from spool import CURSOR_FILE, SEGMENT_SUFFIX, Spool
+
+
+def open_spool(directory, **kwargs):
+    kwargs.setdefault("fsync", False)
+    return Spool(str(directory), **kwargs)
+
+
+def segment_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX))
+
+
+def test_append_read_commit_round_trip(tmp_path):
+    spool = open_spool(tmp_path)
+    for i in range(5):
+        spool.append({"n": i})
+
+    records, cursor = spool.read_batch(3)
+    assert [r["n"] for r in records] == [0, 1, 2]
+    # Без подтверждения та же пачка читается снова
+    assert spool.read_batch(3)[0] == records
+
+    spool.commit(cursor)
+    records, cursor = spool.read_batch(10)
+    assert [r["n"] for r in records] == [3, 4]
+    spool.commit(cursor)
+
+    assert spool.read_batch(10)[0] == []
+    assert spool.pending_bytes() == 0
+    spool.close()
+
+
+def test_cursor_survives_reopen(tmp_path):
+    spool = open_spool(tmp_path)
+    for i in range(4):
+        spool.append({"n": i})
+    _, cursor = spool.read_batch(2)
+    spool.commit(cursor)
+    spool.close()
+
+    spool = open_spool(tmp_path)
+    assert [r["n"] for r in spool.read_batch(10)[0]] == [2, 3]
+    spool.close()
+
+
+def test_reopen_truncates_torn_tail(tmp_path):
+    spool = open_spool(tmp_path)
+    spool.append({"n": 0})
+    spool.append({"n": 1})
+    spool.close()
+
+    # Аварийное завершение посреди записи оставляет неполную строку
+    path = os.path.join(tmp_path, segment_files(tmp_path)[-1])
+    with open(path, "ab") as f:
+        f.write(b'{"n":')
+
+    spool = open_spool(tmp_path)
+    spool.append({"n": 2})
+    assert [r["n"] for r in spool.read_batch(10)[0]] == [0, 1, 2]
+    spool.close()
+
+
+def test_rotation_and_commit_remove_sent_segments(tmp_path):
+    spool = open_spool(tmp_path, segment_bytes=32)
+    for i in range(6):
+        spool.append({"n": i, "pad": "x" * 20})
+    assert len(segment_files(tmp_path)) > 1
+
+    records, cursor = spool.read_batch(100)
+    assert [r["n"] for r in records] == list(range(6))
+    spool.commit(cursor)
+    # Остаётся только активный сегмент
+    assert len(segment_files(tmp_path)) == 1
+    spool.close()
+
+
+def test_eviction_moves_cursor_forward(tmp_path):
+    spool = open_spool(tmp_path, max_bytes=100, segment_bytes=32)
+    for i in range(10):
+        spool.append({"n": i, "pad": "x" * 20})
+
+    with open(os.path.join(tmp_path, CURSOR_FILE)) as f:
+        cursor = json.load(f)
+    oldest = int(segment_files(tmp_path)[0][:-len(SEGMENT_SUFFIX)])
+    # Курсор указывает на первый сохранившийся сегмент, а не на удалённые
+    assert cursor == {"segment": oldest, "offset": 0}
+
+    records, _ = spool.read_batch(100)
+    numbers = [r["n"] for r in records]
+    assert numbers == list(range(numbers[0], 10))
+    assert numbers[0] > 0
+    spool.close()
+
+
+def test_eviction_drops_expired_segments(tmp_path):
+    spool = open_spool(tmp_path, max_age=60, segment_bytes=32)
+    spool.append({"n": 0, "pad": "x" * 40})
+    first = os.path.join(tmp_path, segment_files(tmp_path)[0])
+    os.utime(first, (0, 0))
+
+    spool.append({"n": 1, "pad": "x" * 40})
+    assert first not in [os.path.join(tmp_path, name) for name in segment_files(tmp_path)]
+    assert [r["n"] for r in spool.read_batch(10)[0]] == [1]
+    spool.close()
@@ -0,0 +1,92 @@
+import gzip
+import json
+from typing import Dict, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:  # msgpack необязателен, без него используется JSON
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+
+# Поля снимка, которые сравниваются при построении дельта-кадра
+FRAME_FIELDS = (
+    "cpu_usage",
+    "memory_total",
+    "memory_used",
+    "disk_usage",
+    "running_processes",
+    "network_stats",
+    "cpu_summary",
+    "memory_summary",
+    "network_summary",
+)
+
+# Мелкие тела сжимать невыгодно: заголовок gzip съедает выигрыш
+GZIP_MIN_BYTES = 512
+
+# Ошибки клиента, после которых стоит повторить отправку: 404 - незнакомый компьютер
+# (агент зарегистрируется заново), 408 и 429 - backend просит подождать
+RETRYABLE_CLIENT_ERRORS = {404, 408, 429}
+
+
+def rejected_permanently(status_code: int) -> bool:
+    """A 4xx the same request will get again (invalid sample, body too large)."""
+    return 400 <= status_code < 500 and status_code not in RETRYABLE_CLIENT_ERRORS
+
+
+def encode_body(payload, content_type: str = JSON) -> Tuple[bytes, Dict[str, str]]:
+    if content_type == MSGPACK:
+        body = msgpack.packb(payload)
+    else:
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    headers = {"Content-Type": content_type}
+    if len(body) >= GZIP_MIN_BYTES:
+        body = gzip.compress(body, compresslevel=6)
+        headers["Content-Encoding"] = "gzip"
+    return body, headers
+
+
+def choose_content_type(wire_formats: Dict) -> str:
+    if msgpack is not None and MSGPACK in wire_formats.get("content_types", []):
+        return MSGPACK
+    return JSON
+
+
+class DeltaEncoder:
+    """
+    Builds delta frames against the last snapshot the backend acknowledged.
+
+    A frame carries the timestamp plus only the fields whose value differs from
+    the acknowledged snapshot; without an acknowledged snapshot it carries
+    everything. A field the base has and the sample lacks is sent as null, so
+    the backend clears it instead of copying it from the base.
+    """
+
+    def __init__(self):
+        self.base_id: Optional[int] = None
+        self._base: Optional[Dict] = None
+
+    def frame(self, sample: Dict) -> Dict:
+        frame = {"timestamp": sample.get("timestamp")}
+        if self.base_id is None:
+            # Сводок за интервал может не быть (сбор без планировщика)
+            frame.update((field, sample[field]) for field in FRAME_FIELDS if field in sample)
+            return frame
+
+        frame["base_id"] = self.base_id
+        for field in FRAME_FIELDS:
+            value = sample.get(field)
+            if value != self._base.get(field):
+                # None - поле пропало из замера (сводки отключены, коллектор не ответил)
+                frame[field] = value
+        return frame
+
+    def acknowledge(self, snapshot_id: int, sample: Dict):
+        self.base_id = snapshot_id
+        self._base = {field: sample.get(field) for field in FRAME_FIELDS}
+
+    def reset(self):
+        self.base_id = None
+        self._base = None
@@ -0,0 +1,84 @@
+import json
+import zlib
+from typing import Callable
+
+import msgpack
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+from ..core.config import settings
+
+MSGPACK_CONTENT_TYPES = ("application/msgpack", "application/x-msgpack")
+SUPPORTED_CONTENT_ENCODINGS = ("gzip",)
+
+
+class CompactRequest(Request):
+    """
+    Request that transparently inflates gzip bodies and decodes msgpack bodies,
+    so endpoint handlers keep receiving ordinary Pydantic models.
+    """
+
+    @property
+    def is_msgpack(self) -> bool:
+        return self.scope.get("compact.msgpack", False)
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            body = await super().body()
+            if self.headers.get("content-encoding", "").lower() == "gzip":
+                body = _gunzip(body, settings.MAX_DECOMPRESSED_BODY_BYTES)
+            self._body = body
+        return self._body
+
+    async def json(self):
+        if not hasattr(self, "_json"):
+            body = await self.body()
+            try:
+                if self.is_msgpack:
+                    self._json = msgpack.unpackb(body)
+                else:
+                    self._json = json.loads(body)
+            except (ValueError, msgpack.UnpackException) as e:
+                raise HTTPException(status_code=400, detail=f"Malformed request body: {e}")
+        return self._json
+
+
+def _gunzip(body: bytes, limit: int) -> bytes:
+    # Ограничиваем размер распакованного тела, чтобы не пропустить gzip-бомбу
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        data = decompressor.decompress(body, limit)
+    except zlib.error as e:
+        raise HTTPException(status_code=400, detail=f"Malformed gzip body: {e}")
+    if decompressor.unconsumed_tail:
+        raise HTTPException(status_code=413, detail=f"Decompressed body exceeds {limit} bytes")
+    return data
+
+
+class CompactRoute(APIRoute):
+    """
+    Route class accepting ``Content-Encoding: gzip`` and msgpack request bodies
+    in addition to plain JSON.
+    """
+
+    def get_route_handler(self) -> Callable:
+        original_route_handler = super().get_route_handler()
+
+        async def compact_route_handler(request: Request) -> Response:
+            scope = request.scope
+            encoding = request.headers.get("content-encoding", "").lower()
+            if encoding and encoding not in SUPPORTED_CONTENT_ENCODINGS:
+                return JSONResponse(status_code=415, content={"detail": f"Unsupported Content-Encoding: {encoding}"})
+
+            content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+            if content_type in MSGPACK_CONTENT_TYPES:
+                # FastAPI разбирает тело только для JSON content-type, поэтому подменяем его
+                headers = [(name, value) for name, value in scope["headers"] if name != b"content-type"]
+                headers.append((b"content-type", b"application/json"))
+                scope = dict(scope, headers=headers)
+                scope["compact.msgpack"] = True
+
+            return await original_route_handler(CompactRequest(scope, request.receive))
+
+        return compact_route_handler
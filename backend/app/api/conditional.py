@@ -0,0 +1,55 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Сравнение слабое: префикс W/ не учитывается
+    candidates = (candidate.strip() for candidate in if_none_match.split(","))
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def _not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # Last-Modified передается с точностью до секунды
+    return last_modified.replace(microsecond=0) <= since
+
+
+def conditional_response(request: Request, response: Response, etag: str,
+                         last_modified: datetime) -> Optional[Response]:
+    """
+    Set ETag/Last-Modified on ``response`` and answer conditional GETs.
+
+    ``last_modified`` is a naive UTC datetime. If-None-Match takes precedence
+    over If-Modified-Since, as RFC 9110 requires.
+
+    :return: a 304 response when the client copy is current, otherwise None
+    """
+    last_modified = last_modified.replace(tzinfo=timezone.utc)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        # Кэшировать можно, но каждый раз с перепроверкой
+        "Cache-Control": "no-cache",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, etag)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        not_modified = if_modified_since is not None and _not_modified_since(if_modified_since, last_modified)
+
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,82 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+from .system_info import NEXT_CURSOR_HEADER
+from ...db.base import get_db
+from ...schemas.alert import AlertEvent, AlertRule, AlertRuleCreate, AlertRuleUpdate
+from ...services.alerts import FIRING, RESOLVED, AlertService, InvalidRule
+from ...services.pagination import InvalidCursor
+
+router = APIRouter()
+
+@router.get("/rules", response_model=List[AlertRule])
+async def read_alert_rules(db: AsyncSession = Depends(get_db)):
+    return await AlertService(db).get_rules()
+
+@router.post("/rules", response_model=AlertRule)
+async def create_alert_rule(rule: AlertRuleCreate, db: AsyncSession = Depends(get_db)):
+    """
+    Create a rule such as ``{"metric": "disk_percent:*", "operator": ">",
+    "threshold": 90, "duration_seconds": 300}`` (any mount above 90% for five
+    minutes) or ``{"metric": "memory_percent", "operator": ">", "threshold": 95}``.
+    With the default ``aggregate=all`` the condition must hold for every sample
+    of the window; ``avg``/``min``/``max`` compare that aggregate instead.
+    """
+    try:
+        db_rule = await AlertService(db).create_rule(rule)
+    except InvalidRule as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"Created alert rule {db_rule.id}: {rule.metric} {rule.operator} {rule.threshold}")
+    return db_rule
+
+@router.get("/rules/{rule_id}", response_model=AlertRule)
+async def read_alert_rule(rule_id: int, db: AsyncSession = Depends(get_db)):
+    db_rule = await AlertService(db).get_rule(rule_id)
+    if db_rule is None:
+        raise HTTPException(status_code=404, detail="Alert rule not found")
+    return db_rule
+
+@router.patch("/rules/{rule_id}", response_model=AlertRule)
+async def update_alert_rule(rule_id: int, changes: AlertRuleUpdate, db: AsyncSession = Depends(get_db)):
+    """Change a rule; disabling it or changing its metric or computer resolves its open events."""
+    try:
+        db_rule = await AlertService(db).update_rule(rule_id, changes)
+    except InvalidRule as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if db_rule is None:
+        raise HTTPException(status_code=404, detail="Alert rule not found")
+    return db_rule
+
+@router.delete("/rules/{rule_id}", status_code=204)
+async def delete_alert_rule(rule_id: int, db: AsyncSession = Depends(get_db)):
+    if not await AlertService(db).delete_rule(rule_id):
+        raise HTTPException(status_code=404, detail="Alert rule not found")
+    return Response(status_code=204)
+
+@router.get("/events", response_model=List[AlertEvent])
+async def read_alert_events(
+    response: Response,
+    status: Optional[str] = Query(None, pattern=f"^({FIRING}|{RESOLVED})$"),
+    computer_id: Optional[int] = None,
+    rule_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Fired and resolved alerts, newest first; ``?status=firing`` lists the
+    active ones. The cursor of the next page is returned in ``X-Next-Cursor``.
+    """
+    try:
+        events, next_cursor = await AlertService(db).get_events(
+            status=status, computer_id=computer_id, rule_id=rule_id, limit=limit, cursor=cursor
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return events
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+from ...core.config import settings
+from ...services.export import (
+    CSV,
+    EXPORT_FORMATS,
+    FILE_EXTENSIONS,
+    MEDIA_TYPES,
+    ExportUnavailable,
+    ExportWriter,
+    export_query,
+    stream_export,
+)
+from ...services.system_info import utc_naive
+
+router = APIRouter()
+
+@router.get("/system-info")
+async def export_system_info(
+    format: str = Query(CSV, pattern=f"^({'|'.join(EXPORT_FORMATS)})$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    computer_id: Optional[List[int]] = Query(None),
+    mount: Optional[List[str]] = Query(None),
+    chunk_size: int = Query(settings.EXPORT_CHUNK_ROWS, ge=100, le=100000)
+):
+    """
+    Stream system_info rows of a time range (default: the last day) as CSV,
+    Parquet or Arrow IPC. JSON columns are flattened: disk totals over all
+    mounts, per-mount columns for every ``mount`` given, network counters and
+    rates. ``computer_id`` may be repeated; without it all computers are
+    exported.
+    """
+    until = utc_naive(until) or datetime.utcnow()
+    since = utc_naive(since) or until - timedelta(days=1)
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be earlier than until")
+
+    try:
+        writer = ExportWriter(format, mount or [])
+    except ExportUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    logger.info(f"Exporting system info from {since} to {until} as {format}")
+    filename = f"system_info_{since:%Y%m%dT%H%M}_{until:%Y%m%dT%H%M}.{FILE_EXTENSIONS[format]}"
+    return StreamingResponse(
+        stream_export(writer, export_query(since, until, computer_id), chunk_size),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
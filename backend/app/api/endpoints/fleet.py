@@ -0,0 +1,81 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+from ...core.config import settings
+from ...db.base import get_db
+from ...schemas.fleet import FleetAnalytics, FleetOverview
+from ...services.analytics import AnalyticsService, AnalyticsTooLarge, parse_window
+from ...services.fleet import FLEET_SORT_KEYS, FleetService
+from ...services.series_stats import ANOMALY_METHODS, ZSCORE
+
+router = APIRouter()
+
+@router.get("/overview", response_model=FleetOverview)
+async def read_fleet_overview(
+    sort: str = Query("hostname", pattern=f"^({'|'.join(FLEET_SORT_KEYS)})$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(None, ge=1),
+    stale: Optional[bool] = None,
+    stale_after: Optional[int] = Query(None, ge=1),
+    hostname: Optional[str] = None,
+    min_cpu: Optional[float] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    All computers with their latest snapshot summary, fetched with a single
+    query. Examples: ``?sort=cpu_usage&order=desc&limit=50`` for the top 50 by
+    CPU, ``?stale=true&stale_after=300`` for hosts silent for over 5 minutes.
+    """
+    return await db.run_sync(lambda session: FleetService(session).get_overview(
+        stale_after=stale_after or settings.FLEET_STALE_AFTER_SECONDS,
+        sort=sort,
+        descending=order == "desc",
+        limit=limit,
+        stale=stale,
+        hostname=hostname,
+        min_cpu=min_cpu
+    ))
+
+@router.get("/analytics", response_model=FleetAnalytics)
+async def read_fleet_analytics(
+    metric: str = "cpu_usage",
+    window: str = Query("1h", pattern=r"^\d+[smhd]$"),
+    computer_id: Optional[List[int]] = Query(None),
+    percentile: List[float] = Query([50, 95, 99]),
+    span: int = Query(10, ge=1, le=10000),
+    method: str = Query(ZSCORE, pattern=f"^({'|'.join(ANOMALY_METHODS)})$"),
+    threshold: Optional[float] = Query(None, gt=0),
+    anomalous: Optional[bool] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Percentiles, EWMA and moving average (over the last ``span`` points) and
+    anomaly scores of one metric for every computer over the last ``window``.
+    Metrics are those of ``/series``, plus ``net.<counter>`` (e.g.
+    ``net.bytes_recv``) for the per-second rate of a network counter.
+    Example: ``?metric=cpu_usage&window=1h&method=mad&anomalous=true``.
+    """
+    if any(not 0 <= value <= 100 for value in percentile):
+        raise HTTPException(status_code=400, detail="percentile must be between 0 and 100")
+    try:
+        window_delta = parse_window(window)
+        return await db.run_sync(lambda session: AnalyticsService(session).get_analytics(
+            metric=metric,
+            window=window_delta,
+            computer_ids=computer_id,
+            percentiles=percentile,
+            span=span,
+            method=method,
+            threshold=threshold,
+            anomalous=anomalous,
+            limit=limit
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except AnalyticsTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.config import settings
+from ...core.metrics import agent_staleness, registry
+from ...db.base import get_db
+from ...models.system_info import Computer
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def read_metrics(db: AsyncSession = Depends(get_db)):
+    """Prometheus text exposition of the backend metrics."""
+    computers = (await db.execute(select(Computer.id, Computer.hostname, Computer.last_seen))).all()
+    agent_staleness.update(computers, datetime.utcnow(), settings.FLEET_STALE_AFTER_SECONDS)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
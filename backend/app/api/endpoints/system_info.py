@@ -1,108 +1,365 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+from ..compact import MSGPACK_CONTENT_TYPES, SUPPORTED_CONTENT_ENCODINGS, CompactRoute
+from ..conditional import conditional_response
+from ..fields import (
+    COMPUTER_FIELDS,
+    COMPUTER_KEY_FIELDS,
+    SYSTEM_INFO_FIELDS,
+    SYSTEM_INFO_KEY_FIELDS,
+    ComputerDetailsProjection,
+    ComputerProjection,
+    SystemInfoProjection,
+    fields_description,
+    parse_fields,
+    projected_etag,
+    projection_responses,
+    trusted_response,
+)
+from ...core.config import settings
+from ...core.metrics import payload_log_sampled
 from ...db.base import get_db
-from ...schemas.system_info import Computer, ComputerCreate, SystemInfo, SystemInfoCreate
-from ...services.system_info import SystemInfoService
+from ...schemas.system_info import (
+    Computer,
+    ComputerCreate,
+    SystemInfo,
+    SystemInfoAccepted,
+    SystemInfoBatch,
+    SystemInfoBatchItem,
+    SystemInfoBatchResult,
+    SystemInfoCreate,
+    SystemInfoFrame,
+    SystemInfoFrameAck,
+    WireFormats,
+)
+from ...schemas.rollup import MetricSeries
+from ...services.rollup import RAW, RESOLUTIONS, RollupService
+from ...services.ingest import ingest_queue
+from ...services.latest_state import details_etag, snapshot_etag
+from ...services.live import live_updates, sse_events
+from ...services.pagination import InvalidCursor
+from ...services.system_info import FrameBaseNotFound, SystemInfoService, utc_naive
 
-router = APIRouter()
+router = APIRouter(route_class=CompactRoute)
+
+# Курсор следующей страницы списков; пустой заголовок не отправляется
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+SYSTEM_INFO_FIELDS_QUERY = Query(None, description=fields_description(SYSTEM_INFO_FIELDS, SYSTEM_INFO_KEY_FIELDS))
+COMPUTER_FIELDS_QUERY = Query(None, description=fields_description(COMPUTER_FIELDS, COMPUTER_KEY_FIELDS))
+
+@router.get("/wire-formats", response_model=WireFormats)
+async def read_wire_formats():
+    return WireFormats(
+        content_types=["application/json", *MSGPACK_CONTENT_TYPES],
+        content_encodings=list(SUPPORTED_CONTENT_ENCODINGS),
+        delta_frames=True
+    )
 
 @router.post("/computers/", response_model=Computer)
-def create_computer(
+async def create_computer(
     computer: ComputerCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     service = SystemInfoService(db)
     
     logger.info(f"Registering computer: {computer.hostname}")
-    return service.create_computer(computer)
+    return await service.create_computer(computer)
 
-@router.get("/computers/", response_model=List[Computer])
-def read_computers(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+@router.get("/computers/", response_model=None, responses=projection_responses(List[ComputerProjection]))
+async def read_computers(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    skip: int = Query(0, ge=0, deprecated=True),
+    fields: Optional[str] = COMPUTER_FIELDS_QUERY,
+    db: AsyncSession = Depends(get_db)
 ):
+    """
+    Computers ordered by id. ``since``/``until`` filter on ``last_seen``; the
+    cursor of the next page is returned in the ``X-Next-Cursor`` header.
+    """
+    selected = parse_fields(fields, COMPUTER_FIELDS, COMPUTER_KEY_FIELDS)
     service = SystemInfoService(db)
-    computers = service.get_computers(skip=skip, limit=limit)
-    return computers
+    try:
+        computers, next_cursor = await service.get_computers_page(
+            limit=limit, cursor=cursor, since=utc_naive(since), until=utc_naive(until), skip=skip,
+            fields=selected or COMPUTER_FIELDS
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if selected is None:
+        # Полный ответ сохраняет прежнюю форму, история в списке не отдается
+        return trusted_response([dict(row._asdict(), system_info=[]) for row in computers], response)
+    return trusted_response([row._asdict() for row in computers], response)
 
 @router.get("/computers/{computer_id}", response_model=Computer)
-def read_computer(
+async def read_computer(
     computer_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     service = SystemInfoService(db)
-    db_computer = service.get_computer(computer_id)
+    db_computer = await service.get_computer(computer_id)
     if db_computer is None:
         raise HTTPException(status_code=404, detail="Computer not found")
     return db_computer
 
-@router.post("/computers/{computer_id}/system-info/", response_model=SystemInfo)
-def create_system_info(
+@router.post(
+    "/computers/{computer_id}/system-info/",
+    response_model=SystemInfo,
+    responses={
+        202: {"model": SystemInfoAccepted, "description": "Queued for write-behind ingest"},
+        429: {"description": "Ingest queue is full, retry later"},
+    }
+)
+async def create_system_info(
     computer_id: int,
     system_info: SystemInfoCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     service = SystemInfoService(db)
-    db_computer = service.get_computer(computer_id)
+    if ingest_queue.running:
+        if not await service.computer_exists(computer_id):
+            logger.error(f"Computer with ID {computer_id} not found")
+            raise HTTPException(status_code=404, detail="Computer not found")
+        # Время приема фиксируем сейчас, а не в момент записи пачки
+        item = SystemInfoBatchItem(
+            computer_id=computer_id,
+            **system_info.model_dump(exclude={"timestamp"}),
+            timestamp=system_info.timestamp or datetime.utcnow()
+        )
+        if not ingest_queue.submit(item):
+            raise HTTPException(status_code=429, detail="Ingest queue is full", headers={"Retry-After": "1"})
+        return JSONResponse(
+            status_code=202,
+            content=SystemInfoAccepted(computer_id=computer_id, queued=len(ingest_queue)).model_dump()
+        )
+
+    db_computer = await service.get_computer(computer_id)
     if db_computer is None:
         logger.error(f"Computer with ID {computer_id} not found")
         raise HTTPException(status_code=404, detail="Computer not found")
     
-    logger.info(f"Received system info for computer {computer_id}")
-    logger.info(f"System info data: {system_info.dict()}")
-    
+    logger.debug(f"Received system info for computer {computer_id}")
+    if payload_log_sampled(logger):
+        logger.debug(f"System info data: {system_info.model_dump()}")
+
     try:
-        service.update_computer_last_seen(computer_id)
-        db_system_info = service.create_system_info(computer_id, system_info)
+        await service.update_computer_last_seen(computer_id)
+        db_system_info = await service.create_system_info(computer_id, system_info)
         return db_system_info
     except Exception as e:
         logger.error(f"Error creating system info: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/computers/{computer_id}/system-info/latest", response_model=SystemInfo)
-def read_latest_system_info(
+@router.post("/computers/{computer_id}/system-info/frame", response_model=SystemInfoFrameAck)
+async def create_system_info_frame(
+    computer_id: int,
+    frame: SystemInfoFrame,
+    db: AsyncSession = Depends(get_db)
+):
+    service = SystemInfoService(db)
+    if await service.get_computer(computer_id) is None:
+        logger.error(f"Computer with ID {computer_id} not found")
+        raise HTTPException(status_code=404, detail="Computer not found")
+
+    try:
+        await service.update_computer_last_seen(computer_id)
+        return await service.create_system_info_from_frame(computer_id, frame)
+    except FrameBaseNotFound:
+        # Агент должен прислать полный снимок
+        raise HTTPException(status_code=409, detail="Base snapshot not found")
+    except Exception as e:
+        logger.error(f"Error creating system info from frame: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/batch", response_model=SystemInfoBatchResult)
+async def create_system_info_batch(
+    batch: SystemInfoBatch,
+    db: AsyncSession = Depends(get_db)
+):
+    if len(batch.items) > settings.SYSTEM_INFO_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(batch.items)} items, "
+                   f"maximum is {settings.SYSTEM_INFO_BATCH_MAX_ITEMS}"
+        )
+
+    service = SystemInfoService(db)
+    logger.debug(f"Received system info batch with {len(batch.items)} items")
+    if payload_log_sampled(logger):
+        logger.debug(f"System info batch data: {batch.model_dump()}")
+
+    try:
+        result = await service.create_system_info_batch(batch.items)
+    except Exception as e:
+        logger.error(f"Error creating system info batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if result.rejected:
+        logger.warning(f"Rejected {result.rejected} of {len(batch.items)} batch items")
+    return result
+
+@router.get(
+    "/computers/{computer_id}/system-info/latest",
+    response_model=None,
+    responses=projection_responses(SystemInfoProjection)
+)
+async def read_latest_system_info(
     computer_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    fields: Optional[str] = SYSTEM_INFO_FIELDS_QUERY,
+    db: AsyncSession = Depends(get_db)
 ):
+    selected = parse_fields(fields, SYSTEM_INFO_FIELDS, SYSTEM_INFO_KEY_FIELDS)
     service = SystemInfoService(db)
-    if not service.get_computer(computer_id):
+    state = await service.get_latest_state(computer_id)
+    if state is None:
         raise HTTPException(status_code=404, detail="Computer not found")
-    system_info = service.get_latest_system_info(computer_id)
-    if system_info is None:
+    if not state.system_info:
         raise HTTPException(status_code=404, detail="No system info found")
-    return system_info
 
-@router.get("/computers/{computer_id}/system-info/history", response_model=List[SystemInfo])
-def read_system_info_history(
+    system_info = state.system_info[0]
+    etag = projected_etag(snapshot_etag(system_info), selected)
+    not_modified = conditional_response(request, response, etag, system_info.timestamp)
+    # Снимок из кэша уже прошел проверку при записи, повторная валидация не нужна
+    return not_modified or trusted_response(
+        system_info.model_dump(include=set(selected) if selected else None), response
+    )
+
+@router.get(
+    "/computers/{computer_id}/system-info/history",
+    response_model=None,
+    responses=projection_responses(List[SystemInfoProjection])
+)
+async def read_system_info_history(
     computer_id: int,
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    skip: int = Query(0, ge=0, deprecated=True),
+    fields: Optional[str] = SYSTEM_INFO_FIELDS_QUERY,
+    db: AsyncSession = Depends(get_db)
 ):
+    """
+    History of a computer, newest first. The cursor of the next page is
+    returned in the ``X-Next-Cursor`` header. With ``fields`` only the
+    requested columns are read from the database.
+    """
+    selected = parse_fields(fields, SYSTEM_INFO_FIELDS, SYSTEM_INFO_KEY_FIELDS)
     service = SystemInfoService(db)
-    if not service.get_computer(computer_id):
+    if not await service.computer_exists(computer_id):
         raise HTTPException(status_code=404, detail="Computer not found")
-    return service.get_system_info_history(computer_id, skip=skip, limit=limit)
+    try:
+        rows, next_cursor = await service.get_system_info_history_page(
+            computer_id, limit=limit, cursor=cursor, since=utc_naive(since), until=utc_naive(until), skip=skip,
+            fields=selected or SYSTEM_INFO_FIELDS
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return trusted_response([row._asdict() for row in rows], response)
+
+@router.get("/computers/{computer_id}/system-info/series", response_model=MetricSeries)
+async def read_system_info_series(
+    computer_id: int,
+    metric: str = "cpu_usage",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    points: int = Query(300, ge=1, le=10000),
+    resolution: Optional[str] = Query(None, pattern=f"^({'|'.join([RAW, *RESOLUTIONS])})$"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Time series of one metric (``cpu_usage``, ``memory_used``, ``memory_percent``,
+    ``disk_percent:<mount>``, ``net.<rate>``). Unless ``resolution`` is given,
+    the finest rollup that fits into ``points`` buckets is used.
+    """
+    service = SystemInfoService(db)
+    if not await service.get_computer(computer_id):
+        raise HTTPException(status_code=404, detail="Computer not found")
+
+    until = utc_naive(until) or datetime.utcnow()
+    since = utc_naive(since) or until - timedelta(days=1)
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be earlier than until")
+
+    resolution = resolution or RollupService.choose_resolution(since, until, points)
+    # RollupService синхронный (он же работает в фоновой задаче), поэтому через run_sync
+    series = await db.run_sync(
+        lambda session: RollupService(session).get_series(computer_id, metric, since, until, resolution)
+    )
+    return MetricSeries(
+        computer_id=computer_id,
+        metric=metric,
+        resolution=resolution,
+        since=since,
+        until=until,
+        points=series
+    )
+
+@router.get("/stream")
+async def stream_system_info(computer_id: Optional[int] = None):
+    """
+    Server-Sent Events with every new snapshot of one computer, or of the whole
+    fleet when ``computer_id`` is omitted. A slow client only receives the
+    newest pending snapshot of each computer.
+    """
+    subscription = live_updates.subscribe(computer_id)
+    return StreamingResponse(
+        sse_events(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-@router.get("/computers/{computer_id}/details", response_model=Computer)
-def get_computer_details(
+@router.get(
+    "/computers/{computer_id}/details",
+    response_model=None,
+    responses=projection_responses(ComputerDetailsProjection)
+)
+async def get_computer_details(
     computer_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(
+        None,
+        description="Fields of the latest snapshot, see /system-info/latest; computer fields are always returned"
+    ),
+    db: AsyncSession = Depends(get_db)
 ):
+    selected = parse_fields(fields, SYSTEM_INFO_FIELDS, SYSTEM_INFO_KEY_FIELDS)
     service = SystemInfoService(db)
     
-    logger.info(f"Retrieving details for computer {computer_id}")
+    logger.debug(f"Retrieving details for computer {computer_id}")
     
-    computer = service.get_computer_with_system_info(computer_id)
+    computer = await service.get_latest_state(computer_id)
     if computer is None:
         logger.error(f"Computer with ID {computer_id} not found")
         raise HTTPException(status_code=404, detail="Computer not found")
     
-    return computer
+    not_modified = conditional_response(
+        request, response, projected_etag(details_etag(computer), selected), computer.last_seen
+    )
+    if not_modified:
+        return not_modified
+    include = None
+    if selected:
+        include = {name: True for name in COMPUTER_FIELDS}
+        include["system_info"] = {"__all__": set(selected)}
+    return trusted_response(computer.model_dump(include=include), response)
@@ -0,0 +1,91 @@
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+from fastapi import HTTPException, Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field, create_model
+
+from ..schemas.system_info import Computer, SystemInfo
+
+SYSTEM_INFO_FIELDS = tuple(SystemInfo.model_fields)
+COMPUTER_FIELDS = tuple(name for name in Computer.model_fields if name != "system_info")
+# Ключи, без которых строку нельзя опознать или продолжить постраничную выдачу
+SYSTEM_INFO_KEY_FIELDS = ("id", "computer_id", "timestamp")
+COMPUTER_KEY_FIELDS = ("id",)
+
+FIELDS_DESCRIPTION = "Comma separated fields to return; keys ({keys}) are always included. Available: {fields}"
+
+
+def projection_schema(model: Type[BaseModel], name: str, required: Sequence[str],
+                      overrides: Optional[Dict[str, Any]] = None) -> Type[BaseModel]:
+    """
+    OpenAPI schema of ``model`` as returned with ``fields=``: only the
+    ``required`` fields (those of them the model requires) are always present. ``overrides`` replaces the type
+    of some fields (e.g. a nested list of projected objects).
+    """
+    overrides = overrides or {}
+    definitions = {}
+    for field_name, info in model.model_fields.items():
+        annotation = overrides.get(field_name, info.annotation)
+        if field_name in required and info.is_required():
+            definitions[field_name] = (annotation, Field(..., description=info.description))
+        else:
+            definitions[field_name] = (Optional[annotation], Field(None, description=info.description))
+    return create_model(name, **definitions)
+
+
+SystemInfoProjection = projection_schema(SystemInfo, "SystemInfoProjection", SYSTEM_INFO_KEY_FIELDS)
+ComputerProjection = projection_schema(Computer, "ComputerProjection", COMPUTER_KEY_FIELDS)
+# В /details поля компьютера отдаются всегда, проекция касается только замера
+ComputerDetailsProjection = projection_schema(
+    Computer, "ComputerDetailsProjection", COMPUTER_FIELDS + ("system_info",),
+    overrides={"system_info": List[SystemInfoProjection]}
+)
+
+PROJECTION_DESCRIPTION = "Successful Response; with ``fields`` only the requested fields and the keys are present"
+
+
+def projection_responses(schema: Any) -> Dict[int, Dict[str, Any]]:
+    """``responses=`` of a route that returns ``schema`` projected by ``fields=``."""
+    return {200: {"model": schema, "description": PROJECTION_DESCRIPTION}}
+
+
+def fields_description(allowed: Sequence[str], keys: Sequence[str]) -> str:
+    return FIELDS_DESCRIPTION.format(keys=", ".join(keys), fields=", ".join(allowed))
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str], keys: Sequence[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Parse a ``fields=`` projection into field names in schema order.
+
+    :return: None when no projection was asked for (all fields)
+    :raises HTTPException: 400 for an unknown field
+    """
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested.difference(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    requested.update(keys)
+    return tuple(name for name in allowed if name in requested)
+
+
+def projected_etag(etag: str, fields: Optional[Sequence[str]]) -> str:
+    # Разный набор полей - разные представления одного ресурса; запятых в ETag
+    # быть не должно, If-None-Match разделяет ими значения
+    if fields is None:
+        return etag
+    return f'{etag[:-1]}-f{zlib.crc32(",".join(fields).encode()):08x}"'
+
+
+def trusted_response(content: Any, response: Optional[Response] = None) -> ORJSONResponse:
+    """
+    Serialize data read from our own database or cache straight to JSON,
+    skipping response_model validation; headers already set on the injected
+    ``response`` are carried over.
+    """
+    headers = None
+    if response is not None:
+        headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+    return ORJSONResponse(content, headers=headers)
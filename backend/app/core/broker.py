@@ -0,0 +1,87 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    Bounded, coalescing mailbox of one subscriber.
+
+    Updates are keyed (by computer id), and a newer update replaces a pending
+    one with the same key, so a slow consumer skips intermediate samples
+    instead of falling behind. When more than ``max_pending`` keys are waiting
+    the oldest one is dropped.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, topic: Optional[Hashable], max_pending: int):
+        self.topic = topic
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._loop = loop
+        self._pending: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._ready = asyncio.Event()
+
+    def offer(self, key: Hashable, message: Any):
+        # Вызывается из потоков пула, поэтому событие взводится через цикл событий
+        with self._lock:
+            self._pending.pop(key, None)
+            self._pending[key] = message
+            while len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)
+                self.dropped += 1
+        self._loop.call_soon_threadsafe(self._ready.set)
+
+    async def get(self, timeout: Optional[float] = None) -> List[Any]:
+        """Wait for pending updates and take all of them; [] on timeout."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        with self._lock:
+            self._ready.clear()
+            messages = list(self._pending.values())
+            self._pending.clear()
+        return messages
+
+
+class Broker:
+    """
+    In-process fan-out of messages to subscribers of a topic or of every topic
+    (``topic=None``). Publishing never blocks on consumers.
+    """
+
+    def __init__(self, max_pending: int = 100):
+        self.max_pending = max_pending
+        self._subscriptions: Set[Subscription] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic: Optional[Hashable] = None) -> Subscription:
+        subscription = Subscription(asyncio.get_running_loop(), topic, self.max_pending)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+        if subscription.dropped:
+            logger.info(f"Subscriber of {subscription.topic} dropped {subscription.dropped} stale updates")
+
+    def publish(self, topic: Hashable, message: Any):
+        with self._lock:
+            subscriptions: Tuple[Subscription, ...] = tuple(self._subscriptions)
+        for subscription in subscriptions:
+            if subscription.topic is None or subscription.topic == topic:
+                try:
+                    subscription.offer(topic, message)
+                except RuntimeError:
+                    # Цикл событий подписчика уже закрыт
+                    self.unsubscribe(subscription)
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
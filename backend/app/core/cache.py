@@ -0,0 +1,108 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with a per-entry time to live.
+
+    Entries are evicted when the cache grows beyond ``max_entries`` (least
+    recently used first) or on access once they are older than ``ttl`` seconds.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def update(self, key: Hashable, func: Callable[[Any], Optional[Any]]):
+        """
+        Atomically replace a cached value with ``func(value)``. Missing or
+        expired entries are left alone; returning None drops the entry.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return
+            new_value = func(value)
+            if new_value is None:
+                del self._entries[key]
+            else:
+                self._entries[key] = (new_value, expires_at)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class InvalidationBus:
+    """
+    Local stand-in for a pub/sub channel (Redis, PostgreSQL LISTEN/NOTIFY)
+    carrying cache invalidations between workers.
+
+    Every message is tagged with the id of the publishing process, so a worker
+    can skip its own messages: it has already updated its cache in place. To
+    keep several uvicorn workers consistent, replace ``publish`` with a call to
+    the shared channel and feed received messages into ``deliver``.
+    """
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self._subscribers: List[Callable[[Dict], None]] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: Callable[[Dict], None]):
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def publish(self, channel: str, key: Hashable):
+        self.deliver({"origin": self.origin, "channel": channel, "key": key})
+
+    def deliver(self, message: Dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(message)
+            except Exception as e:
+                logger.error(f"Invalidation subscriber failed: {e}")
+
+
+invalidation_bus = InvalidationBus()
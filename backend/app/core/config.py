@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings
+from sqlalchemy.engine import make_url
 from typing import Optional
 
 class Settings(BaseSettings):
@@ -6,21 +7,128 @@ class Settings(BaseSettings):
     VERSION: str = "1.0.0"
     API_V1_STR: str = "/api/v1"
     
-    POSTGRES_SERVER: str
-    POSTGRES_USER: str
-    POSTGRES_PASSWORD: str
-    POSTGRES_DB: str
+    # Хранилище выбирается по DATABASE_URL: postgresql://... или sqlite:///path/system_info.db.
+    # Без DATABASE_URL адрес PostgreSQL собирается из POSTGRES_*
+    POSTGRES_SERVER: Optional[str] = None
+    POSTGRES_USER: Optional[str] = None
+    POSTGRES_PASSWORD: Optional[str] = None
+    POSTGRES_DB: Optional[str] = None
     DATABASE_URL: Optional[str] = None
 
+    # SQLite: ожидание блокировки записи другим соединением и синхронизация журнала
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # Максимальное число замеров в одном запросе /system-info/batch
+    SYSTEM_INFO_BATCH_MAX_ITEMS: int = 5000
+    # Предел размера тела запроса после распаковки gzip
+    MAX_DECOMPRESSED_BODY_BYTES: int = 64 * 1024 * 1024
+
+    # Хранение истории: дневные секции system_info в PostgreSQL и срок хранения
+    SYSTEM_INFO_PARTITIONING: bool = True
+    SYSTEM_INFO_PARTITIONS_AHEAD_DAYS: int = 7
+    SYSTEM_INFO_BRIN_AFTER_DAYS: int = 2
+    SYSTEM_INFO_RETENTION_DAYS: int = 90  # 0 - хранить бессрочно
+    MAINTENANCE_INTERVAL_SECONDS: int = 3600
+    # Замер с временем агента дальше этого в будущем записывается со временем сервера
+    SYSTEM_INFO_MAX_CLOCK_SKEW_SECONDS: int = 300
+
+    # Агрегаты 1m/1h/1d: период пересчета и сроки хранения (0 - бессрочно)
+    ROLLUP_INTERVAL_SECONDS: int = 60
+    ROLLUP_MAX_ROWS_PER_RUN: int = 50000
+    ROLLUP_1M_RETENTION_DAYS: int = 14
+    ROLLUP_1H_RETENTION_DAYS: int = 365
+    ROLLUP_1D_RETENTION_DAYS: int = 0
+
+    # Компьютер считается пропавшим, если от него нет данных дольше этого срока
+    FLEET_STALE_AFTER_SECONDS: int = 300
+
+    # Кэш последнего состояния компьютеров для /details и /latest
+    LATEST_CACHE_MAX_ENTRIES: int = 10000
+    LATEST_CACHE_TTL_SECONDS: int = 300
+
+    # Потоковая выдача новых замеров (SSE): очередь подписчика и keepalive
+    STREAM_MAX_PENDING: int = 1000
+    STREAM_KEEPALIVE_SECONDS: int = 15
+
+    # Отложенная запись одиночных замеров: ответ 202 сразу, запись пачками в фоне.
+    # По умолчанию включена для SQLite, где писать одновременно может только одно соединение
+    INGEST_WRITE_BEHIND: Optional[bool] = None
+    INGEST_QUEUE_MAX_SIZE: int = 10000
+    INGEST_BATCH_SIZE: int = 500
+    INGEST_FLUSH_INTERVAL_MS: int = 200
+    INGEST_RETRY_MAX_SECONDS: float = 5.0
+    INGEST_SHUTDOWN_RETRIES: int = 3
+
+    # Оповещения: окно правила не длиннее стольких замеров; самый частый
+    # ожидаемый интервал отправки замеров агентом (по нему считается размер окна).
+    # Окна хранятся в памяти процесса, поэтому оповещения требуют одного worker
+    ALERT_WINDOW_MAX_SAMPLES: int = 720
+    ALERT_MIN_SAMPLE_INTERVAL_SECONDS: float = 5.0
+    # Правила и открытые события перечитываются из базы не реже чем раз в столько секунд (0 - только при изменении)
+    ALERT_RULES_RELOAD_SECONDS: float = 60.0
+
+    # Аналитика по парку: предел числа точек, загружаемых одним запросом
+    ANALYTICS_MAX_POINTS: int = 5000000
+
+    # Выгрузка истории: строк в одной порции (группе строк Parquet)
+    EXPORT_CHUNK_ROWS: int = 10000
+
+    # Метрики Prometheus на /metrics и доля запросов, чье тело пишется в лог на уровне DEBUG
+    METRICS_ENABLED: bool = True
+    PAYLOAD_LOG_SAMPLE_RATE: float = 0.01
+
+    # Пул соединений асинхронного движка (запросы API)
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800  # -1 - не пересоздавать соединения
+    DB_POOL_PRE_PING: bool = True
+    # Кэш подготовленных выражений asyncpg на соединение (0 - выключен, нужно для pgbouncer)
+    DB_STATEMENT_CACHE_SIZE: int = 100
+
     class Config:
         env_file = ".env"
 
+    @property
+    def database_url(self):
+        if self.DATABASE_URL:
+            url = make_url(self.DATABASE_URL)
+        elif self.POSTGRES_SERVER and self.POSTGRES_USER and self.POSTGRES_DB:
+            url = make_url(
+                f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD or ''}@{self.POSTGRES_SERVER}/{self.POSTGRES_DB}"
+            )
+        else:
+            raise ValueError("Set DATABASE_URL or POSTGRES_SERVER, POSTGRES_USER and POSTGRES_DB")
+        if url.get_backend_name() not in ("postgresql", "sqlite"):
+            raise ValueError(f"Unsupported database: {url.get_backend_name()}")
+        if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+            # Синхронный и асинхронный движки должны видеть одну и ту же базу
+            raise ValueError("SQLite needs a database file, e.g. sqlite:///./system_info.db")
+        return url
+
+    @property
+    def is_sqlite(self) -> bool:
+        return self.database_url.get_backend_name() == "sqlite"
+
+    @property
+    def ingest_write_behind(self) -> bool:
+        return self.is_sqlite if self.INGEST_WRITE_BEHIND is None else self.INGEST_WRITE_BEHIND
+
     @property
     def sync_database_url(self) -> str:
-        return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}/{self.POSTGRES_DB}"
+        url = self.database_url
+        # Драйвер по умолчанию: psycopg2 или встроенный sqlite3
+        return url.set(drivername=url.get_backend_name()).render_as_string(hide_password=False)
+
+    @property
+    def async_database_url(self) -> str:
+        url = self.database_url
+        driver = "aiosqlite" if url.get_backend_name() == "sqlite" else "asyncpg"
+        return url.set(drivername=f"{url.get_backend_name()}+{driver}").render_as_string(hide_password=False)
 
 settings = Settings()
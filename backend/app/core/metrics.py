@@ -0,0 +1,206 @@
+import logging
+import random
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+# Отдельный реестр: метрики процесса python не смешиваются с метриками приложения
+registry = CollectorRegistry(auto_describe=True)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS, registry=registry
+)
+HTTP_REQUEST_BYTES = Histogram(
+    "http_request_body_bytes", "Size of request bodies as received (before decompression)",
+    ["method", "route"], buckets=SIZE_BUCKETS, registry=registry
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requests being handled", registry=registry
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Database statement execution time",
+    ["engine", "operation"], buckets=LATENCY_BUCKETS, registry=registry
+)
+DB_QUERY_ERRORS = Counter(
+    "db_query_errors_total", "Database statements that raised an error",
+    ["engine", "operation"], registry=registry
+)
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_duration_seconds", "Time to get a connection from the pool, including waiting",
+    ["engine"], buckets=LATENCY_BUCKETS, registry=registry
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections", "Connections currently taken from the pool",
+    ["engine"], registry=registry
+)
+ROWS_INGESTED = Counter(
+    "system_info_rows_ingested_total", "system_info rows written", ["path"], registry=registry
+)
+INGEST_QUEUE_DEPTH = Gauge(
+    "system_info_ingest_queue_depth", "Samples waiting in the write-behind queue", registry=registry
+)
+INGEST_DROPPED = Counter(
+    "system_info_ingest_dropped_total", "Queued samples the database refused to store", registry=registry
+)
+
+DB_OPERATIONS = ("SELECT", "INSERT", "UPDATE", "DELETE")
+
+
+def payload_log_sampled(logger: logging.Logger) -> bool:
+    """Whether to log this request's payload: DEBUG only, PAYLOAD_LOG_SAMPLE_RATE of requests."""
+    return logger.isEnabledFor(logging.DEBUG) and random.random() < settings.PAYLOAD_LOG_SAMPLE_RATE
+
+
+def _operation(statement: str) -> str:
+    operation = statement.lstrip()[:6].upper()
+    return operation if operation in DB_OPERATIONS else "OTHER"
+
+
+def instrument_engine(engine: Engine, name: str):
+    """Time every statement of a (sync) engine; for async engines pass ``sync_engine``."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        DB_QUERY_SECONDS.labels(name, _operation(statement)).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+        DB_QUERY_ERRORS.labels(name, _operation(context.statement or "")).inc()
+
+    DB_POOL_CHECKED_OUT.labels(name).set_function(lambda: engine.pool.checkedout())
+
+
+def timed_pool(pool_class, name: str):
+    """
+    Subclass of ``pool_class`` that records how long ``connect`` takes, i.e.
+    the wait for a free connection plus pre-ping. SQLAlchemy has no event
+    fired before a checkout starts, so the pool itself is wrapped.
+    """
+
+    class TimedPool(pool_class):
+        def connect(self):
+            started = time.perf_counter()
+            try:
+                return super().connect()
+            finally:
+                DB_POOL_CHECKOUT_SECONDS.labels(name).observe(time.perf_counter() - started)
+
+    TimedPool.__name__ = f"Timed{pool_class.__name__}"
+    return TimedPool
+
+
+class AgentStalenessCollector:
+    """
+    Seconds since every computer was last seen, plus the number of stale
+    computers. The endpoint refreshes the snapshot from the database right
+    before each scrape.
+    """
+
+    def __init__(self):
+        self._computers: Iterable[Tuple[int, str, Optional[datetime]]] = ()
+        self._now = datetime.utcnow()
+        self._stale_after = 0
+
+    def update(self, computers: Iterable[Tuple[int, str, Optional[datetime]]], now: datetime, stale_after: int):
+        self._computers = list(computers)
+        self._now = now
+        self._stale_after = stale_after
+
+    def collect(self):
+        since_seen = GaugeMetricFamily(
+            "system_info_agent_last_seen_age_seconds", "Seconds since the agent last sent data",
+            labels=["computer_id", "hostname"]
+        )
+        stale = 0
+        for computer_id, hostname, last_seen in self._computers:
+            if last_seen is None:
+                stale += 1
+                continue
+            age = (self._now - last_seen).total_seconds()
+            if age > self._stale_after:
+                stale += 1
+            since_seen.add_metric([str(computer_id), hostname or ""], age)
+        yield since_seen
+        yield GaugeMetricFamily(
+            "system_info_agents_stale", "Agents without data for longer than FLEET_STALE_AFTER_SECONDS",
+            value=stale
+        )
+        yield GaugeMetricFamily("system_info_agents", "Registered agents", value=len(self._computers))
+
+
+agent_staleness = AgentStalenessCollector()
+registry.register(agent_staleness)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status and request body size per
+    route template (``/computers/{computer_id}``), so paths with ids do not
+    explode the number of series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Optional[Dict] = None
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._routes is None:
+            # Маршруты известны только после подключения всех роутеров
+            self._routes = {route.endpoint: route.path for route in scope["app"].routes
+                            if hasattr(route, "endpoint")}
+        return self._routes.get(endpoint, "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        received = 0
+        status = 500
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def status_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, counting_receive, status_send)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            route = self._route(scope)
+            method = scope["method"]
+            HTTP_REQUEST_SECONDS.labels(method, route, str(status)).observe(time.perf_counter() - started)
+            if received:
+                HTTP_REQUEST_BYTES.labels(method, route).observe(received)
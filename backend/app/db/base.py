@@ -1,36 +1,84 @@
+from datetime import datetime
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 import logging
 
 from ..core.config import settings
+from ..core.metrics import instrument_engine, timed_pool
+from .sqlite import configure_sqlite
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-engine = create_engine(settings.sync_database_url)
+# Синхронный движок нужен для создания схемы и фоновых задач (секции, агрегаты)
+engine = create_engine(
+    settings.sync_database_url,
+    poolclass=timed_pool(QueuePool, "sync"),
+    pool_pre_ping=settings.DB_POOL_PRE_PING
+)
+instrument_engine(engine, "sync")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронный движок обслуживает запросы API
+async_engine = create_async_engine(
+    settings.async_database_url,
+    poolclass=timed_pool(AsyncAdaptedQueuePool, "async"),
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    # Кэш подготовленных выражений - параметр asyncpg, aiosqlite его не знает
+    connect_args={} if settings.is_sqlite else {"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+)
+instrument_engine(async_engine.sync_engine, "async")
+
+if settings.is_sqlite:
+    configure_sqlite(engine)
+    configure_sqlite(async_engine.sync_engine)
+# Объекты не сбрасываются после commit, иначе чтение атрибутов потребует запроса
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def init_db():
+    """
+    Create missing tables and indexes, and add new nullable columns to
+    existing tables. Called once at application startup (and by scripts that
+    need the schema), never as an import side effect.
+    """
     try:
         # Import models here to avoid circular import
-        from ..models import system_info
+        from ..models import alert, rollup, system_info
+        from .locks import MAINTENANCE_LOCK, advisory_lock
+        from .partitioning import create_partitioned_system_info, ensure_partitions, is_partitioned, partitioning_enabled
+        from .migrate import add_missing_columns
         
         logger.info("Creating database tables...")
-        Base.metadata.create_all(bind=engine)
+        # Каждый worker создает схему при запуске; одновременный DDL завершился бы ошибками
+        with advisory_lock(engine, MAINTENANCE_LOCK, wait=True):
+            if partitioning_enabled(engine):
+                # system_info создается отдельно как секционированная таблица
+                tables = [table for table in Base.metadata.sorted_tables if table.name != "system_info"]
+                Base.metadata.create_all(bind=engine, tables=tables)
+                with engine.begin() as conn:
+                    create_partitioned_system_info(conn)
+                    if is_partitioned(conn):
+                        # Секции на ближайшие дни нужны до первого замера, а не после
+                        # первого прохода фонового обслуживания
+                        ensure_partitions(conn, datetime.utcnow().date(), settings.SYSTEM_INFO_PARTITIONS_AHEAD_DAYS)
+            else:
+                Base.metadata.create_all(bind=engine)
+            with engine.begin() as conn:
+                add_missing_columns(conn, Base.metadata)
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Error creating database tables: {e}")
         raise
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
-
-# Initialize database tables when this module is imported
-init_db()
@@ -0,0 +1,54 @@
+from contextlib import contextmanager
+from typing import Iterator
+import logging
+import zlib
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Имена блокировок фоновых задач; ключ pg_advisory_lock - crc32 имени.
+# Создание схемы и обслуживание секций выполняют DDL и делят одну блокировку
+MAINTENANCE_LOCK = "system_info_maintenance"
+ROLLUP_LOCK = "system_info_rollups"
+
+
+def _lock_key(name: str) -> int:
+    return zlib.crc32(name.encode("utf-8"))
+
+
+@contextmanager
+def advisory_lock(engine: Engine, name: str, wait: bool = False) -> Iterator[bool]:
+    """
+    Hold a PostgreSQL session advisory lock for the duration of the block, so
+    a job started in every uvicorn worker runs in one of them at a time.
+
+    The lock lives on a connection of its own and is released with it, also
+    when the process dies. With ``wait=False`` the block gets False if another
+    process holds the lock. SQLite has a single writer anyway: there the block
+    always gets True.
+    """
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+
+    key = _lock_key(name)
+    with engine.connect() as conn:
+        if wait:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": key})
+            acquired = True
+        else:
+            acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar()
+        # Блокировка сессионная: транзакция запроса ей не нужна
+        conn.commit()
+        try:
+            yield bool(acquired)
+        finally:
+            if acquired:
+                try:
+                    conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+                    conn.commit()
+                except Exception as e:
+                    # Соединение потеряно - блокировка снята вместе с сессией
+                    logger.warning(f"Could not release advisory lock {name}: {e}")
@@ -0,0 +1,41 @@
+from typing import List
+import logging
+
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+
+def add_missing_columns(conn: Connection, metadata: MetaData) -> List[str]:
+    """
+    Add model columns missing from already existing tables.
+
+    ``create_all`` only creates absent tables, so columns added to a model
+    later never reach an existing database. Only nullable columns without
+    defaults are added (old rows get NULL); anything else needs a manual
+    migration and is reported.
+
+    :return: added columns as ``table.column``
+    """
+    inspector = inspect(conn)
+    preparer = conn.dialect.identifier_preparer
+    added = []
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable or column.server_default is not None:
+                logger.error(f"Column {table.name}.{column.name} is missing and cannot be added automatically")
+                continue
+            # В секционированной таблице PostgreSQL колонка добавляется и во все секции
+            conn.execute(text(
+                f"ALTER TABLE {preparer.format_table(table)} "
+                f"ADD COLUMN {preparer.format_column(column)} {column.type.compile(dialect=conn.dialect)}"
+            ))
+            added.append(f"{table.name}.{column.name}")
+            logger.info(f"Added column {table.name}.{column.name}")
+    return added
@@ -0,0 +1,226 @@
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+import logging
+
+from sqlalchemy import Integer, text
+from sqlalchemy.engine import Connection, Engine
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TABLE_NAME = "system_info"
+PARTITION_PREFIX = "system_info_p"
+DEFAULT_PARTITION = "system_info_default"
+
+
+def partitioning_enabled(engine: Engine) -> bool:
+    return settings.SYSTEM_INFO_PARTITIONING and engine.dialect.name == "postgresql"
+
+
+def partition_name(day: date) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def _column_ddl(column, dialect) -> str:
+    name = dialect.identifier_preparer.quote(column.name)
+    if column.primary_key and isinstance(column.type, Integer):
+        return f"{name} SERIAL"
+
+    parts = [name, column.type.compile(dialect=dialect)]
+    if not column.nullable:
+        parts.append("NOT NULL")
+    for fk in column.foreign_keys:
+        parts.append(f"REFERENCES {fk.column.table.name} ({fk.column.name})")
+    return " ".join(parts)
+
+
+def create_partitioned_system_info(conn: Connection):
+    """
+    Create system_info as a table range-partitioned by day on ``timestamp``.
+
+    The column list is taken from the SystemInfo model. PostgreSQL requires the
+    partition key in the primary key, so the table key is (id, timestamp); the
+    ORM keeps addressing rows by id. Rows outside every daily partition land in
+    a DEFAULT partition.
+    """
+    from ..models.system_info import SystemInfo
+
+    table = SystemInfo.__table__
+    columns = ",\n    ".join(_column_ddl(column, conn.dialect) for column in table.columns)
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {TABLE_NAME} (\n    {columns},\n"
+        f"    PRIMARY KEY (id, timestamp)\n) PARTITION BY RANGE (timestamp)"
+    ))
+    if not is_partitioned(conn):
+        logger.warning(f"Table {TABLE_NAME} already exists and is not partitioned; "
+                       f"partition maintenance is disabled for it")
+    else:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {TABLE_NAME} DEFAULT"
+        ))
+
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def is_partitioned(conn: Connection) -> bool:
+    return bool(conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table)"
+    ), {"table": TABLE_NAME}).scalar())
+
+
+def list_partitions(conn: Connection) -> List[Tuple[str, date]]:
+    """Daily partitions of system_info with the day each one covers, oldest first."""
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table"
+    ), {"table": TABLE_NAME}).scalars().all()
+
+    partitions = []
+    for name in names:
+        if not name.startswith(PARTITION_PREFIX):
+            continue
+        try:
+            partitions.append((name, datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d").date()))
+        except ValueError:
+            continue
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def default_partition_days(conn: Connection, since: Optional[date] = None) -> List[date]:
+    """Days that have rows in the DEFAULT partition, from ``since`` on."""
+    query = f"SELECT DISTINCT CAST(timestamp AS date) FROM {DEFAULT_PARTITION}"
+    if since is not None:
+        query += " WHERE timestamp >= :since"
+    return conn.execute(text(query), {"since": since}).scalars().all()
+
+
+def _bounds(day: date) -> str:
+    return f"FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+
+
+def move_from_default(conn: Connection, name: str, day: date) -> int:
+    """
+    Create the partition for ``day`` when DEFAULT already holds rows of that
+    day: PostgreSQL refuses ``CREATE TABLE ... PARTITION OF`` then. The table
+    is created standalone, the rows are moved into it and it is attached.
+    DEFAULT is locked against writes meanwhile, so no new row of that day can
+    slip in between the move and the attach.
+
+    :return: number of rows moved
+    """
+    conn.execute(text(f"LOCK TABLE {DEFAULT_PARTITION} IN EXCLUSIVE MODE"))
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {TABLE_NAME} INCLUDING DEFAULTS)"))
+    bounds = {"start": day, "end": day + timedelta(days=1)}
+    moved = conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+        f"WHERE timestamp >= :start AND timestamp < :end RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), bounds).rowcount
+    # Индексы и внешний ключ секция получает от родительской таблицы при подключении
+    conn.execute(text(f"ALTER TABLE {TABLE_NAME} ATTACH PARTITION {name} FOR VALUES {_bounds(day)}"))
+    return moved
+
+
+def ensure_partitions(conn: Connection, today: date, ahead_days: int,
+                      keep_since: Optional[date] = None) -> List[str]:
+    """
+    Create daily partitions from yesterday up to ``ahead_days`` in the
+    future, plus one for every day from ``keep_since`` on whose rows ended up
+    in DEFAULT (samples replayed from an agent's spool, or written before the
+    partition existed). Rows of such days are moved out of DEFAULT.
+    """
+    existing = {name for name, _ in list_partitions(conn)}
+    in_default = set(default_partition_days(conn, keep_since))
+    days = {today + timedelta(days=offset) for offset in range(-1, ahead_days + 1)} | in_default
+    created = []
+    for day in sorted(days):
+        name = partition_name(day)
+        if name in existing:
+            continue
+        try:
+            with conn.begin_nested():
+                if day in in_default:
+                    moved = move_from_default(conn, name, day)
+                    logger.info(f"Moved {moved} rows of {day} from {DEFAULT_PARTITION} to {name}")
+                else:
+                    conn.execute(text(f"CREATE TABLE {name} PARTITION OF {TABLE_NAME} FOR VALUES {_bounds(day)}"))
+            created.append(name)
+        except Exception as e:
+            # Например, строки за этот день попали в DEFAULT после проверки; повтор при следующем проходе
+            logger.error(f"Could not create partition {name}: {e}")
+    return created
+
+
+def create_brin_indexes(conn: Connection, before: date) -> List[str]:
+    """
+    Add a BRIN index on ``timestamp`` to partitions older than ``before``.
+    Those partitions are append-complete, so a tiny BRIN index is enough for
+    range scans over them.
+    """
+    indexed = []
+    for name, day in list_partitions(conn):
+        if day >= before:
+            break
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name}_timestamp_brin ON {name} USING brin (timestamp)"))
+        indexed.append(name)
+    return indexed
+
+
+def drop_expired_partitions(conn: Connection, cutoff: date) -> List[str]:
+    """Drop whole daily partitions that end on or before ``cutoff``."""
+    dropped = []
+    for name, day in list_partitions(conn):
+        if day + timedelta(days=1) > cutoff:
+            break
+        conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        dropped.append(name)
+    # В DEFAULT-секцию попадают только редкие замеры вне дневных секций
+    conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp < :cutoff"), {"cutoff": cutoff})
+    return dropped
+
+
+def delete_expired_rows(conn: Connection, cutoff: datetime, batch_size: int = 10000) -> int:
+    """Retention fallback for unpartitioned tables: delete old rows in batches."""
+    deleted = 0
+    while True:
+        result = conn.execute(text(
+            f"DELETE FROM {TABLE_NAME} WHERE id IN "
+            f"(SELECT id FROM {TABLE_NAME} WHERE timestamp < :cutoff LIMIT :batch_size)"
+        ), {"cutoff": cutoff, "batch_size": batch_size})
+        conn.commit()
+        if result.rowcount < batch_size:
+            return deleted + result.rowcount
+        deleted += result.rowcount
+
+
+def maintain_system_info(engine: Engine, now: Optional[datetime] = None) -> dict:
+    """
+    Periodic storage maintenance: pre-create partitions, add BRIN indexes to
+    older partitions and apply the retention policy.
+    """
+    now = now or datetime.utcnow()
+    today = now.date()
+    retention_days = settings.SYSTEM_INFO_RETENTION_DAYS
+    summary = {"created": [], "brin": [], "dropped": [], "deleted_rows": 0}
+
+    with engine.connect() as conn:
+        if partitioning_enabled(engine) and is_partitioned(conn):
+            summary["created"] = ensure_partitions(
+                conn, today, settings.SYSTEM_INFO_PARTITIONS_AHEAD_DAYS,
+                keep_since=today - timedelta(days=retention_days) if retention_days > 0 else None
+            )
+            summary["brin"] = create_brin_indexes(
+                conn, today - timedelta(days=settings.SYSTEM_INFO_BRIN_AFTER_DAYS)
+            )
+            if retention_days > 0:
+                summary["dropped"] = drop_expired_partitions(conn, today - timedelta(days=retention_days))
+            conn.commit()
+        elif retention_days > 0:
+            summary["deleted_rows"] = delete_expired_rows(conn, now - timedelta(days=retention_days))
+
+    return summary
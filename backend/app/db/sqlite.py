@@ -0,0 +1,30 @@
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ..core.config import settings
+
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+def configure_sqlite(engine: Engine):
+    """
+    Tune every new SQLite connection of ``engine`` (for async engines pass
+    ``sync_engine``): WAL lets readers run alongside the single writer,
+    synchronous=NORMAL syncs only at checkpoints, which is safe in WAL mode,
+    and writers wait for the lock instead of failing right away.
+    """
+    synchronous = settings.SQLITE_SYNCHRONOUS.upper()
+    if synchronous not in SYNCHRONOUS_MODES:
+        raise ValueError(f"Invalid SQLITE_SYNCHRONOUS: {settings.SQLITE_SYNCHRONOUS}")
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute(f"PRAGMA synchronous={synchronous}")
+            cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+            # Без этого SQLite не выполняет ON DELETE у внешних ключей
+            cursor.execute("PRAGMA foreign_keys=ON")
+        finally:
+            cursor.close()
@@ -0,0 +1,15 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+# Обе реализации insert поддерживают ON CONFLICT ... DO UPDATE
+_DIALECT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def dialect_insert(dialect_name: str):
+    """``insert`` construct of the dialect, with ``on_conflict_do_update`` support."""
+    try:
+        return _DIALECT_INSERTS[dialect_name]
+    except KeyError:
+        raise ValueError(f"Unsupported database: {dialect_name}")
@@ -0,0 +1,57 @@
+"""
+Export system_info history to CSV, Parquet or Arrow IPC.
+
+Rows are read through a server-side cursor and written chunk by chunk, so
+months of history can be exported with constant memory. Run from the backend
+directory:
+
+    python -m app.export_cli --format parquet --since 2024-01-01 --until 2024-04-01 -o q1.parquet
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from .core.config import settings
+from .db.base import engine
+from .services.export import EXPORT_FORMATS, ExportWriter, export_query
+from .services.system_info import utc_naive
+
+
+def export(output, export_format: str, since: datetime, until: datetime, computer_ids=None,
+           mounts=(), chunk_size: int = settings.EXPORT_CHUNK_ROWS) -> int:
+    writer = ExportWriter(export_format, mounts)
+    exported = 0
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=chunk_size).execute(export_query(since, until, computer_ids))
+        for rows in result.partitions(chunk_size):
+            output.write(writer.write(rows))
+            exported += len(rows)
+    output.write(writer.close())
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="parquet")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="start of the range (UTC), default: a day ago")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="end of the range (UTC), default: now")
+    parser.add_argument("--computer-id", type=int, action="append", dest="computer_ids")
+    parser.add_argument("--mount", action="append", dest="mounts", default=[],
+                        help="add per-mount disk columns for this mountpoint")
+    parser.add_argument("--chunk-size", type=int, default=settings.EXPORT_CHUNK_ROWS)
+    parser.add_argument("-o", "--output", help="output file, default: stdout")
+    args = parser.parse_args()
+
+    until = utc_naive(args.until) or datetime.utcnow()
+    since = utc_naive(args.since) or until - timedelta(days=1)
+
+    if args.output:
+        with open(args.output, "wb") as output:
+            exported = export(output, args.format, since, until, args.computer_ids, args.mounts, args.chunk_size)
+    else:
+        exported = export(sys.stdout.buffer, args.format, since, until, args.computer_ids, args.mounts, args.chunk_size)
+    print(f"Exported {exported} rows", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
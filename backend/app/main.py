@@ -1,14 +1,22 @@
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from starlette.concurrency import run_in_threadpool
 
 from .core.config import settings
-from .api.endpoints import system_info
-from .db.base import get_db
+from .core.metrics import MetricsMiddleware
+from .api.endpoints import alerts, export, fleet, metrics, system_info
+from .db.base import get_db, init_db
+from .services.ingest import ingest_queue
+from .services.maintenance import maintenance_loop, rollup_loop
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -18,7 +26,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Иначе браузер не отдаст фронтенду курсор следующей страницы
+    expose_headers=[system_info.NEXT_CURSOR_HEADER, "ETag", "Last-Modified"],
 )
+if settings.METRICS_ENABLED:
+    # Последним добавленный middleware выполняется первым, поэтому время включает CORS
+    app.add_middleware(MetricsMiddleware)
 
 # Include routers
 app.include_router(
@@ -26,3 +39,47 @@ app.include_router(
     prefix=f"{settings.API_V1_STR}/system-info",
     tags=["system-info"]
 )
+app.include_router(
+    fleet.router,
+    prefix=f"{settings.API_V1_STR}/fleet",
+    tags=["fleet"]
+)
+app.include_router(
+    alerts.router,
+    prefix=f"{settings.API_V1_STR}/alerts",
+    tags=["alerts"]
+)
+app.include_router(
+    export.router,
+    prefix=f"{settings.API_V1_STR}/export",
+    tags=["export"]
+)
+if settings.METRICS_ENABLED:
+    # Prometheus ожидает /metrics в корне, а не под префиксом API
+    app.include_router(metrics.router, tags=["metrics"])
+
+
+@app.on_event("startup")
+async def create_schema():
+    # Схема создается при запуске, а не при импорте, чтобы импорт приложения не требовал базы
+    await run_in_threadpool(init_db)
+
+@app.on_event("startup")
+async def start_maintenance():
+    app.state.maintenance_task = asyncio.create_task(maintenance_loop())
+    app.state.rollup_task = asyncio.create_task(rollup_loop())
+
+@app.on_event("startup")
+async def start_ingest_queue():
+    if settings.ingest_write_behind:
+        ingest_queue.start()
+
+@app.on_event("shutdown")
+async def stop_ingest_queue():
+    # Принятые (202) замеры должны попасть в базу до остановки
+    await ingest_queue.close()
+
+@app.on_event("shutdown")
+async def stop_maintenance():
+    app.state.maintenance_task.cancel()
+    app.state.rollup_task.cancel()
@@ -0,0 +1,42 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Index
+from datetime import datetime
+
+from ..db.base import Base as DeclarativeBase
+
+class AlertRule(DeclarativeBase):
+    __tablename__ = "alert_rules"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    # Метрика из sample_metrics; disk_percent:* проверяет каждую точку монтирования
+    metric = Column(String, nullable=False)
+    operator = Column(String(2), nullable=False)
+    threshold = Column(Float, nullable=False)
+    # Окно, за которое агрегируются замеры (0 - только последний замер)
+    duration_seconds = Column(Integer, nullable=False, default=0)
+    aggregate = Column(String(3), nullable=False, default="all")
+    # NULL - правило для всех компьютеров
+    computer_id = Column(Integer, ForeignKey("computers.id"), nullable=True)
+    enabled = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class AlertEvent(DeclarativeBase):
+    __tablename__ = "alert_events"
+
+    id = Column(Integer, primary_key=True)
+    rule_id = Column(Integer, ForeignKey("alert_rules.id", ondelete="SET NULL"), nullable=True)
+    computer_id = Column(Integer, ForeignKey("computers.id"), nullable=False)
+    metric = Column(String, nullable=False)
+    status = Column(String(8), nullable=False)  # firing, resolved
+    value = Column(Float)
+    threshold = Column(Float)
+    fired_at = Column(DateTime, nullable=False)
+    resolved_at = Column(DateTime)
+    resolved_value = Column(Float)
+
+    __table_args__ = (
+        # Поиск открытого события при его закрытии
+        Index("ix_alert_events_open", rule_id, computer_id, metric, status),
+        Index("ix_alert_events_computer_id", computer_id, id),
+    )
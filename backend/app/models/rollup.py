@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
+
+from ..db.base import Base as DeclarativeBase
+
+class SystemInfoRollup(DeclarativeBase):
+    __tablename__ = "system_info_rollups"
+
+    id = Column(Integer, primary_key=True)
+    computer_id = Column(Integer, ForeignKey("computers.id"), nullable=False)
+    resolution = Column(String(4), nullable=False)  # 1m, 1h, 1d
+    bucket = Column(DateTime, nullable=False)       # начало интервала
+    metric = Column(String, nullable=False)
+
+    count = Column(Integer, nullable=False)
+    min = Column(Float)
+    max = Column(Float)
+    avg = Column(Float)
+    p95 = Column(Float)
+
+    __table_args__ = (
+        Index("ix_system_info_rollups_lookup", computer_id, resolution, metric, bucket, unique=True),
+    )
+
+class RollupState(DeclarativeBase):
+    __tablename__ = "rollup_state"
+
+    name = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False)
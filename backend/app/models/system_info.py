@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -16,14 +16,17 @@ class Computer(DeclarativeBase):
     created_at = Column(DateTime, default=datetime.utcnow)
     last_seen = Column(DateTime, default=datetime.utcnow)
     
-    system_info = relationship("SystemInfo", back_populates="computer")
+    # История не подгружается вместе с компьютером: ее читают постранично,
+    # а ленивая загрузка невозможна в асинхронной сессии
+    system_info = relationship("SystemInfo", back_populates="computer", lazy="noload")
 
 class SystemInfo(DeclarativeBase):
     __tablename__ = "system_info"
 
     id = Column(Integer, primary_key=True, index=True)
-    computer_id = Column(Integer, ForeignKey("computers.id"))
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    computer_id = Column(Integer, ForeignKey("computers.id"), nullable=False)
+    # Ключ секционирования в PostgreSQL, поэтому NOT NULL
+    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
     
     cpu_usage = Column(Float)
     memory_total = Column(Float)
@@ -31,5 +34,14 @@ class SystemInfo(DeclarativeBase):
     disk_usage = Column(JSON)
     running_processes = Column(JSON)
     network_stats = Column(JSON)
+    # Сводки быстрых замеров агента за интервал: count/min/max/mean/p95/last
+    cpu_summary = Column(JSON)
+    memory_summary = Column(JSON)
+    network_summary = Column(JSON)  # по ключу скорости из network_stats
 
     computer = relationship("Computer", back_populates="system_info")
+
+    __table_args__ = (
+        # Все выборки идут по computer_id с сортировкой по времени
+        Index("ix_system_info_computer_id_timestamp", computer_id, timestamp.desc()),
+    )
@@ -0,0 +1,59 @@
+from pydantic import BaseModel, Field, model_validator
+from datetime import datetime
+from typing import Optional
+
+class AlertRuleBase(BaseModel):
+    name: str = Field(..., min_length=1)
+    metric: str
+    operator: str = Field(..., pattern=r"^(>|>=|<|<=)$")
+    threshold: float
+    duration_seconds: int = Field(0, ge=0)
+    # all - условие выполнялось для каждого замера окна; avg/min/max - для агрегата
+    aggregate: str = Field("all", pattern=r"^(all|avg|min|max)$")
+    computer_id: Optional[int] = None
+    enabled: bool = True
+
+class AlertRuleCreate(AlertRuleBase):
+    pass
+
+class AlertRuleUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1)
+    metric: Optional[str] = None
+    operator: Optional[str] = Field(None, pattern=r"^(>|>=|<|<=)$")
+    threshold: Optional[float] = None
+    duration_seconds: Optional[int] = Field(None, ge=0)
+    aggregate: Optional[str] = Field(None, pattern=r"^(all|avg|min|max)$")
+    computer_id: Optional[int] = None
+    enabled: Optional[bool] = None
+
+    @model_validator(mode="after")
+    def check_nulls(self):
+        # Отсутствующее поле не меняется; null допустим только для computer_id (все компьютеры)
+        nulls = sorted(name for name in self.model_fields_set
+                       if name != "computer_id" and getattr(self, name) is None)
+        if nulls:
+            raise ValueError(f"Fields cannot be null: {', '.join(nulls)}")
+        return self
+
+class AlertRule(AlertRuleBase):
+    id: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class AlertEvent(BaseModel):
+    id: int
+    rule_id: Optional[int] = None
+    computer_id: int
+    metric: str
+    status: str
+    value: Optional[float] = None
+    threshold: Optional[float] = None
+    fired_at: datetime
+    resolved_at: Optional[datetime] = None
+    resolved_value: Optional[float] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,61 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Dict, List, Optional
+
+class FleetComputer(BaseModel):
+    id: int
+    hostname: str
+    ip_address: Optional[str] = None
+    os_info: Optional[str] = None
+    last_seen: Optional[datetime] = None
+    stale: bool
+    # Сводка последнего замера; None, если замеров еще не было
+    snapshot_id: Optional[int] = None
+    snapshot_timestamp: Optional[datetime] = None
+    cpu_usage: Optional[float] = None
+    memory_total: Optional[float] = None
+    memory_used: Optional[float] = None
+    memory_percent: Optional[float] = None
+    disk_percent_max: Optional[float] = None
+
+class FleetOverview(BaseModel):
+    total: int
+    stale: int
+    stale_after_seconds: int
+    items: List[FleetComputer]
+
+class ComputerAnalytics(BaseModel):
+    computer_id: int
+    hostname: Optional[str] = None
+    count: int
+    first_timestamp: datetime
+    last_timestamp: datetime
+    last: float
+    mean: float
+    std: float
+    min: float
+    max: float
+    percentiles: Dict[str, float]
+    ewma: float
+    moving_average: float
+    # Оценка последней точки и худшая оценка за окно
+    anomaly_score: float
+    anomaly_max_score: float
+    anomalies: int
+    anomalous: bool
+    last_anomaly_at: Optional[datetime] = None
+
+class FleetAnalytics(BaseModel):
+    metric: str
+    window_seconds: int
+    since: datetime
+    until: datetime
+    method: str
+    threshold: float
+    span: int
+    computers: int
+    points: int
+    anomalous: int
+    # Перцентили по всем точкам всех компьютеров
+    percentiles: Dict[str, float]
+    items: List[ComputerAnalytics]
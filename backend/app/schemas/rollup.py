@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List
+
+class MetricPoint(BaseModel):
+    timestamp: datetime
+    count: int
+    min: float
+    max: float
+    avg: float
+    p95: float
+
+class MetricSeries(BaseModel):
+    computer_id: int
+    metric: str
+    resolution: str
+    since: datetime
+    until: datetime
+    points: List[MetricPoint]
@@ -1,7 +1,16 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from datetime import datetime
 from typing import Dict, List, Optional
 
+class MetricSummary(BaseModel):
+    """Statistics of the agent's high-rate readings over one upload interval."""
+    count: int = Field(..., ge=1)
+    min: float
+    max: float
+    mean: float
+    p95: float
+    last: float
+
 class SystemInfoBase(BaseModel):
     cpu_usage: float
     memory_total: float
@@ -9,9 +18,14 @@ class SystemInfoBase(BaseModel):
     disk_usage: Dict
     running_processes: List[Dict]
     network_stats: Dict
+    # Сводки за интервал отправки; старые агенты их не присылают
+    cpu_summary: Optional[MetricSummary] = None
+    memory_summary: Optional[MetricSummary] = None
+    network_summary: Optional[Dict[str, MetricSummary]] = None
 
 class SystemInfoCreate(SystemInfoBase):
-    pass
+    # Время снятия замера на агенте (UTC); если не передано, используется время приема
+    timestamp: Optional[datetime] = None
 
 class SystemInfo(SystemInfoBase):
     id: int
@@ -21,6 +35,78 @@ class SystemInfo(SystemInfoBase):
     class Config:
         from_attributes = True
 
+class SystemInfoAccepted(BaseModel):
+    # Ответ 202 при отложенной записи: замер в очереди, id еще не назначен
+    status: str = "queued"
+    computer_id: int
+    queued: int
+
+class SystemInfoBatchItem(SystemInfoCreate):
+    computer_id: int
+
+class SystemInfoBatch(BaseModel):
+    items: List[SystemInfoBatchItem] = Field(..., min_length=1)
+
+class SystemInfoBatchItemResult(BaseModel):
+    index: int
+    computer_id: int
+    status: str
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+class SystemInfoBatchResult(BaseModel):
+    accepted: int
+    rejected: int
+    items: List[SystemInfoBatchItemResult]
+
+class SystemInfoFrame(BaseModel):
+    """
+    Delta frame sent by agents using the compact wire format.
+
+    Without ``base_id`` the frame is a full snapshot. With ``base_id`` it only
+    carries the fields that changed since that (acknowledged) snapshot, the rest
+    is copied from the base row. A field sent as null was removed and is stored
+    as null; only fields missing from the frame are copied.
+    """
+    base_id: Optional[int] = None
+    timestamp: Optional[datetime] = None
+    cpu_usage: Optional[float] = None
+    memory_total: Optional[float] = None
+    memory_used: Optional[float] = None
+    disk_usage: Optional[Dict] = None
+    running_processes: Optional[List[Dict]] = None
+    network_stats: Optional[Dict] = None
+    cpu_summary: Optional[MetricSummary] = None
+    memory_summary: Optional[MetricSummary] = None
+    network_summary: Optional[Dict[str, MetricSummary]] = None
+
+    @model_validator(mode="after")
+    def check_full_frame(self):
+        if self.base_id is None:
+            missing = [name for name, field in SystemInfoBase.model_fields.items()
+                       if field.is_required() and getattr(self, name) is None]
+            if missing:
+                raise ValueError(f"Full frame is missing fields: {', '.join(missing)}")
+        else:
+            nulls = [name for name, field in SystemInfoBase.model_fields.items()
+                     if field.is_required() and name in self.model_fields_set and getattr(self, name) is None]
+            if nulls:
+                raise ValueError(f"Delta frame cannot clear required fields: {', '.join(nulls)}")
+        return self
+
+class SystemInfoFrameAck(BaseModel):
+    id: int
+    computer_id: int
+    timestamp: datetime
+
+    class Config:
+        from_attributes = True
+
+class WireFormats(BaseModel):
+    content_types: List[str]
+    content_encodings: List[str]
+    delta_frames: bool
+
 class ComputerBase(BaseModel):
     hostname: str
     ip_address: str
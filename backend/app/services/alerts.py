@@ -0,0 +1,488 @@
+from array import array
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, timezone
+from math import ceil
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+import logging
+import operator
+import time
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.cache import InvalidationBus, invalidation_bus
+from ..core.config import settings
+from ..models.alert import AlertEvent, AlertRule
+from ..schemas.alert import AlertRuleCreate, AlertRuleUpdate
+from .pagination import decode_id_cursor, encode_id_cursor
+from .sample_metrics import DISK_PERCENT_PREFIX, NETWORK_PREFIX, NETWORK_RATE_KEYS
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "alert_rules"
+
+FIRING = "firing"
+RESOLVED = "resolved"
+
+OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+ALL = "all"
+AVG = "avg"
+MIN = "min"
+MAX = "max"
+
+SCALAR_METRICS = ("cpu_usage", "memory_used", "memory_percent")
+# disk_percent:* - каждая точка монтирования проверяется отдельно
+WILDCARD = "*"
+
+# (rule_id, computer_id, metric) открытого события
+FiringKey = Tuple[int, int, str]
+
+
+class InvalidRule(ValueError):
+    """The rule refers to a metric that samples do not have."""
+
+
+def validate_metric(metric: str):
+    if metric in SCALAR_METRICS:
+        return
+    if metric.startswith(DISK_PERCENT_PREFIX) and len(metric) > len(DISK_PERCENT_PREFIX):
+        return
+    if metric.startswith(NETWORK_PREFIX) and metric[len(NETWORK_PREFIX):] in NETWORK_RATE_KEYS:
+        return
+    raise InvalidRule(f"Unknown metric: {metric}")
+
+
+def _epoch(timestamp: datetime) -> float:
+    return timestamp.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _mean(values: Sequence[float]) -> float:
+    return sum(values) / len(values)
+
+
+class RingBuffer:
+    """
+    The last ``capacity`` (timestamp, value) samples of one metric of one
+    computer, kept in two preallocated ``array('d')`` (16 bytes per sample).
+    """
+
+    __slots__ = ("times", "values", "start", "size")
+
+    def __init__(self, capacity: int):
+        self.times = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        self.start = 0
+        self.size = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self.times)
+
+    def newest_time(self) -> Optional[float]:
+        if not self.size:
+            return None
+        return self.times[(self.start + self.size - 1) % len(self.times)]
+
+    def append(self, timestamp: float, value: float):
+        capacity = len(self.times)
+        if self.size < capacity:
+            index = (self.start + self.size) % capacity
+            self.size += 1
+        else:
+            # Буфер полон: затирается самый старый замер
+            index = self.start
+            self.start = (self.start + 1) % capacity
+        self.times[index] = timestamp
+        self.values[index] = value
+
+    def window(self, duration: float) -> Tuple[Sequence[float], bool]:
+        """
+        Values from the last sample taken at least ``duration`` seconds before
+        the newest one up to the newest, and whether the window is covered,
+        i.e. such a sample exists (or the buffer is full and this is the best
+        we have).
+
+        Timestamps only grow, so both halves of the ring are sorted and the
+        window start is found with a binary search.
+        """
+        capacity = len(self.times)
+        end = self.start + self.size
+        boundary = self.times[(end - 1) % capacity] - duration
+        full = self.size == capacity
+        if end <= capacity:
+            position = bisect_right(self.times, boundary, self.start, end) - 1
+            if position < self.start:
+                return self.values[self.start:end], full
+            return self.values[position:end], True
+
+        # Кольцо перешло через конец массива: [start, capacity) + [0, wrapped)
+        wrapped = end - capacity
+        position = bisect_right(self.times, boundary, 0, wrapped) - 1
+        if position >= 0:
+            return self.values[position:wrapped], True
+        position = bisect_right(self.times, boundary, self.start, capacity) - 1
+        if position < self.start:
+            return self.values[self.start:] + self.values[:wrapped], full
+        return self.values[position:] + self.values[:wrapped], True
+
+    def resized(self, capacity: int) -> "RingBuffer":
+        buffer = RingBuffer(capacity)
+        for offset in range(max(self.size - capacity, 0), self.size):
+            index = (self.start + offset) % len(self.times)
+            buffer.append(self.times[index], self.values[index])
+        return buffer
+
+
+class CompiledRule(NamedTuple):
+    id: int
+    duration: float
+    reduce: Callable[[Sequence[float]], float]
+    compare: Callable[[float, float], bool]
+    threshold: float
+
+
+def compile_rule(rule: AlertRule) -> CompiledRule:
+    aggregate = rule.aggregate
+    if aggregate == ALL:
+        # Условие выполнено для каждого замера окна, если оно выполнено для худшего из них
+        aggregate = MIN if rule.operator in (">", ">=") else MAX
+    return CompiledRule(
+        id=rule.id,
+        duration=float(rule.duration_seconds or 0),
+        reduce={AVG: _mean, MIN: min, MAX: max}[aggregate],
+        compare=OPERATORS[rule.operator],
+        threshold=rule.threshold
+    )
+
+
+class _MetricRules(NamedTuple):
+    shared: Tuple[CompiledRule, ...]
+    by_computer: Dict[int, Tuple[CompiledRule, ...]]
+    capacity: int
+
+
+class RuleSet:
+    """
+    Enabled rules compiled once and indexed by metric, then by computer, so a
+    sample only meets the rules that apply to it. Wildcard rules
+    (``disk_percent:*``) are matched by metric prefix the first time a metric
+    name is seen.
+    """
+
+    def __init__(self, rules: Iterable[AlertRule], max_samples: int, min_interval: float):
+        self.max_samples = max_samples
+        self.min_interval = min_interval
+        self._exact: Dict[str, List[Tuple[Optional[int], CompiledRule]]] = defaultdict(list)
+        self._prefixed: Dict[str, List[Tuple[Optional[int], CompiledRule]]] = defaultdict(list)
+        self._count = 0
+        for rule in rules:
+            entry = (rule.computer_id, compile_rule(rule))
+            if rule.metric.endswith(WILDCARD):
+                self._prefixed[rule.metric[:-len(WILDCARD)]].append(entry)
+            else:
+                self._exact[rule.metric].append(entry)
+            self._count += 1
+        self._matches: Dict[str, Optional[_MetricRules]] = {}
+
+    def __len__(self) -> int:
+        return self._count
+
+    def rules_for(self, metric: str) -> Optional[_MetricRules]:
+        if metric not in self._matches:
+            self._matches[metric] = self._match(metric)
+        return self._matches[metric]
+
+    def _match(self, metric: str) -> Optional[_MetricRules]:
+        entries = list(self._exact.get(metric, ()))
+        separator = metric.find(":")
+        if separator >= 0:
+            entries.extend(self._prefixed.get(metric[:separator + 1], ()))
+        if not entries:
+            return None
+
+        shared = []
+        by_computer = defaultdict(list)
+        for computer_id, compiled in entries:
+            if computer_id is None:
+                shared.append(compiled)
+            else:
+                by_computer[computer_id].append(compiled)
+        # Окно самого длинного правила при самой частой отправке замеров
+        duration = max(compiled.duration for _, compiled in entries)
+        capacity = min(self.max_samples, ceil(duration / self.min_interval) + 1)
+        return _MetricRules(
+            shared=tuple(shared),
+            by_computer={computer_id: tuple(compiled) for computer_id, compiled in by_computer.items()},
+            capacity=capacity
+        )
+
+
+class AlertTransition(NamedTuple):
+    status: str
+    rule_id: int
+    computer_id: int
+    metric: str
+    value: float
+    threshold: float
+    timestamp: datetime
+
+
+class AlertEngine:
+    """
+    Evaluates alert rules against every accepted sample, in process.
+
+    Each (computer, metric) that some rule watches gets a ring buffer sized for
+    the longest window of those rules. A rule fires when its aggregate over
+    the window breaches the threshold and resolves when it no longer does;
+    only these transitions are returned, to be stored as events.
+
+    Windows and firing state live in process memory, so the engine needs
+    every sample of a computer to pass through one process: run the backend
+    with a single worker. Rules and firing alerts are reloaded from the
+    database when they change here and at least every ``reload_interval``
+    seconds, which is how changes made elsewhere (the invalidation bus only
+    reaches this process) are picked up.
+    """
+
+    def __init__(self, bus: InvalidationBus, max_samples: int, min_interval: float,
+                 reload_interval: float = 60.0):
+        self.bus = bus
+        self.max_samples = max_samples
+        self.min_interval = min_interval
+        self.reload_interval = reload_interval
+        self._loaded_at = 0.0
+        self.rules = RuleSet((), max_samples, min_interval)
+        self._buffers: Dict[Tuple[int, str], RingBuffer] = {}
+        self._firing: Set[FiringKey] = set()
+        # Правила еще не загружены
+        self.stale = True
+        bus.subscribe(self._on_message)
+
+    @property
+    def idle(self) -> bool:
+        return not self.needs_reload() and not len(self.rules)
+
+    def needs_reload(self) -> bool:
+        if self.stale:
+            return True
+        return self.reload_interval > 0 and time.monotonic() - self._loaded_at >= self.reload_interval
+
+    def load(self, rules: Iterable[AlertRule], firing: Iterable[FiringKey]):
+        self.rules = RuleSet(rules, self.max_samples, self.min_interval)
+        self._firing = set(firing)
+        # Буферы метрик, за которыми больше не следит ни одно правило, не нужны
+        self._buffers = {key: buffer for key, buffer in self._buffers.items() if self.rules.rules_for(key[1])}
+        self.stale = False
+        self._loaded_at = time.monotonic()
+
+    def rules_changed(self):
+        self.stale = True
+        self.bus.publish(CHANNEL, None)
+
+    def observe(self, computer_id: int, timestamp: datetime, metrics: Dict[str, float]) -> List[AlertTransition]:
+        transitions = []
+        now = _epoch(timestamp)
+        for metric, value in metrics.items():
+            matched = self.rules.rules_for(metric)
+            if matched is None:
+                continue
+            rules = matched.shared + matched.by_computer.get(computer_id, ())
+            if not rules:
+                continue
+
+            key = (computer_id, metric)
+            buffer = self._buffers.get(key)
+            if buffer is None:
+                buffer = self._buffers[key] = RingBuffer(matched.capacity)
+            elif buffer.capacity != matched.capacity:
+                buffer = self._buffers[key] = buffer.resized(matched.capacity)
+            newest = buffer.newest_time()
+            if newest is not None and now <= newest:
+                # Запоздавший замер (догрузка буфера агента) окно не сдвигает
+                continue
+            buffer.append(now, value)
+
+            # Правила одной метрики обычно смотрят на несколько одинаковых окон
+            windows = {}
+            for rule in rules:
+                if rule.duration not in windows:
+                    windows[rule.duration] = buffer.window(rule.duration)
+                window, covered = windows[rule.duration]
+                if not covered:
+                    continue
+                aggregated = rule.reduce(window)
+                breached = rule.compare(aggregated, rule.threshold)
+                firing_key = (rule.id, computer_id, metric)
+                if breached == (firing_key in self._firing):
+                    continue
+                if breached:
+                    self._firing.add(firing_key)
+                else:
+                    self._firing.discard(firing_key)
+                transitions.append(AlertTransition(
+                    status=FIRING if breached else RESOLVED,
+                    rule_id=rule.id,
+                    computer_id=computer_id,
+                    metric=metric,
+                    value=aggregated,
+                    threshold=rule.threshold,
+                    timestamp=timestamp
+                ))
+        return transitions
+
+    def _on_message(self, message: Dict):
+        if message["channel"] == CHANNEL and message["origin"] != self.bus.origin:
+            self.stale = True
+
+
+class AlertService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_rules(self) -> List[AlertRule]:
+        return (await self.db.scalars(select(AlertRule).order_by(AlertRule.id))).all()
+
+    async def get_rule(self, rule_id: int) -> Optional[AlertRule]:
+        return await self.db.get(AlertRule, rule_id)
+
+    async def create_rule(self, rule: AlertRuleCreate) -> AlertRule:
+        validate_metric(rule.metric)
+        db_rule = AlertRule(**rule.model_dump())
+        self.db.add(db_rule)
+        await self.db.commit()
+        await self._rules_changed()
+        return db_rule
+
+    async def update_rule(self, rule_id: int, changes: AlertRuleUpdate) -> Optional[AlertRule]:
+        db_rule = await self.get_rule(rule_id)
+        if db_rule is None:
+            return None
+        values = changes.model_dump(exclude_unset=True)
+        if values.get("metric") is not None:
+            validate_metric(values["metric"])
+        # Открытые события относятся к прежней метрике или компьютеру
+        retarget = any(key in values and values[key] != getattr(db_rule, key) for key in ("metric", "computer_id"))
+        for key, value in values.items():
+            setattr(db_rule, key, value)
+        if retarget or not db_rule.enabled:
+            await self._close_events(rule_id)
+        await self.db.commit()
+        await self._rules_changed()
+        return db_rule
+
+    async def delete_rule(self, rule_id: int) -> bool:
+        db_rule = await self.get_rule(rule_id)
+        if db_rule is None:
+            return False
+        await self._close_events(rule_id)
+        await self.db.delete(db_rule)
+        await self.db.commit()
+        await self._rules_changed()
+        return True
+
+    async def get_events(
+        self,
+        status: Optional[str] = None,
+        computer_id: Optional[int] = None,
+        rule_id: Optional[int] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[AlertEvent], Optional[str]]:
+        """
+        Alert events, newest first, keyset-paginated by id.
+
+        :return: events of the page and the cursor of the next page, or None
+        """
+        query = select(AlertEvent)
+        if status is not None:
+            query = query.where(AlertEvent.status == status)
+        if computer_id is not None:
+            query = query.where(AlertEvent.computer_id == computer_id)
+        if rule_id is not None:
+            query = query.where(AlertEvent.rule_id == rule_id)
+        if cursor is not None:
+            query = query.where(AlertEvent.id < decode_id_cursor(cursor))
+
+        events = (await self.db.scalars(query.order_by(AlertEvent.id.desc()).limit(limit + 1))).all()
+        if len(events) <= limit:
+            return events, None
+        events = events[:limit]
+        return events, encode_id_cursor(events[-1].id)
+
+    async def evaluate(self, samples: Sequence[Tuple[int, datetime, Dict[str, float]]]):
+        """
+        Run (computer_id, timestamp, metrics) samples, oldest first, through the
+        alert engine and store the resulting events.
+        """
+        if alert_engine.needs_reload():
+            await self.reload_engine()
+        transitions = []
+        for computer_id, timestamp, metrics in samples:
+            transitions.extend(alert_engine.observe(computer_id, timestamp, metrics))
+        if transitions:
+            try:
+                await self.record(transitions)
+            except Exception:
+                # Движок уже считает эти переходы случившимися, а событий в базе нет:
+                # состояние перечитывается из alert_events, и переход повторится
+                alert_engine.stale = True
+                await self.db.rollback()
+                raise
+
+    async def record(self, transitions: List[AlertTransition]):
+        for transition in transitions:
+            logger.info(
+                f"Alert {transition.status}: rule {transition.rule_id} on computer {transition.computer_id}, "
+                f"{transition.metric}={transition.value:.2f} (threshold {transition.threshold})"
+            )
+            if transition.status == FIRING:
+                self.db.add(AlertEvent(
+                    rule_id=transition.rule_id,
+                    computer_id=transition.computer_id,
+                    metric=transition.metric,
+                    status=FIRING,
+                    value=transition.value,
+                    threshold=transition.threshold,
+                    fired_at=transition.timestamp
+                ))
+                continue
+            # Событие могло быть открыто в этой же пачке
+            await self.db.flush()
+            await self.db.execute(
+                update(AlertEvent)
+                .where(AlertEvent.rule_id == transition.rule_id,
+                       AlertEvent.computer_id == transition.computer_id,
+                       AlertEvent.metric == transition.metric,
+                       AlertEvent.status == FIRING)
+                .values(status=RESOLVED, resolved_at=transition.timestamp, resolved_value=transition.value)
+            )
+        await self.db.commit()
+
+    async def reload_engine(self):
+        rules = (await self.db.scalars(select(AlertRule).where(AlertRule.enabled.is_(True)))).all()
+        firing = (await self.db.execute(
+            select(AlertEvent.rule_id, AlertEvent.computer_id, AlertEvent.metric)
+            .where(AlertEvent.status == FIRING, AlertEvent.rule_id.is_not(None))
+        )).all()
+        alert_engine.load(rules, [tuple(row) for row in firing])
+        logger.info(f"Loaded {len(rules)} alert rules, {len(firing)} firing alerts")
+
+    async def _close_events(self, rule_id: int):
+        await self.db.execute(
+            update(AlertEvent)
+            .where(AlertEvent.rule_id == rule_id, AlertEvent.status == FIRING)
+            .values(status=RESOLVED, resolved_at=datetime.utcnow())
+        )
+
+    async def _rules_changed(self):
+        alert_engine.rules_changed()
+        await self.reload_engine()
+
+
+alert_engine = AlertEngine(
+    invalidation_bus,
+    max_samples=settings.ALERT_WINDOW_MAX_SAMPLES,
+    min_interval=settings.ALERT_MIN_SAMPLE_INTERVAL_SECONDS,
+    reload_interval=settings.ALERT_RULES_RELOAD_SECONDS
+)
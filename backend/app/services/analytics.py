@@ -0,0 +1,229 @@
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import Dict, List, Optional, Sequence
+import logging
+import re
+
+import numpy as np
+from sqlalchemy import Float, cast, func, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.system_info import Computer, SystemInfo
+from ..schemas.fleet import ComputerAnalytics, FleetAnalytics
+from .sample_metrics import DISK_PERCENT_PREFIX, NETWORK_PREFIX, NETWORK_RATE_KEYS
+from .series_stats import DEFAULT_THRESHOLDS, ZSCORE, analyze_series, counter_rates
+
+logger = logging.getLogger(__name__)
+
+# Счетчики из network_stats; по ним считается скорость изменения
+NETWORK_COUNTER_KEYS = ("bytes_sent", "bytes_recv", "packets_sent", "packets_recv")
+
+WINDOW_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+WINDOW_PATTERN = re.compile(r"^(\d+)([smhd])$")
+
+
+class UnknownMetric(ValueError):
+    """The metric name does not map to a stored value."""
+
+
+class AnalyticsTooLarge(Exception):
+    """The requested window holds more points than ANALYTICS_MAX_POINTS."""
+
+
+def parse_window(window: str) -> timedelta:
+    """Parse ``30s``, ``15m``, ``1h`` or ``7d``."""
+    match = WINDOW_PATTERN.match(window)
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid window: {window}")
+    return timedelta(seconds=int(match.group(1)) * WINDOW_UNITS[match.group(2)])
+
+
+def metric_column(metric: str):
+    """
+    SQL expression for a metric and whether it is a counter.
+
+    Metric names follow sample_metrics (``cpu_usage``, ``memory_used``,
+    ``memory_percent``, ``disk_percent:<mount>``, ``net.<rate>``), plus
+    ``net.<counter>`` for the raw network counters, which are turned into
+    per-second rates.
+    """
+    if metric in ("cpu_usage", "memory_used"):
+        return getattr(SystemInfo, metric), False
+    if metric == "memory_percent":
+        return SystemInfo.memory_used * 100.0 / func.nullif(SystemInfo.memory_total, 0), False
+    if metric.startswith(DISK_PERCENT_PREFIX) and len(metric) > len(DISK_PERCENT_PREFIX):
+        mountpoint = metric[len(DISK_PERCENT_PREFIX):]
+        return SystemInfo.disk_usage[(mountpoint, "percent")].as_float(), False
+    if metric.startswith(NETWORK_PREFIX):
+        key = metric[len(NETWORK_PREFIX):]
+        if key in NETWORK_RATE_KEYS:
+            return SystemInfo.network_stats[key].as_float(), False
+        if key in NETWORK_COUNTER_KEYS:
+            return SystemInfo.network_stats[key].as_float(), True
+    raise UnknownMetric(f"Unknown metric: {metric}")
+
+
+def _percentile_key(percentile: float) -> str:
+    return f"p{percentile:g}"
+
+
+def _from_epoch(seconds: float) -> datetime:
+    return datetime.utcfromtimestamp(seconds)
+
+
+class AnalyticsService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def load_series(self, metric: str, since: datetime, until: datetime,
+                    computer_ids: Optional[Sequence[int]] = None):
+        """
+        One query for the metric of every requested computer in the window,
+        as flat (computer_id, epoch seconds, value) arrays sorted by computer
+        and time; counters are already converted to rates.
+
+        :raises UnknownMetric: for an unsupported metric name
+        :raises AnalyticsTooLarge: if the window holds more than ANALYTICS_MAX_POINTS points
+        """
+        column, is_counter = metric_column(metric)
+        dialect_name = self.db.get_bind().dialect.name
+        if dialect_name == "sqlite":
+            # extract('epoch') в SQLite отбрасывает доли секунды, julianday их сохраняет
+            epoch = (func.julianday(SystemInfo.timestamp) - 2440587.5) * 86400.0
+        else:
+            epoch = cast(func.extract("epoch", SystemInfo.timestamp), Float)
+        value = cast(column, Float)
+        conditions = [SystemInfo.timestamp >= since, SystemInfo.timestamp < until]
+        if computer_ids:
+            conditions.append(SystemInfo.computer_id.in_(computer_ids))
+
+        if dialect_name == "postgresql":
+            # Не больше ANALYTICS_MAX_POINTS + 1 строк еще до агрегации: слишком
+            # большое окно не читается целиком ради ответа 413
+            points = (
+                select(SystemInfo.computer_id, SystemInfo.timestamp, epoch.label("epoch"), value.label("value"))
+                .where(*conditions)
+                .limit(settings.ANALYTICS_MAX_POINTS + 1)
+                .subquery()
+            )
+            # Строка на компьютер с массивами: драйвер разбирает их в двоичном
+            # виде, это в разы быстрее, чем миллион отдельных строк
+            rows = self.db.execute(
+                select(points.c.computer_id,
+                       func.array_agg(aggregate_order_by(points.c.epoch, points.c.timestamp)),
+                       func.array_agg(aggregate_order_by(points.c.value, points.c.timestamp)))
+                .group_by(points.c.computer_id)
+                .order_by(points.c.computer_id)
+            ).all()
+            counts = [len(row[1]) for row in rows]
+            if sum(counts) > settings.ANALYTICS_MAX_POINTS:
+                raise AnalyticsTooLarge(f"More than {settings.ANALYTICS_MAX_POINTS} points, narrow the window")
+            ids = np.repeat(np.array([row[0] for row in rows], dtype=np.int64), counts)
+            times = np.fromiter(chain.from_iterable(row[1] for row in rows), np.float64, sum(counts))
+            # None превращается в NaN
+            values = np.array(list(chain.from_iterable(row[2] for row in rows)), dtype=np.float64)
+        else:
+            rows = self.db.execute(
+                select(SystemInfo.computer_id, epoch, value)
+                .where(*conditions)
+                .order_by(SystemInfo.computer_id, SystemInfo.timestamp)
+                .limit(settings.ANALYTICS_MAX_POINTS + 1)
+            ).all()
+            if len(rows) > settings.ANALYTICS_MAX_POINTS:
+                raise AnalyticsTooLarge(f"More than {settings.ANALYTICS_MAX_POINTS} points, narrow the window")
+            columns = list(zip(*rows)) or [(), (), ()]
+            ids = np.array(columns[0], dtype=np.int64)
+            times = np.array(columns[1], dtype=np.float64)
+            values = np.array(columns[2], dtype=np.float64)
+
+        if is_counter:
+            ids, times, values = counter_rates(ids, times, values)
+        return ids, times, values
+
+    def get_analytics(
+        self,
+        metric: str,
+        window: timedelta,
+        computer_ids: Optional[Sequence[int]] = None,
+        percentiles: Sequence[float] = (50, 95, 99),
+        span: int = 10,
+        method: str = ZSCORE,
+        threshold: Optional[float] = None,
+        anomalous: Optional[bool] = None,
+        limit: Optional[int] = None,
+        now: Optional[datetime] = None
+    ) -> FleetAnalytics:
+        """
+        Per-computer statistics of one metric over the last ``window``, worst
+        anomaly score first.
+
+        :param anomalous: keep only computers whose latest point is (True) or
+            is not (False) an anomaly
+        """
+        until = now or datetime.utcnow()
+        since = until - window
+        threshold = DEFAULT_THRESHOLDS[method] if threshold is None else threshold
+        ids, times, values = self.load_series(metric, since, until, computer_ids)
+        result = analyze_series(ids, times, values, percentiles, span, method, threshold)
+
+        overview = FleetAnalytics(
+            metric=metric,
+            window_seconds=int(window.total_seconds()),
+            since=since,
+            until=until,
+            method=method,
+            threshold=threshold,
+            span=span,
+            computers=0,
+            points=0,
+            anomalous=0,
+            percentiles={},
+            items=[]
+        )
+        if result is None:
+            return overview
+
+        hostnames: Dict[int, str] = dict(self.db.execute(
+            select(Computer.id, Computer.hostname).where(Computer.id.in_(result.computer_ids.tolist()))
+        ).all())
+        keys = [_percentile_key(percentile) for percentile in percentiles]
+        latest_anomalous = np.abs(result.anomaly_score) > threshold
+
+        items: List[ComputerAnalytics] = []
+        order = np.argsort(-result.anomaly_max_score, kind="stable")
+        for i in order.tolist():
+            if anomalous is not None and bool(latest_anomalous[i]) != anomalous:
+                continue
+            computer_id = int(result.computer_ids[i])
+            last_anomaly = result.last_anomaly_times[i]
+            items.append(ComputerAnalytics(
+                computer_id=computer_id,
+                hostname=hostnames.get(computer_id),
+                count=int(result.counts[i]),
+                first_timestamp=_from_epoch(result.first_times[i]),
+                last_timestamp=_from_epoch(result.last_times[i]),
+                last=result.last[i],
+                mean=result.mean[i],
+                std=result.std[i],
+                min=result.min[i],
+                max=result.max[i],
+                percentiles=dict(zip(keys, result.percentiles[:, i].tolist())),
+                ewma=result.ewma[i],
+                moving_average=result.moving_average[i],
+                anomaly_score=result.anomaly_score[i],
+                anomaly_max_score=result.anomaly_max_score[i],
+                anomalies=int(result.anomalies[i]),
+                anomalous=bool(latest_anomalous[i]),
+                last_anomaly_at=None if np.isnan(last_anomaly) else _from_epoch(last_anomaly)
+            ))
+            if limit and len(items) >= limit:
+                break
+
+        overview.computers = len(result.counts)
+        overview.points = int(result.counts.sum())
+        overview.anomalous = int(latest_anomalous.sum())
+        overview.percentiles = dict(zip(keys, np.percentile(result.all_values, percentiles).tolist()))
+        overview.items = items
+        return overview
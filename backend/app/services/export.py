@@ -0,0 +1,215 @@
+import csv
+import io
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence
+import logging
+
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow нужен только для Parquet и Arrow
+    pa = None
+    pq = None
+
+from ..db.base import AsyncSessionLocal
+from ..models.system_info import Computer, SystemInfo
+from .sample_metrics import NETWORK_RATE_KEYS
+
+logger = logging.getLogger(__name__)
+
+CSV = "csv"
+PARQUET = "parquet"
+ARROW = "arrow"
+EXPORT_FORMATS = (CSV, PARQUET, ARROW)
+
+MEDIA_TYPES = {
+    CSV: "text/csv",
+    PARQUET: "application/vnd.apache.parquet",
+    ARROW: "application/vnd.apache.arrow.stream",
+}
+FILE_EXTENSIONS = {CSV: "csv", PARQUET: "parquet", ARROW: "arrows"}
+
+NETWORK_COUNTER_KEYS = ("bytes_sent", "bytes_recv", "packets_sent", "packets_recv")
+DISK_FIELDS = ("total", "used", "percent")
+
+
+class ExportUnavailable(Exception):
+    """The requested export format needs a library that is not installed."""
+
+
+def export_query(since: datetime, until: datetime, computer_ids: Optional[Sequence[int]] = None):
+    """
+    Rows to export, without running_processes. Ordered per computer by time,
+    which the (computer_id, timestamp) index serves without a sort, so rows
+    start flowing right away.
+    """
+    query = (
+        select(SystemInfo.id, SystemInfo.computer_id, Computer.hostname, SystemInfo.timestamp,
+               SystemInfo.cpu_usage, SystemInfo.memory_total, SystemInfo.memory_used,
+               SystemInfo.disk_usage, SystemInfo.network_stats)
+        .join(Computer, Computer.id == SystemInfo.computer_id)
+        .where(SystemInfo.timestamp >= since, SystemInfo.timestamp < until)
+        .order_by(SystemInfo.computer_id, SystemInfo.timestamp)
+    )
+    if computer_ids:
+        query = query.where(SystemInfo.computer_id.in_(computer_ids))
+    return query
+
+
+def export_columns(mounts: Sequence[str] = ()) -> List[str]:
+    columns = ["id", "computer_id", "hostname", "timestamp", "cpu_usage", "memory_total",
+               "memory_used", "memory_percent", "disk_total", "disk_used", "disk_percent_max"]
+    for mount in mounts:
+        columns.extend(f"disk.{mount}.{field}" for field in DISK_FIELDS)
+    columns.extend(f"net.{key}" for key in NETWORK_COUNTER_KEYS)
+    columns.extend(f"net.{key}" for key in NETWORK_RATE_KEYS)
+    return columns
+
+
+def flatten_row(row, mounts: Sequence[str] = ()) -> Dict:
+    """
+    Turn one system_info row into flat typed values: memory percent, disk
+    totals over all mounts plus the requested mounts one by one, and the
+    network counters and rates.
+    """
+    disk_usage = row.disk_usage or {}
+    network_stats = row.network_stats or {}
+    disks = [usage for usage in disk_usage.values() if isinstance(usage, dict)]
+    percents = [usage["percent"] for usage in disks if usage.get("percent") is not None]
+
+    flat = {
+        "id": row.id,
+        "computer_id": row.computer_id,
+        "hostname": row.hostname,
+        "timestamp": row.timestamp,
+        "cpu_usage": row.cpu_usage,
+        "memory_total": row.memory_total,
+        "memory_used": row.memory_used,
+        "memory_percent": row.memory_used / row.memory_total * 100
+        if row.memory_total and row.memory_used is not None else None,
+        "disk_total": sum(usage.get("total") or 0 for usage in disks) if disks else None,
+        "disk_used": sum(usage.get("used") or 0 for usage in disks) if disks else None,
+        "disk_percent_max": max(percents) if percents else None,
+    }
+    for mount in mounts:
+        usage = disk_usage.get(mount) or {}
+        for field in DISK_FIELDS:
+            flat[f"disk.{mount}.{field}"] = usage.get(field)
+    for key in NETWORK_COUNTER_KEYS + NETWORK_RATE_KEYS:
+        flat[f"net.{key}"] = network_stats.get(key)
+    return flat
+
+
+class _ChunkSink:
+    """
+    Write-only file object collecting what pyarrow writes, so every encoded
+    chunk can be handed to the response (or a file) and then forgotten.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # Parquet записывает смещения групп строк, поэтому позиция сквозная
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+class ExportWriter:
+    """
+    Encode chunks of flattened rows incrementally. ``write`` and ``close``
+    return the bytes produced so far, so the caller never holds more than one
+    chunk of the export in memory.
+    """
+
+    def __init__(self, export_format: str, mounts: Sequence[str] = ()):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {export_format}")
+        if export_format != CSV and pa is None:
+            raise ExportUnavailable(f"{export_format} export requires pyarrow")
+        self.format = export_format
+        self.mounts = list(mounts)
+        self.columns = export_columns(self.mounts)
+        self._sink = _ChunkSink()
+        self._writer = None
+
+        if export_format == CSV:
+            self._text = io.StringIO()
+            self._csv = csv.writer(self._text)
+            self._csv.writerow(self.columns)
+        else:
+            self.schema = self._arrow_schema()
+            if export_format == PARQUET:
+                self._writer = pq.ParquetWriter(self._sink, self.schema, compression="zstd")
+            else:
+                self._writer = pa.ipc.new_stream(self._sink, self.schema)
+
+    def _arrow_schema(self):
+        types = {"id": pa.int64(), "computer_id": pa.int64(), "hostname": pa.string(),
+                 "timestamp": pa.timestamp("us", tz="UTC")}
+        return pa.schema([(column, types.get(column, pa.float64())) for column in self.columns])
+
+    def write(self, rows: Iterable) -> bytes:
+        flat_rows = [flatten_row(row, self.mounts) for row in rows]
+        if self.format == CSV:
+            for flat in flat_rows:
+                self._csv.writerow(
+                    "" if flat[column] is None else
+                    flat[column].isoformat() if isinstance(flat[column], datetime) else flat[column]
+                    for column in self.columns
+                )
+            data = self._text.getvalue().encode("utf-8")
+            self._text.seek(0)
+            self._text.truncate()
+            return data
+
+        batch = pa.RecordBatch.from_pydict(
+            {column: [flat[column] for flat in flat_rows] for column in self.columns},
+            schema=self.schema
+        )
+        # В Parquet каждая порция становится отдельной группой строк
+        self._writer.write_batch(batch)
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        if self.format == CSV:
+            return self._text.getvalue().encode("utf-8")
+        self._writer.close()
+        return self._sink.drain()
+
+
+async def stream_export(writer: ExportWriter, query, chunk_size: int) -> AsyncIterator[bytes]:
+    """
+    Stream an export through a server-side cursor, ``chunk_size`` rows at a
+    time. Encoding runs in the threadpool so it does not stall the event loop.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=chunk_size))
+        async for rows in result.partitions(chunk_size):
+            data = await run_in_threadpool(writer.write, rows)
+            if data:
+                yield data
+    yield writer.close()
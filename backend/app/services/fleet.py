@@ -0,0 +1,174 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import logging
+
+from sqlalchemy import case, func, or_, select, true
+from sqlalchemy.orm import Session
+
+from ..models.system_info import Computer, SystemInfo
+from ..schemas.fleet import FleetComputer, FleetOverview
+from .sample_metrics import DISK_PERCENT_PREFIX, extract_metrics
+
+logger = logging.getLogger(__name__)
+
+# Поля, по которым можно сортировать обзор
+FLEET_SORT_KEYS = (
+    "hostname",
+    "last_seen",
+    "cpu_usage",
+    "memory_percent",
+    "disk_percent_max",
+)
+# Ключи, по которым сортирует и обрезает список сама база; disk_percent_max
+# вычисляется из JSON disk_usage, поэтому сортируется в Python
+SQL_SORT_KEYS = ("hostname", "last_seen", "cpu_usage", "memory_percent")
+
+# Колонки последнего замера; running_processes не нужен и самый тяжелый
+LATEST_COLUMNS = (
+    SystemInfo.id,
+    SystemInfo.timestamp,
+    SystemInfo.cpu_usage,
+    SystemInfo.memory_total,
+    SystemInfo.memory_used,
+    SystemInfo.disk_usage,
+)
+
+
+def _latest_snapshot_query(dialect_name: str):
+    """
+    Computers joined with their latest system_info row in one statement.
+
+    On PostgreSQL a LATERAL subquery does one backward index probe on
+    (computer_id, timestamp) per computer, instead of the full history scan a
+    DISTINCT ON over system_info needs. Other databases get a correlated
+    subquery picking the latest id.
+    """
+    computer_columns = (Computer.id, Computer.hostname, Computer.ip_address, Computer.os_info, Computer.last_seen)
+    if dialect_name == "postgresql":
+        latest = (
+            select(*LATEST_COLUMNS)
+            .where(SystemInfo.computer_id == Computer.id)
+            .order_by(SystemInfo.timestamp.desc())
+            .limit(1)
+            .lateral("latest")
+        )
+        return (
+            select(*computer_columns, *(latest.c[column.key].label(f"latest_{column.key}") for column in LATEST_COLUMNS))
+            .outerjoin(latest, true())
+        )
+
+    latest_id = (
+        select(SystemInfo.id)
+        .where(SystemInfo.computer_id == Computer.id)
+        .order_by(SystemInfo.timestamp.desc())
+        .limit(1)
+        .correlate(Computer)
+        .scalar_subquery()
+    )
+    return (
+        select(*computer_columns, *(column.label(f"latest_{column.key}") for column in LATEST_COLUMNS))
+        .outerjoin(SystemInfo, SystemInfo.id == latest_id)
+    )
+
+
+class FleetService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_overview(
+        self,
+        stale_after: int,
+        sort: str = "hostname",
+        descending: bool = False,
+        limit: Optional[int] = None,
+        stale: Optional[bool] = None,
+        hostname: Optional[str] = None,
+        min_cpu: Optional[float] = None,
+        now: Optional[datetime] = None
+    ) -> FleetOverview:
+        """
+        Every computer with a summary of its latest snapshot.
+
+        Filters, and for the scalar sort keys also the order and ``limit``,
+        are applied by the database; ``total`` and ``stale`` count every
+        matching computer, not only the returned ones.
+
+        :param stale_after: seconds without data after which a computer is stale
+        :param stale: keep only stale (True) or only fresh (False) computers
+        :param hostname: case-insensitive hostname substring
+        :param min_cpu: keep only computers whose latest CPU usage is at least this
+        """
+        now = now or datetime.utcnow()
+        stale_before = now - timedelta(seconds=stale_after)
+
+        snapshot = _latest_snapshot_query(self.db.get_bind().dialect.name).subquery("snapshot")
+        is_stale = or_(snapshot.c.last_seen.is_(None), snapshot.c.last_seen < stale_before)
+        query = select(
+            snapshot,
+            # Итоги по всем подходящим компьютерам считаются до LIMIT
+            func.count().over().label("matched_total"),
+            func.sum(case((is_stale, 1), else_=0)).over().label("matched_stale"),
+        )
+        if hostname:
+            query = query.where(snapshot.c.hostname.ilike(f"%{hostname}%"))
+        if stale is True:
+            query = query.where(is_stale)
+        elif stale is False:
+            query = query.where(snapshot.c.last_seen >= stale_before)
+        if min_cpu is not None:
+            query = query.where(snapshot.c.latest_cpu_usage >= min_cpu)
+
+        if sort in SQL_SORT_KEYS:
+            column = {
+                "hostname": snapshot.c.hostname,
+                "last_seen": snapshot.c.last_seen,
+                "cpu_usage": snapshot.c.latest_cpu_usage,
+                # Как в extract_metrics: без memory_total процента нет
+                "memory_percent": case(
+                    (snapshot.c.latest_memory_total != 0,
+                     snapshot.c.latest_memory_used / snapshot.c.latest_memory_total * 100)
+                ),
+            }[sort]
+            # Компьютеры без значения всегда в конце, в каком бы порядке ни сортировали
+            query = query.order_by((column.desc() if descending else column.asc()).nulls_last(), snapshot.c.id)
+            if limit:
+                query = query.limit(limit)
+
+        rows = self.db.execute(query).all()
+        items = [self._summarize(row, stale_before) for row in rows]
+        if sort not in SQL_SORT_KEYS:
+            present = [item for item in items if getattr(item, sort) is not None]
+            missing = [item for item in items if getattr(item, sort) is None]
+            present.sort(key=lambda item: getattr(item, sort), reverse=descending)
+            items = present + missing
+            if limit:
+                items = items[:limit]
+
+        return FleetOverview(
+            total=rows[0].matched_total if rows else 0,
+            stale=rows[0].matched_stale if rows else 0,
+            stale_after_seconds=stale_after,
+            items=items
+        )
+
+    @staticmethod
+    def _summarize(row, stale_before: datetime) -> FleetComputer:
+        metrics: Dict[str, float] = extract_metrics(
+            row.latest_cpu_usage, row.latest_memory_total, row.latest_memory_used, row.latest_disk_usage, None
+        )
+        disk_percents: List[float] = [value for name, value in metrics.items() if name.startswith(DISK_PERCENT_PREFIX)]
+        return FleetComputer(
+            id=row.id,
+            hostname=row.hostname,
+            ip_address=row.ip_address,
+            os_info=row.os_info,
+            last_seen=row.last_seen,
+            stale=row.last_seen is None or row.last_seen < stale_before,
+            snapshot_id=row.latest_id,
+            snapshot_timestamp=row.latest_timestamp,
+            cpu_usage=row.latest_cpu_usage,
+            memory_total=row.latest_memory_total,
+            memory_used=row.latest_memory_used,
+            memory_percent=metrics.get("memory_percent"),
+            disk_percent_max=max(disk_percents) if disk_percents else None
+        )
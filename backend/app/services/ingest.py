@@ -0,0 +1,156 @@
+import asyncio
+from collections import deque
+from typing import Deque, List, Optional
+import logging
+
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from ..core.config import settings
+from ..core.metrics import INGEST_DROPPED, INGEST_QUEUE_DEPTH
+from ..db.base import AsyncSessionLocal
+from ..schemas.system_info import SystemInfoBatchItem
+from .system_info import SystemInfoService
+
+logger = logging.getLogger(__name__)
+
+# Классы SQLSTATE, после которых та же пачка может записаться: соединение,
+# конфликт транзакций, нехватка ресурсов, остановка сервера
+TRANSIENT_SQLSTATE_CLASSES = ("08", "40", "53", "57")
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether writing the same rows again may succeed (lost connection, lock, full pool)."""
+    if isinstance(error, (OperationalError, InterfaceError, PoolTimeoutError, OSError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, DBAPIError):
+        if error.connection_invalidated:
+            return True
+        sqlstate = getattr(error.orig, "pgcode", None) or ""
+        return sqlstate[:2] in TRANSIENT_SQLSTATE_CLASSES
+    return False
+
+
+class IngestQueue:
+    """
+    Write-behind buffer for single-sample ingest.
+
+    Accepted samples wait in a bounded in-memory queue; a background flusher
+    writes them with ``create_system_info_batch`` once ``batch_size`` samples
+    are waiting or ``flush_interval`` seconds after the first one arrived. That
+    is one INSERT and one ``last_seen`` UPDATE per flush instead of a commit per
+    request. A transient failure (connection, lock) is retried with the same
+    batch, and the queue filling up in the meantime is what pushes back on
+    agents. A batch the database refuses for its data (constraint violation,
+    invalid JSON) is split in halves until the offending samples are isolated;
+    those are dropped and counted, the rest is written.
+    """
+
+    def __init__(self, max_size: int, batch_size: int, flush_interval: float):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._items: Deque[SystemInfoBatchItem] = deque()
+        self._closed = False
+        self._task: Optional[asyncio.Task] = None
+        self._has_items: Optional[asyncio.Event] = None
+        self._batch_ready: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._closed
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def submit(self, item: SystemInfoBatchItem) -> bool:
+        """Queue a validated sample; False when the queue is full or closed."""
+        if self._closed or len(self._items) >= self.max_size:
+            return False
+        self._items.append(item)
+        self._has_items.set()
+        if len(self._items) >= self.batch_size:
+            self._batch_ready.set()
+        return True
+
+    def start(self):
+        self._closed = False
+        self._has_items = asyncio.Event()
+        self._batch_ready = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop accepting samples and wait until everything queued is written."""
+        if self._task is None:
+            return
+        self._closed = True
+        self._has_items.set()
+        self._batch_ready.set()
+        await self._task
+        self._task = None
+
+    def _take_batch(self) -> List[SystemInfoBatchItem]:
+        batch = []
+        while self._items and len(batch) < self.batch_size:
+            batch.append(self._items.popleft())
+        if not self._items:
+            self._has_items.clear()
+        if len(self._items) < self.batch_size:
+            self._batch_ready.clear()
+        return batch
+
+    async def _run(self):
+        while True:
+            if not self._items:
+                if self._closed:
+                    return
+                await self._has_items.wait()
+                continue
+            if not self._closed:
+                try:
+                    # Ждем полную пачку, но не дольше flush_interval после первого замера
+                    await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            await self._write(self._take_batch())
+
+    async def _write(self, batch: List[SystemInfoBatchItem]):
+        failures = 0
+        while batch:
+            try:
+                async with AsyncSessionLocal() as db:
+                    result = await SystemInfoService(db).create_system_info_batch(batch)
+                if result.rejected:
+                    logger.warning(f"Dropped {result.rejected} queued samples of unknown computers")
+                return
+            except Exception as e:
+                if not is_transient(e):
+                    await self._split(batch, e)
+                    return
+                failures += 1
+                if self._closed and failures >= settings.INGEST_SHUTDOWN_RETRIES:
+                    logger.error(f"Lost {len(batch) + len(self._items)} queued samples on shutdown: {e}")
+                    self._items.clear()
+                    return
+                delay = min(settings.INGEST_RETRY_MAX_SECONDS, 0.1 * 2 ** failures)
+                logger.error(f"Failed to write {len(batch)} queued samples, retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+
+    async def _split(self, batch: List[SystemInfoBatchItem], error: Exception):
+        if len(batch) == 1:
+            # Повтор не поможет: замер отбрасывается, иначе он навсегда застрянет в голове очереди
+            INGEST_DROPPED.inc()
+            logger.error(f"Dropped a queued sample of computer {batch[0].computer_id}, "
+                         f"the database refused it: {error}")
+            return
+        middle = len(batch) // 2
+        await self._write(batch[:middle])
+        await self._write(batch[middle:])
+
+
+ingest_queue = IngestQueue(
+    max_size=settings.INGEST_QUEUE_MAX_SIZE,
+    batch_size=settings.INGEST_BATCH_SIZE,
+    flush_interval=settings.INGEST_FLUSH_INTERVAL_MS / 1000
+)
+INGEST_QUEUE_DEPTH.set_function(lambda: len(ingest_queue))
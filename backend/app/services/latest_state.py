@@ -0,0 +1,120 @@
+from datetime import datetime
+from itertools import count
+from typing import Dict, Optional
+import logging
+import threading
+
+from ..core.cache import InvalidationBus, LRUCache, invalidation_bus
+from ..core.config import settings
+from ..schemas.system_info import Computer as ComputerSchema
+from ..schemas.system_info import SystemInfo as SystemInfoSchema
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "latest_state"
+
+
+def snapshot_etag(snapshot: SystemInfoSchema) -> str:
+    # Сохраненный замер не меняется, поэтому его id достаточно
+    return f'"si-{snapshot.id}"'
+
+
+def details_etag(state: ComputerSchema) -> str:
+    snapshot_id = state.system_info[0].id if state.system_info else 0
+    return f'"c-{state.id}-{snapshot_id}-{state.last_seen.timestamp():.6f}"'
+
+
+class LatestStateCache:
+    """
+    Process-local cache of each computer's details plus its latest snapshot,
+    in the shape returned by ``/computers/{id}/details``.
+
+    Entries are filled on first read and then kept current by the ingest path
+    (``record_snapshot``/``touch``); every change is also published on the
+    invalidation bus so other workers drop their copy.
+
+    Every change also bumps a per-computer version, even when the computer is
+    not cached. A reader takes the ``version`` before loading a state from the
+    database and ``put`` discards the state if ingest changed the computer in
+    the meantime, so a stale read never overwrites what ingest just stored.
+    The timestamp of the newest snapshot seen per computer is kept the same
+    way, so a replayed backlog is recognized as old even when the computer is
+    not cached.
+    """
+
+    def __init__(self, cache: LRUCache, bus: InvalidationBus):
+        self.cache = cache
+        self.bus = bus
+        self._versions: Dict[int, int] = {}
+        self._newest: Dict[int, datetime] = {}
+        self._counter = count(1)
+        self._lock = threading.Lock()
+        bus.subscribe(self._on_message)
+
+    def get(self, computer_id: int) -> Optional[ComputerSchema]:
+        return self.cache.get(computer_id)
+
+    def version(self, computer_id: int) -> int:
+        return self._versions.get(computer_id, 0)
+
+    def put(self, state: ComputerSchema, version: int):
+        """Cache a state loaded from the database after ``version(state.id)`` was taken."""
+        with self._lock:
+            if self._versions.get(state.id, 0) == version:
+                self.cache.put(state.id, state)
+                if state.system_info:
+                    self._seen(state.id, state.system_info[0].timestamp)
+
+    def _seen(self, computer_id: int, timestamp: datetime) -> bool:
+        # Вызывается под self._lock
+        newest = self._newest.get(computer_id)
+        if newest is not None and newest > timestamp:
+            return False
+        self._newest[computer_id] = timestamp
+        return True
+
+    def _changed(self, computer_id: int):
+        with self._lock:
+            self._versions[computer_id] = next(self._counter)
+
+    def record_snapshot(self, snapshot: SystemInfoSchema) -> bool:
+        """
+        Make ``snapshot`` the computer's latest one, unless a newer snapshot is
+        already known.
+
+        :return: whether the snapshot is now the latest
+        """
+        with self._lock:
+            if not self._seen(snapshot.computer_id, snapshot.timestamp):
+                return False
+
+        def apply(state: ComputerSchema) -> ComputerSchema:
+            # Запоздавшие замеры из буфера агента не вытесняют более свежий
+            if state.system_info and state.system_info[0].timestamp > snapshot.timestamp:
+                return state
+            return state.model_copy(update={"system_info": [snapshot]})
+
+        self._changed(snapshot.computer_id)
+        self.cache.update(snapshot.computer_id, apply)
+        self.bus.publish(CHANNEL, snapshot.computer_id)
+        return True
+
+    def touch(self, computer_id: int, last_seen: datetime):
+        self._changed(computer_id)
+        self.cache.update(computer_id, lambda state: state.model_copy(update={"last_seen": last_seen}))
+
+    def invalidate(self, computer_id: int):
+        self._changed(computer_id)
+        self.cache.pop(computer_id)
+        self.bus.publish(CHANNEL, computer_id)
+
+    def _on_message(self, message: Dict):
+        if message["channel"] == CHANNEL and message["origin"] != self.bus.origin:
+            self._changed(message["key"])
+            self.cache.pop(message["key"])
+
+
+latest_state = LatestStateCache(
+    LRUCache(settings.LATEST_CACHE_MAX_ENTRIES, settings.LATEST_CACHE_TTL_SECONDS),
+    invalidation_bus
+)
@@ -0,0 +1,38 @@
+from typing import AsyncIterator
+import logging
+
+from ..core.broker import Broker, Subscription
+from ..core.config import settings
+from ..schemas.system_info import SystemInfo as SystemInfoSchema
+
+logger = logging.getLogger(__name__)
+
+# Новые замеры для потоковых подписчиков; тема - id компьютера
+live_updates = Broker(max_pending=settings.STREAM_MAX_PENDING)
+
+
+def publish_snapshot(snapshot: SystemInfoSchema):
+    if len(live_updates):
+        # Сериализуем один раз на всех подписчиков
+        live_updates.publish(snapshot.computer_id, (snapshot.id, snapshot.model_dump_json()))
+
+
+async def sse_events(subscription: Subscription) -> AsyncIterator[str]:
+    """
+    Server-Sent Events stream of a subscription. Comment lines are sent while
+    idle so proxies keep the connection open; the subscription is released
+    when the client disconnects and the response task is cancelled.
+    """
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            messages = await subscription.get(timeout=settings.STREAM_KEEPALIVE_SECONDS)
+            if not messages:
+                yield ": keepalive\n\n"
+                continue
+            yield "".join(
+                f"event: system_info\nid: {snapshot_id}\ndata: {data}\n\n"
+                for snapshot_id, data in messages
+            )
+    finally:
+        live_updates.unsubscribe(subscription)
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+
+from starlette.concurrency import run_in_threadpool
+
+from ..core.config import settings
+from ..db.base import SessionLocal, engine
+from ..db.locks import MAINTENANCE_LOCK, ROLLUP_LOCK, advisory_lock
+from ..db.partitioning import maintain_system_info
+from .rollup import RollupService
+
+logger = logging.getLogger(__name__)
+
+
+def run_maintenance():
+    # Цикл запущен в каждом worker; обслуживание выполняет один из них
+    with advisory_lock(engine, MAINTENANCE_LOCK) as acquired:
+        if not acquired:
+            logger.debug("Storage maintenance is running in another process, skipping")
+            return None
+        return _run_maintenance()
+
+
+def _run_maintenance():
+    summary = maintain_system_info(engine)
+    if summary["created"]:
+        logger.info(f"Created partitions: {', '.join(summary['created'])}")
+    if summary["dropped"]:
+        logger.info(f"Dropped expired partitions: {', '.join(summary['dropped'])}")
+    if summary["deleted_rows"]:
+        logger.info(f"Deleted {summary['deleted_rows']} expired system info rows")
+
+    db = SessionLocal()
+    try:
+        summary["deleted_rollups"] = RollupService(db).delete_expired()
+    finally:
+        db.close()
+    return summary
+
+
+def run_rollups() -> int:
+    """
+    Bring rollups up to date, in chunks of ROLLUP_MAX_ROWS_PER_RUN rows.
+    Skipped (returns 0) while another process is updating them.
+    """
+    with advisory_lock(engine, ROLLUP_LOCK) as acquired:
+        if not acquired:
+            return 0
+        return _run_rollups()
+
+
+def _run_rollups() -> int:
+    db = SessionLocal()
+    try:
+        service = RollupService(db)
+        total = 0
+        while True:
+            processed = service.update_rollups()
+            total += processed
+            if processed < settings.ROLLUP_MAX_ROWS_PER_RUN:
+                return total
+    finally:
+        db.close()
+
+
+async def maintenance_loop():
+    """Run storage maintenance at startup and then every MAINTENANCE_INTERVAL_SECONDS."""
+    while True:
+        try:
+            await run_in_threadpool(run_maintenance)
+        except Exception as e:
+            logger.error(f"Storage maintenance failed: {e}")
+        await asyncio.sleep(settings.MAINTENANCE_INTERVAL_SECONDS)
+
+
+async def rollup_loop():
+    while True:
+        try:
+            await run_in_threadpool(run_rollups)
+        except Exception as e:
+            logger.error(f"Rollup update failed: {e}")
+        await asyncio.sleep(settings.ROLLUP_INTERVAL_SECONDS)
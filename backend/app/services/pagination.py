@@ -0,0 +1,43 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from typing import Tuple
+
+# Курсор непрозрачен для клиента: это base64 от позиции последней строки страницы
+
+
+class InvalidCursor(ValueError):
+    """The page cursor could not be decoded."""
+
+
+def _encode(value: str) -> str:
+    return urlsafe_b64encode(value.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode(cursor: str) -> str:
+    try:
+        return urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def encode_id_cursor(row_id: int) -> str:
+    return _encode(str(row_id))
+
+
+def decode_id_cursor(cursor: str) -> int:
+    try:
+        return int(_decode(cursor))
+    except ValueError as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def encode_timestamp_cursor(timestamp: datetime, row_id: int) -> str:
+    return _encode(f"{timestamp.isoformat()}|{row_id}")
+
+
+def decode_timestamp_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        timestamp, row_id = _decode(cursor).split("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except ValueError as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
@@ -0,0 +1,298 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from math import ceil
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import logging
+
+from sqlalchemy import and_, delete, insert, or_, select
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.rollup import RollupState, SystemInfoRollup
+from ..models.system_info import SystemInfo
+from .sample_metrics import row_metrics, row_peaks
+
+logger = logging.getLogger(__name__)
+
+# Разрешения от мелкого к крупному; каждое строится из предыдущего
+RESOLUTIONS = {
+    "1m": timedelta(minutes=1),
+    "1h": timedelta(hours=1),
+    "1d": timedelta(days=1),
+}
+RAW = "raw"
+
+STATE_KEY = "last_system_info_id"
+# Строки параллельных транзакций могут стать видимыми позже строк с большим id,
+# поэтому хвост уже обработанных id просматривается повторно
+RESCAN_IDS = 1000
+# Ограничение на число интервалов в одном запросе
+QUERY_CHUNK = 200
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def bucket_start(timestamp: datetime, step: timedelta) -> datetime:
+    seconds = int((timestamp - EPOCH).total_seconds())
+    step_seconds = int(step.total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % step_seconds)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(ceil(q * len(sorted_values)) - 1, 0)
+    return sorted_values[index]
+
+
+def summarize(values: List[float]) -> Dict:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "min": values[0],
+        "max": values[-1],
+        "avg": sum(values) / len(values),
+        "p95": percentile(values, 0.95),
+    }
+
+
+def merge(children: List[Dict]) -> Dict:
+    """
+    Combine finer buckets into a coarser one. count/min/max/avg are exact;
+    p95 is approximated by the count-weighted 95th percentile of the children's
+    p95 values.
+    """
+    count = sum(child["count"] for child in children)
+    weighted = sorted((child["p95"], child["count"]) for child in children)
+    threshold = 0.95 * count
+    cumulative = 0
+    p95 = weighted[-1][0]
+    for value, weight in weighted:
+        cumulative += weight
+        if cumulative >= threshold:
+            p95 = value
+            break
+    return {
+        "count": count,
+        "min": min(child["min"] for child in children),
+        "max": max(child["max"] for child in children),
+        "avg": sum(child["avg"] * child["count"] for child in children) / count,
+        "p95": p95,
+    }
+
+
+def _ranges(buckets: Iterable[datetime], step: timedelta) -> List[Tuple[datetime, datetime]]:
+    """Collapse bucket starts into contiguous [start, end) ranges."""
+    ranges = []
+    for bucket in sorted(buckets):
+        if ranges and ranges[-1][1] == bucket:
+            ranges[-1][1] = bucket + step
+        else:
+            ranges.append([bucket, bucket + step])
+    return [tuple(r) for r in ranges]
+
+
+def _chunks(items: List, size: int = QUERY_CHUNK):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class RollupService:
+    """
+    Maintains 1m/1h/1d aggregates (min/max/avg/p95) of every metric from
+    sample_metrics incrementally.
+
+    Each run picks up system_info rows inserted since the last run (tracked by
+    id, so late replayed samples are caught too), recomputes the 1m buckets
+    they touch from raw rows, then the affected 1h buckets from 1m rollups and
+    the affected 1d buckets from 1h rollups.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _get_state(self) -> int:
+        state = self.db.get(RollupState, STATE_KEY)
+        return state.value if state else 0
+
+    def _set_state(self, value: int):
+        state = self.db.get(RollupState, STATE_KEY)
+        if state is None:
+            self.db.add(RollupState(name=STATE_KEY, value=value))
+        else:
+            state.value = value
+
+    def update_rollups(self, max_rows: Optional[int] = None) -> int:
+        """
+        Process up to ``max_rows`` new system_info rows.
+
+        :return: number of new rows processed (0 when rollups are up to date)
+        """
+        max_rows = max_rows or settings.ROLLUP_MAX_ROWS_PER_RUN
+        last_id = self._get_state()
+        new_rows = self.db.execute(
+            select(SystemInfo.id, SystemInfo.computer_id, SystemInfo.timestamp)
+            .where(SystemInfo.id > max(last_id - RESCAN_IDS, 0))
+            .order_by(SystemInfo.id)
+            .limit(max_rows + RESCAN_IDS)
+        ).all()
+        processed = sum(1 for row in new_rows if row.id > last_id)
+        if not processed:
+            return 0
+
+        dirty = defaultdict(set)
+        for row in new_rows:
+            dirty[row.computer_id].add(bucket_start(row.timestamp, RESOLUTIONS["1m"]))
+
+        try:
+            for computer_id, minutes in dirty.items():
+                self._rebuild_computer(computer_id, minutes)
+            self._set_state(new_rows[-1].id)
+            self.db.commit()
+        except Exception as e:
+            logger.error(f"Error updating rollups: {e}")
+            self.db.rollback()
+            raise
+        return processed
+
+    def _rebuild_computer(self, computer_id: int, minutes: Set[datetime]):
+        stats = self._rollup_raw(computer_id, minutes)
+        self._replace(computer_id, "1m", minutes, stats)
+
+        hours = {bucket_start(minute, RESOLUTIONS["1h"]) for minute in minutes}
+        stats = self._rollup_children(computer_id, "1m", "1h", hours)
+        self._replace(computer_id, "1h", hours, stats)
+
+        days = {bucket_start(hour, RESOLUTIONS["1d"]) for hour in hours}
+        stats = self._rollup_children(computer_id, "1h", "1d", days)
+        self._replace(computer_id, "1d", days, stats)
+
+    def _rollup_raw(self, computer_id: int, minutes: Set[datetime]) -> Dict[Tuple[datetime, str], Dict]:
+        step = RESOLUTIONS["1m"]
+        values = defaultdict(list)
+        peaks = defaultdict(list)
+        for ranges in _chunks(_ranges(minutes, step)):
+            rows = self.db.execute(
+                select(SystemInfo.timestamp, SystemInfo.cpu_usage, SystemInfo.memory_total,
+                       SystemInfo.memory_used, SystemInfo.disk_usage, SystemInfo.network_stats,
+                       SystemInfo.cpu_summary, SystemInfo.memory_summary, SystemInfo.network_summary)
+                .where(SystemInfo.computer_id == computer_id)
+                .where(or_(*(and_(SystemInfo.timestamp >= start, SystemInfo.timestamp < end)
+                             for start, end in ranges)))
+            ).all()
+            for row in rows:
+                bucket = bucket_start(row.timestamp, step)
+                for metric, value in row_metrics(row).items():
+                    values[(bucket, metric)].append(value)
+                for metric, peak in row_peaks(row).items():
+                    peaks[(bucket, metric)].append(peak)
+
+        stats = {key: summarize(metric_values) for key, metric_values in values.items()}
+        # Сводки агента расширяют min/max всплесками между замерами; avg и p95
+        # по-прежнему считаются по самим замерам
+        for key, metric_peaks in peaks.items():
+            if key in stats:
+                stats[key]["min"] = min(stats[key]["min"], *(low for low, _ in metric_peaks))
+                stats[key]["max"] = max(stats[key]["max"], *(high for _, high in metric_peaks))
+        return stats
+
+    def _rollup_children(self, computer_id: int, child_resolution: str, resolution: str,
+                         buckets: Set[datetime]) -> Dict[Tuple[datetime, str], Dict]:
+        step = RESOLUTIONS[resolution]
+        children = defaultdict(list)
+        for ranges in _chunks(_ranges(buckets, step)):
+            rows = self.db.scalars(
+                select(SystemInfoRollup)
+                .where(SystemInfoRollup.computer_id == computer_id)
+                .where(SystemInfoRollup.resolution == child_resolution)
+                .where(or_(*(and_(SystemInfoRollup.bucket >= start, SystemInfoRollup.bucket < end)
+                             for start, end in ranges)))
+            ).all()
+            for row in rows:
+                children[(bucket_start(row.bucket, step), row.metric)].append({
+                    "count": row.count, "min": row.min, "max": row.max, "avg": row.avg, "p95": row.p95
+                })
+        return {key: merge(child_stats) for key, child_stats in children.items()}
+
+    def _replace(self, computer_id: int, resolution: str, buckets: Set[datetime],
+                 stats: Dict[Tuple[datetime, str], Dict]):
+        for bucket_chunk in _chunks(sorted(buckets)):
+            self.db.execute(
+                delete(SystemInfoRollup)
+                .where(SystemInfoRollup.computer_id == computer_id)
+                .where(SystemInfoRollup.resolution == resolution)
+                .where(SystemInfoRollup.bucket.in_(bucket_chunk))
+            )
+        rows = [
+            dict(computer_id=computer_id, resolution=resolution, bucket=bucket, metric=metric, **values)
+            for (bucket, metric), values in stats.items()
+        ]
+        if rows:
+            self.db.execute(insert(SystemInfoRollup), rows)
+
+    def delete_expired(self, now: Optional[datetime] = None) -> int:
+        now = now or datetime.utcnow()
+        retention = {
+            "1m": settings.ROLLUP_1M_RETENTION_DAYS,
+            "1h": settings.ROLLUP_1H_RETENTION_DAYS,
+            "1d": settings.ROLLUP_1D_RETENTION_DAYS,
+        }
+        deleted = 0
+        for resolution, days in retention.items():
+            if days <= 0:
+                continue
+            result = self.db.execute(
+                delete(SystemInfoRollup)
+                .where(SystemInfoRollup.resolution == resolution)
+                .where(SystemInfoRollup.bucket < now - timedelta(days=days))
+            )
+            deleted += result.rowcount
+        self.db.commit()
+        return deleted
+
+    # --- чтение ---------------------------------------------------------------
+
+    @staticmethod
+    def choose_resolution(since: datetime, until: datetime, points: int) -> str:
+        """
+        Pick the finest rollup whose bucket count over the range fits in
+        ``points``, so long ranges read pre-aggregated rows. Falls back to the
+        coarsest rollup when even that does not fit.
+        """
+        span = (until - since).total_seconds()
+        for resolution, step in RESOLUTIONS.items():
+            if span / step.total_seconds() <= points:
+                return resolution
+        return list(RESOLUTIONS)[-1]
+
+    def get_series(self, computer_id: int, metric: str, since: datetime, until: datetime,
+                   resolution: str) -> List[Dict]:
+        if resolution == RAW:
+            rows = self.db.execute(
+                select(SystemInfo.timestamp, SystemInfo.cpu_usage, SystemInfo.memory_total,
+                       SystemInfo.memory_used, SystemInfo.disk_usage, SystemInfo.network_stats)
+                .where(SystemInfo.computer_id == computer_id)
+                .where(SystemInfo.timestamp >= since, SystemInfo.timestamp < until)
+                .order_by(SystemInfo.timestamp)
+            ).all()
+            points = []
+            for row in rows:
+                value = row_metrics(row).get(metric)
+                if value is not None:
+                    points.append({"timestamp": row.timestamp, "count": 1,
+                                   "min": value, "max": value, "avg": value, "p95": value})
+            return points
+
+        rows = self.db.scalars(
+            select(SystemInfoRollup)
+            .where(SystemInfoRollup.computer_id == computer_id)
+            .where(SystemInfoRollup.resolution == resolution)
+            .where(SystemInfoRollup.metric == metric)
+            .where(SystemInfoRollup.bucket >= bucket_start(since, RESOLUTIONS[resolution]))
+            .where(SystemInfoRollup.bucket < until)
+            .order_by(SystemInfoRollup.bucket)
+        ).all()
+        return [
+            {"timestamp": row.bucket, "count": row.count,
+             "min": row.min, "max": row.max, "avg": row.avg, "p95": row.p95}
+            for row in rows
+        ]
@@ -0,0 +1,74 @@
+from typing import Dict, Optional, Tuple
+
+# Скорости, которые агент считает сам (см. network_stats)
+NETWORK_RATE_KEYS = (
+    "bytes_sent_per_sec",
+    "bytes_recv_per_sec",
+    "packets_sent_per_sec",
+    "packets_recv_per_sec",
+)
+
+DISK_PERCENT_PREFIX = "disk_percent:"
+NETWORK_PREFIX = "net."
+
+
+def disk_metric(mountpoint: str) -> str:
+    return f"{DISK_PERCENT_PREFIX}{mountpoint}"
+
+
+def extract_metrics(cpu_usage: Optional[float], memory_total: Optional[float],
+                    memory_used: Optional[float], disk_usage: Optional[Dict],
+                    network_stats: Optional[Dict]) -> Dict[str, float]:
+    """
+    Flatten one snapshot into named numeric metrics:
+
+    - ``cpu_usage``, ``memory_used``, ``memory_percent``
+    - ``disk_percent:<mountpoint>`` for every mount
+    - ``net.<rate>`` for the network rates reported by the agent
+    """
+    metrics = {}
+    if cpu_usage is not None:
+        metrics["cpu_usage"] = float(cpu_usage)
+    if memory_used is not None:
+        metrics["memory_used"] = float(memory_used)
+        if memory_total:
+            metrics["memory_percent"] = float(memory_used) / float(memory_total) * 100
+
+    for mountpoint, usage in (disk_usage or {}).items():
+        percent = usage.get("percent") if isinstance(usage, dict) else None
+        if percent is not None:
+            metrics[disk_metric(mountpoint)] = float(percent)
+
+    for key in NETWORK_RATE_KEYS:
+        value = (network_stats or {}).get(key)
+        if value is not None:
+            metrics[f"{NETWORK_PREFIX}{key}"] = float(value)
+    return metrics
+
+
+def row_metrics(row) -> Dict[str, float]:
+    return extract_metrics(row.cpu_usage, row.memory_total, row.memory_used, row.disk_usage, row.network_stats)
+
+
+def extract_peaks(memory_total: Optional[float], cpu_summary: Optional[Dict],
+                  memory_summary: Optional[Dict], network_summary: Optional[Dict]) -> Dict[str, Tuple[float, float]]:
+    """
+    (min, max) of the agent's high-rate readings between two samples, from
+    the interval summaries, under the metric names of ``extract_metrics``.
+    """
+    peaks = {}
+    if cpu_summary:
+        peaks["cpu_usage"] = (cpu_summary["min"], cpu_summary["max"])
+    if memory_summary:
+        peaks["memory_used"] = (memory_summary["min"], memory_summary["max"])
+        if memory_total:
+            peaks["memory_percent"] = (memory_summary["min"] / memory_total * 100,
+                                       memory_summary["max"] / memory_total * 100)
+    for key, summary in (network_summary or {}).items():
+        if key in NETWORK_RATE_KEYS:
+            peaks[f"{NETWORK_PREFIX}{key}"] = (summary["min"], summary["max"])
+    return peaks
+
+
+def row_peaks(row) -> Dict[str, Tuple[float, float]]:
+    return extract_peaks(row.memory_total, row.cpu_summary, row.memory_summary, row.network_summary)
@@ -0,0 +1,159 @@
+from typing import NamedTuple, Optional, Sequence
+
+import numpy as np
+
+ZSCORE = "zscore"
+MAD = "mad"
+ANOMALY_METHODS = (ZSCORE, MAD)
+DEFAULT_THRESHOLDS = {ZSCORE: 3.0, MAD: 3.5}
+
+# Модифицированная z-оценка: MAD нормального распределения равна 0.6745 sigma
+MAD_SCALE = 0.6745
+# Если MAD равна нулю, берется среднее абсолютное отклонение (sigma * 0.7979)
+MEAN_AD_SCALE = 0.7979
+# Матрица для сортировки по группам не больше стольких размеров данных
+PADDED_SORT_FACTOR = 4
+
+
+class SeriesAnalytics(NamedTuple):
+    """Per-computer results, one array element per computer."""
+    computer_ids: np.ndarray
+    counts: np.ndarray
+    first_times: np.ndarray
+    last_times: np.ndarray
+    last: np.ndarray
+    mean: np.ndarray
+    std: np.ndarray
+    min: np.ndarray
+    max: np.ndarray
+    percentiles: np.ndarray  # (len(q), computers)
+    ewma: np.ndarray
+    moving_average: np.ndarray
+    anomaly_score: np.ndarray
+    anomaly_max_score: np.ndarray
+    anomalies: np.ndarray
+    last_anomaly_times: np.ndarray  # NaN, если выбросов не было
+    all_values: np.ndarray
+
+
+def counter_rates(ids: np.ndarray, times: np.ndarray, values: np.ndarray):
+    """
+    Per-second rates between consecutive samples of the same computer. A
+    negative difference means the counter was reset (reboot), so that
+    interval is dropped, as are intervals between different computers.
+    """
+    dt = np.diff(times)
+    dv = np.diff(values)
+    valid = (ids[1:] == ids[:-1]) & (dt > 0) & (dv >= 0)
+    return ids[1:][valid], times[1:][valid], dv[valid] / dt[valid]
+
+
+def _group_bounds(ids: np.ndarray):
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    counts = np.diff(np.r_[starts, len(ids)])
+    return starts, counts
+
+
+def _sorted_within_groups(values: np.ndarray, group_index: np.ndarray, starts: np.ndarray,
+                          counts: np.ndarray) -> np.ndarray:
+    """Values sorted inside each (contiguous) group, groups staying in place."""
+    width = counts.max()
+    if len(counts) * width > PADDED_SORT_FACTOR * len(values):
+        return values[np.lexsort((values, group_index))]
+    # Построчная сортировка матрицы (группа x точка) на порядок быстрее lexsort;
+    # хвосты коротких групп заполнены +inf и уходят в конец строки
+    position = np.arange(len(values)) - starts[group_index]
+    padded = np.full((len(counts), width), np.inf)
+    padded[group_index, position] = values
+    padded.sort(axis=1)
+    return padded[group_index, position]
+
+
+def _grouped_quantiles(sorted_values: np.ndarray, starts: np.ndarray, counts: np.ndarray,
+                       q: np.ndarray) -> np.ndarray:
+    """Linear-interpolated quantiles (as np.percentile) of every group, shape (len(q), groups)."""
+    position = np.outer(q, counts - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, counts - 1)
+    lower_values = sorted_values[starts + lower]
+    upper_values = sorted_values[starts + upper]
+    return lower_values + (upper_values - lower_values) * (position - lower)
+
+
+def analyze_series(ids: np.ndarray, times: np.ndarray, values: np.ndarray,
+                   percentiles: Sequence[float] = (50, 95, 99), span: int = 10,
+                   method: str = ZSCORE, threshold: Optional[float] = None) -> Optional[SeriesAnalytics]:
+    """
+    Statistics of many computers' series at once, without a Python loop over
+    computers or points.
+
+    ``ids``/``times``/``values`` are flat arrays sorted by (computer, time);
+    NaN values are ignored. The EWMA (``alpha = 2 / (span + 1)``) and the
+    moving average are those of the latest point, over the whole window and
+    the last ``span`` points respectively. Every point gets a z-score or a
+    modified z-score (MAD) against its computer's window; points above
+    ``threshold`` are anomalies.
+
+    :return: None if there are no values
+    """
+    threshold = DEFAULT_THRESHOLDS[method] if threshold is None else threshold
+    finite = np.isfinite(values)
+    if not finite.all():
+        ids, times, values = ids[finite], times[finite], values[finite]
+    if not len(values):
+        return None
+
+    starts, counts = _group_bounds(ids)
+    ends = starts + counts - 1
+    group_index = np.repeat(np.arange(len(starts)), counts)
+
+    mean = np.add.reduceat(values, starts) / counts
+    deviation = values - mean[group_index]
+    std = np.sqrt(np.add.reduceat(deviation * deviation, starts) / counts)
+
+    q = np.asarray(percentiles, dtype=np.float64) / 100
+    sorted_values = _sorted_within_groups(values, group_index, starts, counts)
+    quantiles = _grouped_quantiles(sorted_values, starts, counts, np.r_[q, 0.5])
+
+    # Вес точки в EWMA убывает с удалением от последней точки своей группы
+    from_end = ends[group_index] - np.arange(len(values))
+    alpha = 2 / (span + 1)
+    weights = np.exp(from_end * np.log1p(-alpha)) if alpha < 1 else (from_end == 0).astype(np.float64)
+    ewma = np.add.reduceat(weights * values, starts) / np.add.reduceat(weights, starts)
+    recent = from_end < span
+    moving_average = np.add.reduceat(np.where(recent, values, 0.0), starts) / np.minimum(counts, span)
+
+    if method == MAD:
+        median = quantiles[-1]
+        absolute = np.abs(values - median[group_index])
+        sorted_absolute = _sorted_within_groups(absolute, group_index, starts, counts)
+        mad = _grouped_quantiles(sorted_absolute, starts, counts, np.array([0.5]))[0]
+        scale = np.where(mad > 0, mad / MAD_SCALE, np.add.reduceat(absolute, starts) / counts / MEAN_AD_SCALE)
+        centered = values - median[group_index]
+    else:
+        scale = std
+        centered = deviation
+    group_scale = scale[group_index]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = np.where(group_scale > 0, centered / group_scale, 0.0)
+    flagged = np.abs(scores) > threshold
+
+    return SeriesAnalytics(
+        computer_ids=ids[starts],
+        counts=counts,
+        first_times=times[starts],
+        last_times=times[ends],
+        last=values[ends],
+        mean=mean,
+        std=std,
+        min=np.minimum.reduceat(values, starts),
+        max=np.maximum.reduceat(values, starts),
+        percentiles=quantiles[:-1],
+        ewma=ewma,
+        moving_average=moving_average,
+        anomaly_score=scores[ends],
+        anomaly_max_score=np.maximum.reduceat(np.abs(scores), starts),
+        anomalies=np.add.reduceat(flagged.astype(np.int64), starts),
+        last_anomaly_times=np.fmax.reduceat(np.where(flagged, times, np.nan), starts),
+        all_values=values
+    )
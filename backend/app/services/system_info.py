@@ -1,144 +1,385 @@
-from datetime import datetime
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import Row, and_, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional, Sequence, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+from ..core.config import settings
+from ..core.metrics import ROWS_INGESTED
+from ..db.base import AsyncSessionLocal
+from ..db.upsert import dialect_insert
 from ..models.system_info import Computer, SystemInfo
-from ..schemas.system_info import ComputerCreate, SystemInfoCreate
+from ..schemas.system_info import (
+    ComputerCreate,
+    MetricSummary,
+    SystemInfoBatchItem,
+    SystemInfoBatchItemResult,
+    SystemInfoBatchResult,
+    SystemInfoCreate,
+    SystemInfoFrame,
+)
+from ..schemas.system_info import Computer as ComputerSchema
+from ..schemas.system_info import SystemInfo as SystemInfoSchema
+from .alerts import AlertService, alert_engine
+from .latest_state import latest_state
+from .live import publish_snapshot
+from .pagination import (
+    decode_id_cursor,
+    decode_timestamp_cursor,
+    encode_id_cursor,
+    encode_timestamp_cursor,
+)
+from .sample_metrics import extract_metrics
+
+class FrameBaseNotFound(Exception):
+    """The snapshot a delta frame refers to does not exist for this computer."""
+
+def utc_naive(timestamp: Optional[datetime]) -> Optional[datetime]:
+    """Время в UTC без tzinfo (так хранятся все колонки DateTime)."""
+    if timestamp is not None and timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def sample_timestamp(system_info: SystemInfoCreate) -> datetime:
+    now = datetime.utcnow()
+    timestamp = utc_naive(system_info.timestamp)
+    if timestamp is None:
+        return now
+    if timestamp > now + timedelta(seconds=settings.SYSTEM_INFO_MAX_CLOCK_SKEW_SECONDS):
+        # Часы агента спешат: такой замер лег бы в секцию DEFAULT и выпал бы из выборок по времени
+        logger.warning(f"Sample timestamp {timestamp} is ahead of server time {now}, using server time")
+        return now
+    return timestamp
+
+def _columns(model, fields: Optional[Sequence[str]]) -> List:
+    if fields is None:
+        return list(model.__table__.columns)
+    return [getattr(model, name) for name in fields]
+
+
+def _summary(summary: Optional[MetricSummary]) -> Optional[Dict]:
+    return summary.model_dump() if summary is not None else None
+
+
+def system_info_row(computer_id: int, system_info: SystemInfoCreate) -> Dict:
+    return {
+        'computer_id': computer_id,
+        'timestamp': sample_timestamp(system_info),
+        'cpu_usage': system_info.cpu_usage,
+        'memory_total': system_info.memory_total,
+        'memory_used': system_info.memory_used,
+        'disk_usage': system_info.disk_usage,
+        'running_processes': system_info.running_processes,
+        'network_stats': system_info.network_stats,
+        'cpu_summary': _summary(system_info.cpu_summary),
+        'memory_summary': _summary(system_info.memory_summary),
+        'network_summary': None if system_info.network_summary is None else {
+            key: summary.model_dump() for key, summary in system_info.network_summary.items()
+        },
+    }
 
 class SystemInfoService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def get_computer(self, computer_id: int) -> Optional[Computer]:
-        return self.db.query(Computer).filter(Computer.id == computer_id).first()
+    async def get_computer(self, computer_id: int) -> Optional[Computer]:
+        return await self.db.get(Computer, computer_id)
+
+    async def computer_exists(self, computer_id: int) -> bool:
+        # Кэш последнего состояния избавляет от запроса к базе на каждый замер
+        if latest_state.get(computer_id) is not None:
+            return True
+        return await self.get_computer(computer_id) is not None
+
+    async def get_computer_by_hostname(self, hostname: str) -> Optional[Computer]:
+        return await self.db.scalar(select(Computer).where(Computer.hostname == hostname))
+
+    async def get_computers_page(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        skip: int = 0,
+        fields: Optional[Sequence[str]] = None
+    ) -> Tuple[List[Row], Optional[str]]:
+        """
+        Keyset-paginated computer list ordered by id.
+
+        ``since``/``until`` filter on ``last_seen``. ``skip`` is the deprecated
+        offset pagination and is ignored when a cursor is given.
+
+        :param fields: columns to select (must include ``id``), default all
+        :return: rows of the page and the cursor of the next page, or None
+        """
+        query = select(*_columns(Computer, fields))
+        if since is not None:
+            query = query.where(Computer.last_seen >= since)
+        if until is not None:
+            query = query.where(Computer.last_seen < until)
+        if cursor is not None:
+            query = query.where(Computer.id > decode_id_cursor(cursor))
+        query = query.order_by(Computer.id)
+        if cursor is None and skip:
+            query = query.offset(skip)
+
+        # Лишняя строка показывает, есть ли следующая страница
+        computers = (await self.db.execute(query.limit(limit + 1))).all()
+        if len(computers) <= limit:
+            return computers, None
+        computers = computers[:limit]
+        return computers, encode_id_cursor(computers[-1].id)
+
+    async def create_computer(self, computer: ComputerCreate) -> Computer:
+        """
+        Register a computer, or update the one with the same hostname.
 
-    def get_computer_by_hostname(self, hostname: str) -> Optional[Computer]:
-        return self.db.query(Computer).filter(Computer.hostname == hostname).first()
+        A single ``INSERT ... ON CONFLICT (hostname) DO UPDATE ... RETURNING``
+        statement, so agents registering concurrently under one hostname
+        cannot race into a unique violation.
+        """
+        logger.debug(f"Attempting to create/update computer: {computer}")
 
-    def get_computers(self, skip: int = 0, limit: int = 100) -> List[Computer]:
-        return self.db.query(Computer).offset(skip).limit(limit).all()
+        if not computer.hostname:
+            raise ValueError("Hostname cannot be empty")
 
-    def create_computer(self, computer: ComputerCreate) -> Computer:
-        # Ищем существующий компьютер по hostname
-        logger.info(f"Attempting to create/update computer: {computer}")
-        
+        now = datetime.utcnow()
+        values = {
+            'ip_address': computer.ip_address,
+            'mac_address': computer.mac_address,
+            'os_info': computer.os_info,
+            'last_seen': now,
+        }
+        insert_stmt = dialect_insert(self.db.get_bind().dialect.name)(Computer)
+        stmt = (
+            insert_stmt
+            .values(hostname=computer.hostname, created_at=now, **values)
+            .on_conflict_do_update(index_elements=[Computer.hostname], set_=values)
+            .returning(Computer)
+        )
         try:
-            # Validate input data
-            if not computer.hostname:
-                raise ValueError("Hostname cannot be empty")
-            
-            # Check for existing computer
-            existing_computer = self.get_computer_by_hostname(computer.hostname)
-            
-            # Если компьютер уже существует, обновляем его данные
-            if existing_computer:
-                logger.info(f"Computer {computer.hostname} already exists. Updating.")
-                existing_computer.ip_address = computer.ip_address
-                existing_computer.mac_address = computer.mac_address
-                existing_computer.os_info = computer.os_info
-                existing_computer.last_seen = datetime.utcnow()
-                
-                try:
-                    self.db.commit()
-                    self.db.refresh(existing_computer)
-                except Exception as commit_error:
-                    logger.error(f"Error committing existing computer update: {commit_error}")
-                    self.db.rollback()
-                    raise
-                
-                return existing_computer
-            
-            # Если компьютер новый, создаем его
-            logger.info(f"Creating new computer: {computer.hostname}")
-            
-            # Convert ComputerCreate to dict, ensuring all fields are present
-            computer_dict = {
-                'hostname': computer.hostname,
-                'ip_address': computer.ip_address,
-                'mac_address': computer.mac_address,
-                'os_info': computer.os_info,
-                'last_seen': datetime.utcnow()
-            }
-            
-            db_computer = Computer(**computer_dict)
-            
-            try:
-                self.db.add(db_computer)
-                self.db.commit()
-                self.db.refresh(db_computer)
-            except Exception as create_error:
-                logger.error(f"Error creating new computer: {create_error}")
-                self.db.rollback()
-                raise
-            
-            return db_computer
-        
+            db_computer = await self.db.scalar(stmt, execution_options={"populate_existing": True})
+            await self.db.commit()
         except Exception as e:
-            logger.error(f"Unexpected error in create_computer: {e}")
-            self.db.rollback()
+            logger.error(f"Error registering computer {computer.hostname}: {e}")
+            await self.db.rollback()
             raise
 
-    def update_computer_last_seen(self, computer_id: int) -> Computer:
-        db_computer = self.get_computer(computer_id)
+        # Адрес или ОС могли измениться
+        latest_state.invalidate(db_computer.id)
+        return db_computer
+
+    async def update_computer_last_seen(self, computer_id: int) -> Computer:
+        db_computer = await self.get_computer(computer_id)
         if db_computer:
             db_computer.last_seen = datetime.utcnow()
-            self.db.commit()
-            self.db.refresh(db_computer)
+            await self.db.commit()
+            latest_state.touch(computer_id, db_computer.last_seen)
         return db_computer
 
-    def create_system_info(self, computer_id: int, system_info: SystemInfoCreate) -> SystemInfo:
-        db_system_info = SystemInfo(
-            computer_id=computer_id,
-            cpu_usage=system_info.cpu_usage,
-            memory_total=system_info.memory_total,
-            memory_used=system_info.memory_used,
-            disk_usage=system_info.disk_usage,
-            running_processes=system_info.running_processes,
-            network_stats=system_info.network_stats
-        )
+    async def create_system_info(self, computer_id: int, system_info: SystemInfoCreate) -> SystemInfo:
+        row = system_info_row(computer_id, system_info)
+        db_system_info = SystemInfo(**row)
         self.db.add(db_system_info)
-        self.db.commit()
-        self.db.refresh(db_system_info)
+        await self.db.commit()
+        ROWS_INGESTED.labels("single").inc()
+        self._snapshot_accepted(SystemInfoSchema.model_validate(db_system_info))
+        await self._evaluate_alerts([row])
         return db_system_info
 
-    def get_latest_system_info(self, computer_id: int) -> Optional[SystemInfo]:
-        return (self.db.query(SystemInfo)
-                .filter(SystemInfo.computer_id == computer_id)
-                .order_by(SystemInfo.timestamp.desc())
-                .first())
-
-    def get_system_info_history(
-        self, computer_id: int, skip: int = 0, limit: int = 100
-    ) -> List[SystemInfo]:
-        return (self.db.query(SystemInfo)
-                .filter(SystemInfo.computer_id == computer_id)
-                .order_by(SystemInfo.timestamp.desc())
-                .offset(skip)
-                .limit(limit)
-                .all())
-
-    def get_computer_with_system_info(self, computer_id: int) -> Optional[Computer]:
+    async def create_system_info_from_frame(self, computer_id: int, frame: SystemInfoFrame) -> SystemInfo:
         """
-        Retrieve a computer with its latest system information.
-        
-        :param computer_id: ID of the computer
-        :return: Computer object with latest system info, or None
+        Rebuild a full snapshot from a (possibly delta) frame and store it.
+
+        :raises FrameBaseNotFound: if ``frame.base_id`` is not a snapshot of this computer
         """
-        computer = self.get_computer(computer_id)
-        if computer:
-            # Get the latest system info for this computer
-            latest_system_info = (
-                self.db.query(SystemInfo)
-                .filter(SystemInfo.computer_id == computer_id)
-                .order_by(SystemInfo.timestamp.desc())
-                .first()
+        # Явный null - поле удалено; отсутствующие поля берутся из базового снимка
+        data = frame.model_dump(exclude={'base_id'}, exclude_unset=True)
+        if frame.base_id is not None:
+            base = await self.db.scalar(
+                select(SystemInfo)
+                .where(SystemInfo.id == frame.base_id, SystemInfo.computer_id == computer_id)
             )
-            
-            # If system info exists, add it to the computer's system_info list
-            if latest_system_info:
-                computer.system_info = [latest_system_info]
-        
-        return computer
+            if base is None:
+                raise FrameBaseNotFound(frame.base_id)
+            for field in SystemInfoCreate.model_fields:
+                if field not in data and field != 'timestamp':
+                    data[field] = getattr(base, field)
+        return await self.create_system_info(computer_id, SystemInfoCreate(**data))
+
+    async def create_system_info_batch(self, items: List[SystemInfoBatchItem]) -> SystemInfoBatchResult:
+        """
+        Store many snapshots for many computers in a single transaction.
+
+        Unknown computers are reported per item instead of failing the whole batch.
+        All rows go in with one executemany INSERT, and last_seen is bumped with one
+        UPDATE for every computer present in the batch.
+
+        :param items: snapshots, each tagged with its computer_id
+        :return: per-item status in the order of the request
+        """
+        requested_ids = {item.computer_id for item in items}
+        known_ids = set(
+            (await self.db.scalars(select(Computer.id).where(Computer.id.in_(requested_ids)))).all()
+        )
+
+        results = []
+        rows = []
+        for index, item in enumerate(items):
+            if item.computer_id in known_ids:
+                rows.append(system_info_row(item.computer_id, item))
+                results.append(SystemInfoBatchItemResult(
+                    index=index, computer_id=item.computer_id, status="created"
+                ))
+            else:
+                results.append(SystemInfoBatchItemResult(
+                    index=index, computer_id=item.computer_id,
+                    status="not_found", detail="Computer not found"
+                ))
+
+        if rows:
+            last_seen = datetime.utcnow()
+            try:
+                new_ids = (await self.db.scalars(
+                    insert(SystemInfo).returning(SystemInfo.id, sort_by_parameter_order=True),
+                    rows
+                )).all()
+                await self.db.execute(
+                    update(Computer)
+                    .where(Computer.id.in_(known_ids))
+                    .values(last_seen=last_seen)
+                )
+                await self.db.commit()
+                ROWS_INGESTED.labels("batch").inc(len(rows))
+            except Exception as e:
+                logger.error(f"Error storing system info batch: {e}")
+                await self.db.rollback()
+                raise
+
+            created = (result for result in results if result.status == "created")
+            for result, new_id in zip(created, new_ids):
+                result.id = new_id
+            self._newest_snapshots_accepted(rows, new_ids, last_seen)
+            await self._evaluate_alerts(sorted(rows, key=lambda row: row['timestamp']))
+
+        return SystemInfoBatchResult(
+            accepted=len(rows),
+            rejected=len(items) - len(rows),
+            items=results
+        )
+
+    def _snapshot_accepted(self, snapshot: SystemInfoSchema):
+        # Подписчикам уходят только новые замеры, а не догрузка старых из буфера агента
+        if latest_state.record_snapshot(snapshot):
+            publish_snapshot(snapshot)
+
+    def _newest_snapshots_accepted(self, rows: List[Dict], new_ids: List[int], last_seen: datetime):
+        # Из пачки (обычно это догрузка буфера агента) важен только последний замер
+        newest = {}
+        for row, new_id in zip(rows, new_ids):
+            current = newest.get(row['computer_id'])
+            if current is None or row['timestamp'] >= current[0]['timestamp']:
+                newest[row['computer_id']] = (row, new_id)
+        for computer_id, (row, new_id) in newest.items():
+            latest_state.touch(computer_id, last_seen)
+            self._snapshot_accepted(SystemInfoSchema(id=new_id, **row))
+
+    async def _evaluate_alerts(self, rows: List[Dict]):
+        if alert_engine.idle:
+            return
+        samples = [
+            (row['computer_id'], row['timestamp'], extract_metrics(
+                row['cpu_usage'], row['memory_total'], row['memory_used'], row['disk_usage'], row['network_stats']
+            ))
+            for row in rows
+        ]
+        # Отдельная сессия: сбой оповещений не должен затрагивать сохраненные замеры
+        try:
+            async with AsyncSessionLocal() as db:
+                await AlertService(db).evaluate(samples)
+        except Exception as e:
+            logger.error(f"Error evaluating alert rules: {e}")
+
+    async def get_latest_state(self, computer_id: int) -> Optional[ComputerSchema]:
+        """
+        Computer details with its latest snapshot, served from the latest-state
+        cache and loaded from the database on a miss.
+
+        :return: None if the computer does not exist
+        """
+        state = latest_state.get(computer_id)
+        if state is not None:
+            return state
+
+        # Замер, сохраненный во время чтения, не должен быть затерт прочитанным состоянием
+        version = latest_state.version(computer_id)
+        computer = await self.get_computer(computer_id)
+        if computer is None:
+            return None
+        latest = await self.get_latest_system_info(computer_id)
+        state = ComputerSchema(
+            id=computer.id,
+            hostname=computer.hostname,
+            ip_address=computer.ip_address,
+            mac_address=computer.mac_address,
+            os_info=computer.os_info,
+            created_at=computer.created_at,
+            last_seen=computer.last_seen,
+            system_info=[SystemInfoSchema.model_validate(latest)] if latest else []
+        )
+        latest_state.put(state, version)
+        return state
+
+    async def get_latest_system_info(self, computer_id: int) -> Optional[SystemInfo]:
+        return await self.db.scalar(
+            select(SystemInfo)
+            .where(SystemInfo.computer_id == computer_id)
+            .order_by(SystemInfo.timestamp.desc())
+            .limit(1)
+        )
+
+    async def get_system_info_history_page(
+        self,
+        computer_id: int,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        skip: int = 0,
+        fields: Optional[Sequence[str]] = None
+    ) -> Tuple[List[Row], Optional[str]]:
+        """
+        Keyset-paginated history of a computer, newest first, ordered by
+        (timestamp, id).
+
+        ``skip`` is the deprecated offset pagination and is ignored when a
+        cursor is given.
+
+        :param fields: columns to select (must include ``id`` and ``timestamp``),
+            default all; the large JSON columns are only read when asked for
+        :return: rows of the page and the cursor of the next page, or None
+        """
+        query = select(*_columns(SystemInfo, fields)).where(SystemInfo.computer_id == computer_id)
+        if since is not None:
+            query = query.where(SystemInfo.timestamp >= since)
+        if until is not None:
+            query = query.where(SystemInfo.timestamp < until)
+        if cursor is not None:
+            timestamp, row_id = decode_timestamp_cursor(cursor)
+            # Условие timestamp <= :ts позволяет пройти по индексу (computer_id, timestamp)
+            query = query.where(
+                SystemInfo.timestamp <= timestamp,
+                or_(SystemInfo.timestamp < timestamp,
+                    and_(SystemInfo.timestamp == timestamp, SystemInfo.id < row_id))
+            )
+        query = query.order_by(SystemInfo.timestamp.desc(), SystemInfo.id.desc())
+        if cursor is None and skip:
+            query = query.offset(skip)
+
+        rows = (await self.db.execute(query.limit(limit + 1))).all()
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, encode_timestamp_cursor(rows[-1].timestamp, rows[-1].id)
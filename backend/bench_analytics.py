@@ -0,0 +1,83 @@
+"""
+Measure fleet analytics speed on synthetic data.
+
+Builds ``--hosts`` x ``--points`` samples (noisy sine waves with a few
+spikes) and times the vectorized computation behind ``/fleet/analytics``.
+With ``--url`` the endpoint of a running backend is timed end to end as well,
+which includes fetching the points from the database:
+
+    python bench_analytics.py --hosts 2000 --points 2000
+    python bench_analytics.py --url http://localhost:8000/api/v1/fleet --window 1h
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import requests
+
+from app.services.series_stats import ANOMALY_METHODS, ZSCORE, analyze_series, counter_rates
+
+
+def make_series(hosts: int, points: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    ids = np.repeat(np.arange(1, hosts + 1), points)
+    times = np.tile(np.arange(points, dtype=np.float64) * 15, hosts)
+    phases = np.repeat(rng.uniform(0, 2 * np.pi, hosts), points)
+    values = 50 + 20 * np.sin(times / 3600 + phases) + rng.normal(0, 5, hosts * points)
+    spikes = rng.random(hosts * points) < 0.001
+    values[spikes] += 60
+    return ids, times, values
+
+
+def timed(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=2000)
+    parser.add_argument("--points", type=int, default=2000)
+    parser.add_argument("--method", choices=ANOMALY_METHODS, default=ZSCORE)
+    parser.add_argument("--repeat", type=int, default=5, help="best of this many runs is reported")
+    parser.add_argument("--url", help="also time GET {url}/analytics of a running backend")
+    parser.add_argument("--metric", default="cpu_usage")
+    parser.add_argument("--window", default="1h")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    ids, times, values = make_series(args.hosts, args.points)
+    # Счетчик для проверки пересчета в скорость: накопленная сумма значений
+    counters = np.cumsum(np.abs(values))
+
+    result = {
+        "hosts": args.hosts,
+        "points": int(len(values)),
+        "method": args.method,
+        "analyze_s": timed(lambda: analyze_series(ids, times, values, method=args.method), args.repeat),
+        "counter_rates_s": timed(lambda: counter_rates(ids, times, counters), args.repeat),
+    }
+    result["points_per_s"] = result["points"] / result["analyze_s"]
+
+    if args.url:
+        params = {"metric": args.metric, "window": args.window, "method": args.method, "limit": 100}
+        response = requests.get(f"{args.url}/analytics", params=params)
+        response.raise_for_status()
+        result["endpoint_points"] = response.json()["points"]
+        result["endpoint_s"] = timed(lambda: requests.get(f"{args.url}/analytics", params=params), args.repeat)
+
+    for key, value in result.items():
+        print(f"{key:<16} {value:.3f}" if isinstance(value, float) else f"{key:<16} {value}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
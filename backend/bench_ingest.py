@@ -0,0 +1,112 @@
+"""
+Measure backend ingest throughput under many concurrent agents.
+
+Every simulated agent registers a computer and then posts snapshots to
+``/computers/{id}/system-info/`` back to back, like a real agent with a
+backlog, while optionally polling ``/system-info/latest``. The backend must
+already be running:
+
+    uvicorn app.main:app --workers 1
+    python bench_ingest.py --url http://localhost:8000/api/v1/system-info --agents 200 --duration 30
+"""
+import argparse
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def make_snapshot() -> dict:
+    return {
+        "cpu_usage": random.uniform(0, 100),
+        "memory_total": 16 * 1024 ** 3,
+        "memory_used": random.uniform(1, 15) * 1024 ** 3,
+        "disk_usage": {"/": {"total": 500 * 1024 ** 3, "used": 200 * 1024 ** 3, "free": 300 * 1024 ** 3, "percent": 40.0}},
+        "running_processes": [
+            {"pid": pid, "name": f"proc{pid}", "cpu_percent": random.uniform(0, 5), "memory_percent": 0.5}
+            for pid in range(10)
+        ],
+        "network_stats": {"bytes_sent": 1, "bytes_recv": 2, "packets_sent": 3, "packets_recv": 4},
+    }
+
+
+def run_agent(url: str, index: int, deadline: float, read_ratio: float, latencies: list, errors: list):
+    session = requests.Session()
+    started = time.monotonic()
+    try:
+        response = session.post(f"{url}/computers/", json={
+            "hostname": f"bench-agent-{index}",
+            "ip_address": "10.0.0.1",
+            "mac_address": "00:00:00:00:00:00",
+            "os_info": "bench",
+        })
+        response.raise_for_status()
+    except requests.exceptions.RequestException:
+        # Агент, не сумевший зарегистрироваться, тоже считается ошибкой
+        errors.append(time.monotonic() - started)
+        return
+    computer_id = response.json()["id"]
+
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            if random.random() < read_ratio:
+                response = session.get(f"{url}/computers/{computer_id}/system-info/latest")
+            else:
+                response = session.post(f"{url}/computers/{computer_id}/system-info/", json=make_snapshot())
+            ok = response.status_code < 500
+        except requests.exceptions.RequestException:
+            ok = False
+        elapsed = time.monotonic() - started
+        if ok:
+            latencies.append(elapsed)
+        else:
+            errors.append(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000/api/v1/system-info")
+    parser.add_argument("--agents", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--read-ratio", type=float, default=0.0,
+                        help="share of requests that read /latest instead of posting")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    latencies, errors = [], []
+    started = time.monotonic()
+    deadline = started + args.duration
+    with ThreadPoolExecutor(max_workers=args.agents) as pool:
+        futures = [
+            pool.submit(run_agent, args.url, index, deadline, args.read_ratio, latencies, errors)
+            for index in range(args.agents)
+        ]
+        for future in futures:
+            future.result()
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    count = len(latencies)
+    result = {
+        "agents": args.agents,
+        "duration_s": elapsed,
+        "requests": count,
+        "errors": len(errors),
+        "requests_per_s": count / elapsed,
+        "latency_ms_p50": latencies[count // 2] * 1000 if count else None,
+        "latency_ms_p95": latencies[int(count * 0.95)] * 1000 if count else None,
+        "latency_ms_p99": latencies[int(count * 0.99)] * 1000 if count else None,
+    }
+    for key, value in result.items():
+        print(f"{key:<16} {value:.2f}" if isinstance(value, float) else f"{key:<16} {value}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
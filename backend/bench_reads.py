@@ -0,0 +1,216 @@
+"""
+Measure read endpoint latency at growing system_info table sizes.
+
+The table is filled straight through the database up to every size in
+``--sizes`` (synthetic snapshots of ``--computers`` machines spread over the
+last day), and after each step every read endpoint is requested
+``--requests`` times from a running backend. Run from the backend directory
+against the database the backend uses:
+
+    uvicorn app.main:app --workers 1
+    python bench_reads.py --url http://localhost:8000/api/v1 --sizes 10000,100000,1000000 --json reads.json
+
+Results written with ``--json`` can be passed back as ``--baseline``.
+"""
+import argparse
+import json
+import platform
+import random
+import time
+from datetime import datetime, timedelta
+
+import requests
+from sqlalchemy import func, insert, select
+
+from app.db.base import engine, init_db
+from app.models.system_info import Computer, SystemInfo
+
+HOSTNAME_PREFIX = "bench-reads"
+PROCESS_NAMES = ("systemd", "sshd", "nginx", "postgres", "python3", "java", "node", "dockerd")
+
+
+def ensure_computers(count: int) -> list:
+    hostnames = [f"{HOSTNAME_PREFIX}-{index:05d}" for index in range(count)]
+    with engine.begin() as conn:
+        existing = dict(conn.execute(
+            select(Computer.hostname, Computer.id).where(Computer.hostname.in_(hostnames))
+        ).all())
+        missing = [hostname for hostname in hostnames if hostname not in existing]
+        if missing:
+            now = datetime.utcnow()
+            conn.execute(insert(Computer), [
+                {"hostname": hostname, "ip_address": "10.0.0.1", "mac_address": "02:00:00:00:00:00",
+                 "os_info": "Linux bench", "created_at": now, "last_seen": now}
+                for hostname in missing
+            ])
+            existing.update(conn.execute(
+                select(Computer.hostname, Computer.id).where(Computer.hostname.in_(missing))
+            ).all())
+    return [existing[hostname] for hostname in hostnames]
+
+
+def make_row(rng: random.Random, computer_id: int, timestamp: datetime) -> dict:
+    used = rng.uniform(10, 450)
+    sent, received = rng.randrange(10 ** 9), rng.randrange(10 ** 10)
+    return {
+        "computer_id": computer_id,
+        "timestamp": timestamp,
+        "cpu_usage": rng.uniform(0, 100),
+        "memory_total": 16.0,
+        "memory_used": rng.uniform(2, 15),
+        "disk_usage": {
+            "/": {"total": 500.0, "used": used, "percent": round(used / 5, 1)},
+            "/home": {"total": 1000.0, "used": used * 2, "percent": round(used / 5, 1)},
+        },
+        "running_processes": [
+            {"pid": pid, "name": rng.choice(PROCESS_NAMES), "cpu_percent": rng.uniform(0, 10),
+             "memory_percent": rng.uniform(0, 5), "memory_rss": rng.randrange(10 ** 6, 10 ** 9)}
+            for pid in range(1, 11)
+        ],
+        "network_stats": {
+            "bytes_sent": sent, "bytes_recv": received,
+            "packets_sent": sent // 800, "packets_recv": received // 1200,
+            "bytes_sent_per_sec": rng.uniform(0, 1e6), "bytes_recv_per_sec": rng.uniform(0, 1e7),
+            "packets_sent_per_sec": rng.uniform(0, 1e3), "packets_recv_per_sec": rng.uniform(0, 1e4),
+        },
+    }
+
+
+def table_size() -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(SystemInfo)).scalar()
+
+
+def seed(computer_ids: list, rows: int, rng: random.Random, chunk: int = 5000) -> float:
+    """Insert ``rows`` snapshots spread over the last day; returns rows per second."""
+    now = datetime.utcnow()
+    started = time.perf_counter()
+    for offset in range(0, rows, chunk):
+        batch = [
+            make_row(rng, rng.choice(computer_ids), now - timedelta(seconds=rng.uniform(0, 86400)))
+            for _ in range(min(chunk, rows - offset))
+        ]
+        with engine.begin() as conn:
+            conn.execute(insert(SystemInfo), batch)
+    return rows / (time.perf_counter() - started) if rows else 0.0
+
+
+def endpoints(url: str, computer_ids: list) -> dict:
+    """Name -> function returning the path of the next request."""
+    def computer():
+        return random.choice(computer_ids)
+
+    return {
+        "computers": lambda: f"{url}/system-info/computers/?limit=100",
+        "computer": lambda: f"{url}/system-info/computers/{computer()}",
+        "details": lambda: f"{url}/system-info/computers/{computer()}/details",
+        "latest": lambda: f"{url}/system-info/computers/{computer()}/system-info/latest",
+        "history": lambda: f"{url}/system-info/computers/{computer()}/system-info/history?limit=100",
+        "history_fields": lambda: f"{url}/system-info/computers/{computer()}/system-info/history"
+                                  "?limit=100&fields=cpu_usage,memory_used",
+        "series_raw": lambda: f"{url}/system-info/computers/{computer()}/system-info/series?resolution=raw",
+        "series": lambda: f"{url}/system-info/computers/{computer()}/system-info/series",
+        "fleet_overview": lambda: f"{url}/fleet/overview",
+        "fleet_analytics": lambda: f"{url}/fleet/analytics?window=1h&limit=100",
+    }
+
+
+def bench_endpoint(session: requests.Session, next_url, count: int) -> dict:
+    session.get(next_url())
+    timings, errors = [], 0
+    for _ in range(count):
+        started = time.perf_counter()
+        response = session.get(next_url())
+        elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            errors += 1
+        else:
+            timings.append(elapsed)
+    timings.sort()
+    if not timings:
+        return {"requests": 0, "errors": errors, "ms_mean": None, "ms_p50": None, "ms_p99": None}
+    return {
+        "requests": len(timings),
+        "errors": errors,
+        "ms_mean": sum(timings) / len(timings) * 1000,
+        "ms_p50": timings[len(timings) // 2] * 1000,
+        "ms_p99": timings[min(int(len(timings) * 0.99), len(timings) - 1)] * 1000,
+    }
+
+
+def print_level(level: dict, baseline: dict = None):
+    previous = {}
+    for base_level in (baseline or {}).get("levels", []):
+        if base_level["target_rows"] == level["target_rows"]:
+            previous = base_level["endpoints"]
+    print(f"\nsystem_info rows: {level['rows']}")
+    print(f"{'endpoint':<16} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}"
+          + (f" {'p50 vs base':>12}" if baseline else ""))
+    for name, stats in level["endpoints"].items():
+        if stats["ms_p50"] is None:
+            print(f"{name:<16} {'-':>9} {'-':>9} {'-':>9} {stats['errors']:>7}")
+            continue
+        line = f"{name:<16} {stats['ms_mean']:>9.1f} {stats['ms_p50']:>9.1f} {stats['ms_p99']:>9.1f} {stats['errors']:>7}"
+        base = previous.get(name, {}).get("ms_p50")
+        if baseline and base:
+            line += f" {(stats['ms_p50'] - base) / base * 100:>+11.0f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000/api/v1")
+    parser.add_argument("--sizes", default="10000,100000", help="comma separated system_info row counts")
+    parser.add_argument("--computers", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=50, help="requests per endpoint and size")
+    parser.add_argument("--endpoint", action="append", dest="only", help="bench only these endpoints")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", help="earlier --json result to compare with")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    init_db()
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+    computer_ids = ensure_computers(args.computers)
+    session = requests.Session()
+    requested = endpoints(args.url, computer_ids)
+    if args.only:
+        requested = {name: next_url for name, next_url in requested.items() if name in args.only}
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    levels = []
+    for target in sorted(int(size) for size in args.sizes.split(",")):
+        current = table_size()
+        # Таблица только растет: размеры меньше текущего пропускаются
+        inserted = max(target - current, 0)
+        seed_rows_per_s = seed(computer_ids, inserted, rng)
+        level = {
+            "target_rows": target,
+            "rows": current + inserted,
+            "inserted": inserted,
+            "seed_rows_per_s": seed_rows_per_s,
+            "endpoints": {name: bench_endpoint(session, next_url, args.requests)
+                          for name, next_url in requested.items()},
+        }
+        levels.append(level)
+        print_level(level, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "benchmark": "reads",
+                "started_at": datetime.utcnow().isoformat(),
+                "python": platform.python_version(),
+                "database": engine.dialect.name,
+                "params": {key: value for key, value in vars(args).items() if key not in ("json", "baseline")},
+                "levels": levels,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
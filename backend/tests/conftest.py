@@ -0,0 +1,62 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Тесты работают с временной базой SQLite; переменные окружения важнее .env
+_DB_DIR = tempfile.mkdtemp(prefix="system_info_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'system_info.db')}"
+os.environ.setdefault("JWT_SECRET_KEY", "test")
+# Фоновые агрегаты не должны писать в базу посреди теста
+os.environ["ROLLUP_INTERVAL_SECONDS"] = "3600"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.base import Base, async_engine, engine, init_db  # noqa: E402
+from app.services.alerts import alert_engine  # noqa: E402
+from app.services.latest_state import latest_state  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    init_db()
+    yield
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def clean_database(schema):
+    """Every test starts with empty tables and caches."""
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    latest_state.cache.clear()
+    latest_state._newest.clear()
+    alert_engine.stale = True
+    yield
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
+        # Соединения aiosqlite принадлежат циклу событий клиента
+        client.portal.call(async_engine.dispose)
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine on a fresh event loop, like a request of the application would."""
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await async_engine.dispose()
+        return asyncio.run(main())
+    return run
@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+
+from app.core.cache import InvalidationBus
+from app.db.base import AsyncSessionLocal, engine
+from app.models.alert import AlertRule
+from app.models.system_info import Computer
+from app.schemas.alert import AlertRuleCreate
+from app.services.alerts import FIRING, RESOLVED, AlertEngine, AlertService, alert_engine
+
+T0 = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def make_rule(rule_id=1, metric="cpu_usage", operator=">", threshold=80.0, duration_seconds=0,
+              aggregate="all", computer_id=None):
+    return AlertRule(id=rule_id, name=f"rule {rule_id}", metric=metric, operator=operator, threshold=threshold,
+                     duration_seconds=duration_seconds, aggregate=aggregate, computer_id=computer_id, enabled=True)
+
+
+def make_engine(*rules, firing=()):
+    engine = AlertEngine(InvalidationBus(), max_samples=720, min_interval=10.0, reload_interval=0)
+    engine.load(rules, firing)
+    return engine
+
+
+def feed(engine, computer_id, values, metric="cpu_usage", step=10):
+    """Observe one sample every ``step`` seconds; return the statuses per sample."""
+    return [
+        [transition.status for transition in engine.observe(computer_id, T0 + timedelta(seconds=i * step),
+                                                             {metric: value})]
+        for i, value in enumerate(values)
+    ]
+
+
+def test_fires_and_resolves_once():
+    engine = make_engine(make_rule())
+
+    assert feed(engine, 1, [50, 90, 95, 70, 60, 85]) == [[], [FIRING], [], [RESOLVED], [], [FIRING]]
+
+
+def test_firing_state_survives_reload():
+    engine = make_engine(make_rule(), firing=[(1, 1, "cpu_usage")])
+
+    # Событие уже открыто: повторного срабатывания нет, только закрытие
+    assert feed(engine, 1, [90, 50]) == [[], [RESOLVED]]
+
+
+def test_average_over_duration_window():
+    engine = make_engine(make_rule(duration_seconds=60, aggregate="avg"))
+
+    statuses = feed(engine, 1, [100] * 7 + [0, 0])
+
+    # Окно покрыто только с седьмого замера (60 секунд после первого)
+    assert statuses[:6] == [[]] * 6
+    assert statuses[6] == [FIRING]
+    # avg(100 x5, 0) = 83.3 - еще выше порога; avg(100 x4, 0, 0) = 66.7 - ниже
+    assert statuses[7:] == [[], [RESOLVED]]
+
+
+def test_all_aggregate_needs_every_sample_in_window():
+    values = [90, 90, 50, 90, 90, 90, 90]
+
+    # Провал до 50 держит правило, пока не выйдет из 30-секундного окна
+    assert feed(make_engine(make_rule(duration_seconds=30)), 1, values) == [[]] * 6 + [[FIRING]]
+    # Для max достаточно одного замера выше порога в покрытом окне
+    assert feed(make_engine(make_rule(duration_seconds=30, aggregate="max")), 1, values) == \
+        [[], [], [], [FIRING], [], [], []]
+
+
+def test_wildcard_disk_rule_watches_every_mount():
+    engine = make_engine(make_rule(metric="disk_percent:*", threshold=90))
+
+    transitions = engine.observe(1, T0, {"disk_percent:/": 95.0, "disk_percent:/home": 50.0, "cpu_usage": 99.0})
+    assert [(t.status, t.metric) for t in transitions] == [(FIRING, "disk_percent:/")]
+
+    transitions = engine.observe(1, T0 + timedelta(seconds=10), {"disk_percent:/": 40.0, "disk_percent:/home": 97.0})
+    assert sorted((t.status, t.metric) for t in transitions) == [
+        (FIRING, "disk_percent:/home"), (RESOLVED, "disk_percent:/")
+    ]
+
+
+def test_computer_rule_only_applies_to_its_computer():
+    engine = make_engine(make_rule(computer_id=2))
+
+    assert engine.observe(1, T0, {"cpu_usage": 99.0}) == []
+    assert [t.status for t in engine.observe(2, T0, {"cpu_usage": 99.0})] == [FIRING]
+
+
+def test_late_sample_does_not_move_window():
+    engine = make_engine(make_rule())
+
+    assert feed(engine, 1, [90]) == [[FIRING]]
+    # Замер старше уже учтенного (догрузка буфера агента) пропускается
+    assert engine.observe(1, T0 - timedelta(seconds=10), {"cpu_usage": 10.0}) == []
+
+
+def add_computer():
+    with engine.begin() as conn:
+        return conn.execute(insert(Computer).returning(Computer.id), {"hostname": "alert-host"}).scalar_one()
+
+
+def test_failed_write_reloads_engine(run, monkeypatch):
+    computer_id = add_computer()
+
+    async def fail(self, transitions):
+        raise OperationalError("INSERT INTO alert_events", {}, Exception("database is locked"))
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            await AlertService(db).create_rule(
+                AlertRuleCreate(name="cpu", metric="cpu_usage", operator=">", threshold=50)
+            )
+
+        monkeypatch.setattr(AlertService, "record", fail)
+        async with AsyncSessionLocal() as db:
+            with pytest.raises(OperationalError):
+                await AlertService(db).evaluate([(computer_id, T0, {"cpu_usage": 90.0})])
+        assert alert_engine.stale
+        monkeypatch.undo()
+
+        # Переход не записан, поэтому после перечитывания он происходит снова
+        async with AsyncSessionLocal() as db:
+            await AlertService(db).evaluate([(computer_id, T0 + timedelta(seconds=10), {"cpu_usage": 95.0})])
+            events, _ = await AlertService(db).get_events()
+        return events
+
+    events = run(scenario())
+    assert [(event.status, event.value) for event in events] == [(FIRING, 95.0)]
+
+
+def test_update_rejects_explicit_nulls(client):
+    rule = client.post("/api/v1/alerts/rules", json={
+        "name": "cpu", "metric": "cpu_usage", "operator": ">", "threshold": 90
+    }).json()
+    url = f"/api/v1/alerts/rules/{rule['id']}"
+
+    for field in ("name", "metric", "operator", "threshold", "duration_seconds", "aggregate", "enabled"):
+        assert client.patch(url, json={field: None}).status_code == 422
+
+    # null в computer_id означает правило для всех компьютеров
+    response = client.patch(url, json={"computer_id": None, "threshold": 80})
+    assert response.status_code == 200
+    assert response.json()["computer_id"] is None
+    assert response.json()["threshold"] == 80
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app.db.base import engine
+from app.models.system_info import Computer, SystemInfo
+
+OVERVIEW = "/api/v1/fleet/overview"
+
+
+def add_computer(hostname, minutes_ago, cpu_usage=None, memory=None, disks=None):
+    """A computer last seen ``minutes_ago``, with one snapshot unless every value is None."""
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        computer_id = conn.execute(insert(Computer).returning(Computer.id), {
+            "hostname": hostname, "last_seen": now - timedelta(minutes=minutes_ago)
+        }).scalar_one()
+        if cpu_usage is not None or memory is not None or disks is not None:
+            memory_total, memory_used = memory or (None, None)
+            conn.execute(insert(SystemInfo), {
+                "computer_id": computer_id, "timestamp": now - timedelta(minutes=minutes_ago),
+                "cpu_usage": cpu_usage, "memory_total": memory_total, "memory_used": memory_used,
+                "disk_usage": {mount: {"percent": percent} for mount, percent in (disks or {}).items()},
+                "running_processes": [], "network_stats": {}
+            })
+    return computer_id
+
+
+def hostnames(response):
+    assert response.status_code == 200
+    return [item["hostname"] for item in response.json()["items"]]
+
+
+def test_sort_limit_and_totals(client):
+    add_computer("a", 1, cpu_usage=10, memory=(100, 90))
+    add_computer("b", 1, cpu_usage=70, memory=(100, 20))
+    add_computer("c", 60, cpu_usage=40, memory=(0, 0))
+    add_computer("d", 60)
+
+    response = client.get(OVERVIEW, params={"sort": "cpu_usage", "order": "desc", "limit": 2})
+    assert hostnames(response) == ["b", "c"]
+    # Итоги считаются по всем компьютерам, а не по первой странице
+    assert response.json()["total"] == 4
+    assert response.json()["stale"] == 2
+
+    # Без значения - в конце при любом порядке
+    assert hostnames(client.get(OVERVIEW, params={"sort": "cpu_usage"})) == ["a", "c", "b", "d"]
+    assert hostnames(client.get(OVERVIEW, params={"sort": "memory_percent", "order": "desc"})) == ["a", "b", "c", "d"]
+    assert hostnames(client.get(OVERVIEW, params={"sort": "hostname", "order": "desc", "limit": 3})) == ["d", "c", "b"]
+
+
+def test_filters(client):
+    add_computer("web-1", 1, cpu_usage=95)
+    add_computer("web-2", 60, cpu_usage=50)
+    add_computer("db-1", 1, cpu_usage=80)
+    add_computer("db-2", 1)
+
+    response = client.get(OVERVIEW, params={"min_cpu": 60, "sort": "cpu_usage"})
+    assert hostnames(response) == ["db-1", "web-1"]
+    assert response.json()["total"] == 2
+
+    assert hostnames(client.get(OVERVIEW, params={"hostname": "WEB"})) == ["web-1", "web-2"]
+    assert hostnames(client.get(OVERVIEW, params={"stale": True})) == ["web-2"]
+    response = client.get(OVERVIEW, params={"stale": False, "limit": 1})
+    assert hostnames(response) == ["db-1"]
+    assert response.json()["total"] == 3
+    assert response.json()["stale"] == 0
+
+
+def test_disk_sort_in_python(client):
+    add_computer("a", 1, disks={"/": 40.0, "/data": 95.0})
+    add_computer("b", 1, disks={"/": 60.0})
+    add_computer("c", 1)
+
+    response = client.get(OVERVIEW, params={"sort": "disk_percent_max", "order": "desc", "limit": 2})
+    assert hostnames(response) == ["a", "b"]
+    assert [item["disk_percent_max"] for item in response.json()["items"]] == [95.0, 60.0]
+    assert response.json()["total"] == 3
+
+
+def test_empty_fleet(client):
+    response = client.get(OVERVIEW, params={"limit": 5})
+    assert response.json()["total"] == 0
+    assert response.json()["items"] == []
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.exc import OperationalError
+
+from app.core.metrics import registry
+from app.db.base import async_engine, engine
+from app.models.system_info import Computer, SystemInfo
+from app.schemas.system_info import SystemInfoBatchItem
+from app.services.ingest import IngestQueue
+from app.services.system_info import SystemInfoService
+
+LONG_AGO = datetime(2020, 1, 1)
+
+
+def add_computers(count):
+    with engine.begin() as conn:
+        return conn.execute(insert(Computer).returning(Computer.id), [
+            {"hostname": f"ingest-{i}", "last_seen": LONG_AGO} for i in range(count)
+        ]).scalars().all()
+
+
+def sample(computer_id, cpu_usage, processes=()):
+    return SystemInfoBatchItem(
+        computer_id=computer_id, timestamp=datetime.utcnow() - timedelta(seconds=100 - cpu_usage),
+        cpu_usage=cpu_usage, memory_total=100.0, memory_used=50.0,
+        disk_usage={}, running_processes=list(processes), network_stats={}
+    )
+
+
+def dropped_total():
+    return registry.get_sample_value("system_info_ingest_dropped_total") or 0.0
+
+
+def stored_cpu_usage():
+    with engine.connect() as conn:
+        return sorted(conn.execute(select(SystemInfo.cpu_usage)).scalars().all())
+
+
+async def drain(items, batch_size=100):
+    queue = IngestQueue(max_size=1000, batch_size=batch_size, flush_interval=0.01)
+    queue.start()
+    for item in items:
+        assert queue.submit(item)
+    await queue.close()
+
+
+def test_bad_sample_is_dropped_and_the_rest_stored(run):
+    computer_id = add_computers(1)[0]
+    items = [sample(computer_id, float(i)) for i in range(8)]
+    # Значение, которое нельзя записать в JSON-колонку: база отвергает всю пачку
+    items[5] = sample(computer_id, 5.0, processes=[{"started": datetime.utcnow()}])
+    dropped = dropped_total()
+
+    run(drain(items))
+
+    assert stored_cpu_usage() == [0.0, 1.0, 2.0, 3.0, 4.0, 6.0, 7.0]
+    assert dropped_total() == dropped + 1
+
+
+def test_transient_error_retries_the_same_batch(run, monkeypatch):
+    computer_id = add_computers(1)[0]
+    items = [sample(computer_id, float(i)) for i in range(4)]
+    batches = []
+    original = SystemInfoService.create_system_info_batch
+
+    async def flaky(self, batch):
+        batches.append(list(batch))
+        if len(batches) == 1:
+            raise OperationalError("INSERT INTO system_info", {}, Exception("database is locked"))
+        return await original(self, batch)
+
+    monkeypatch.setattr(SystemInfoService, "create_system_info_batch", flaky)
+    run(drain(items))
+
+    assert batches == [items, items]
+    assert stored_cpu_usage() == [0.0, 1.0, 2.0, 3.0]
+
+
+def test_last_seen_is_updated_once_per_batch(run):
+    computer_ids = add_computers(3)
+    items = [sample(computer_ids[i % 2], float(i)) for i in range(10)]
+    updates = []
+
+    def count_updates(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("UPDATE COMPUTERS"):
+            updates.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_updates)
+    try:
+        run(drain(items, batch_size=10))
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count_updates)
+
+    assert len(updates) == 1
+    with engine.connect() as conn:
+        last_seen = dict(conn.execute(select(Computer.id, Computer.last_seen)).all())
+        assert conn.execute(select(func.count()).select_from(SystemInfo)).scalar() == 10
+    assert last_seen[computer_ids[0]] > LONG_AGO
+    assert last_seen[computer_ids[1]] > LONG_AGO
+    # Компьютер без замеров в пачке не трогается
+    assert last_seen[computer_ids[2]] == LONG_AGO
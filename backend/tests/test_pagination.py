@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app.db.base import engine
+from app.models.system_info import Computer, SystemInfo
+from app.services.pagination import encode_timestamp_cursor
+
+API = "/api/v1/system-info"
+# Внутри срока хранения, иначе замеры удалит обслуживание при запуске
+START = datetime.utcnow().replace(microsecond=0) - timedelta(days=1)
+
+
+def add_computers(count, last_seen=START):
+    with engine.begin() as conn:
+        return conn.execute(insert(Computer).returning(Computer.id), [{
+            "hostname": f"host-{i}", "ip_address": "10.0.0.1", "mac_address": "00:00:00:00:00:00",
+            "os_info": "Linux", "created_at": last_seen, "last_seen": last_seen + timedelta(minutes=i)
+        } for i in range(count)]).scalars().all()
+
+
+def add_samples(computer_id, timestamps):
+    with engine.begin() as conn:
+        return conn.execute(insert(SystemInfo).returning(SystemInfo.id), [{
+            "computer_id": computer_id, "timestamp": timestamp, "cpu_usage": 1.0,
+            "memory_total": 100.0, "memory_used": 50.0, "disk_usage": {},
+            "running_processes": [], "network_stats": {}
+        } for timestamp in timestamps]).scalars().all()
+
+
+def walk(client, url, params):
+    """Follow X-Next-Cursor to the end; return the ids of every page."""
+    pages = []
+    cursor = None
+    while True:
+        response = client.get(url, params=dict(params, **({"cursor": cursor} if cursor else {})))
+        assert response.status_code == 200
+        pages.append([row["id"] for row in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+
+
+def test_history_pages_with_equal_timestamps(client):
+    computer_id = add_computers(1)[0]
+    # Несколько замеров с одним временем оказываются на границе страниц
+    timestamps = [START + timedelta(seconds=i // 4) for i in range(23)]
+    ids = add_samples(computer_id, timestamps)
+
+    pages = walk(client, f"{API}/computers/{computer_id}/system-info/history", {"limit": 5, "fields": "id"})
+
+    assert [len(page) for page in pages] == [5, 5, 5, 5, 3]
+    seen = [row_id for page in pages for row_id in page]
+    assert len(seen) == len(set(seen))
+    # Новые первыми: по убыванию (timestamp, id)
+    expected = sorted(zip(timestamps, ids), reverse=True)
+    assert seen == [row_id for _, row_id in expected]
+
+
+def test_history_since_until(client):
+    computer_id = add_computers(1)[0]
+    timestamps = [START + timedelta(minutes=i) for i in range(10)]
+    ids = add_samples(computer_id, timestamps)
+
+    pages = walk(client, f"{API}/computers/{computer_id}/system-info/history", {
+        "limit": 2,
+        "since": (START + timedelta(minutes=3)).isoformat(),
+        "until": (START + timedelta(minutes=8)).isoformat(),
+    })
+
+    # since включается, until - нет
+    assert [row_id for page in pages for row_id in page] == ids[3:8][::-1]
+
+
+def test_history_last_page_has_no_cursor(client):
+    computer_id = add_computers(1)[0]
+    add_samples(computer_id, [START + timedelta(minutes=i) for i in range(4)])
+
+    response = client.get(f"{API}/computers/{computer_id}/system-info/history", params={"limit": 4})
+    assert len(response.json()) == 4
+    assert "X-Next-Cursor" not in response.headers
+
+    response = client.get(f"{API}/computers/{computer_id}/system-info/history", params={"limit": 3})
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get(f"{API}/computers/{computer_id}/system-info/history",
+                          params={"limit": 3, "cursor": cursor})
+    assert len(response.json()) == 1
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_computers_pages(client):
+    ids = add_computers(7)
+
+    pages = walk(client, f"{API}/computers/", {"limit": 3})
+
+    assert pages == [ids[0:3], ids[3:6], ids[6:7]]
+
+
+def test_computers_since_until(client):
+    ids = add_computers(6)
+
+    pages = walk(client, f"{API}/computers/", {
+        "limit": 2,
+        "since": (START + timedelta(minutes=1)).isoformat(),
+        "until": (START + timedelta(minutes=4)).isoformat(),
+    })
+
+    assert [row_id for page in pages for row_id in page] == ids[1:4]
+
+
+def test_malformed_cursor(client):
+    computer_id = add_computers(1)[0]
+    history = f"{API}/computers/{computer_id}/system-info/history"
+
+    for cursor in ("not base64 at all!", "bm90LWEtY3Vyc29y", encode_timestamp_cursor(START, 1)[:-3]):
+        assert client.get(history, params={"cursor": cursor}).status_code == 400
+    assert client.get(f"{API}/computers/", params={"cursor": "eA"}).status_code == 400
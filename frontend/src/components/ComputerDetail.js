@@ -38,6 +38,9 @@ ChartJS.register(
     Legend
 );
 
+// Сколько последних замеров показывать на графиках
+const HISTORY_LENGTH = 100;
+
 const ComputerDetail = () => {
     const { id } = useParams();
     const [computer, setComputer] = useState(null);
@@ -56,7 +59,7 @@ const ComputerDetail = () => {
 
                 setComputer(computerData);
                 setSystemInfo(latestInfo);
-                setSystemInfoHistory(historyData);
+                setSystemInfoHistory(historyData.items);
             } catch (error) {
                 console.error('Error fetching computer details:', error);
             } finally {
@@ -67,6 +70,15 @@ const ComputerDetail = () => {
         fetchData();
     }, [id]);
 
+    // Новые замеры приходят с сервера, опрашивать API не нужно
+    useEffect(() => {
+        const unsubscribe = api.subscribeToSystemInfo(id, (info) => {
+            setSystemInfo(info);
+            setSystemInfoHistory((history) => [info, ...history].slice(0, HISTORY_LENGTH));
+        });
+        return unsubscribe;
+    }, [id]);
+
     if (loading) {
         return (
             <Box display="flex" justifyContent="center" alignItems="center" minHeight="200px">
@@ -20,8 +20,8 @@ const ComputerList = () => {
     useEffect(() => {
         const fetchComputers = async () => {
             try {
-                const data = await api.getComputers();
-                setComputers(data);
+                const data = await api.getFleetOverview();
+                setComputers(data.items);
             } catch (error) {
                 console.error('Error fetching computers:', error);
             } finally {
@@ -74,7 +74,22 @@ const ComputerList = () => {
                                 <Typography variant="body2" color="text.secondary">
                                     OS: {computer.os_info}
                                 </Typography>
-                                <Box display="flex" justifyContent="flex-end" mt={2}>
+                                {computer.cpu_usage !== null && (
+                                    <Box display="flex" alignItems="center" mt={1}>
+                                        <Memory sx={{ mr: 1, fontSize: 18, color: 'text.secondary' }} />
+                                        <Typography variant="body2" color="text.secondary">
+                                            CPU: {computer.cpu_usage.toFixed(1)}%
+                                            {computer.memory_percent !== null && ` · RAM: ${computer.memory_percent.toFixed(1)}%`}
+                                            {computer.disk_percent_max !== null && ` · Диск: ${computer.disk_percent_max.toFixed(0)}%`}
+                                        </Typography>
+                                    </Box>
+                                )}
+                                <Box display="flex" justifyContent="space-between" mt={2}>
+                                    {computer.stale ? (
+                                        <Chip label="Нет данных" color="warning" size="small" />
+                                    ) : (
+                                        <span />
+                                    )}
                                     <Chip 
                                         label="Подробнее" 
                                         color="primary" 
@@ -1,6 +1,7 @@
 import axios from 'axios';
 
 const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000/api/v1/system-info';
+const FLEET_API_URL = API_URL.replace(/\/system-info\/?$/, '/fleet');
 
 const api = {
     // Получение списка компьютеров
@@ -9,6 +10,13 @@ const api = {
         return response.data;
     },
 
+    // Сводка по всем компьютерам с последним замером одним запросом.
+    // params: sort, order, limit, stale, stale_after, hostname, min_cpu
+    getFleetOverview: async (params = {}) => {
+        const response = await axios.get(`${FLEET_API_URL}/overview`, { params });
+        return response.data;
+    },
+
     // Получение информации о конкретном компьютере
     getComputer: async (computerId) => {
         const response = await axios.get(`${API_URL}/computers/${computerId}/details`);
@@ -22,13 +30,34 @@ const api = {
         return response.data.system_info ? response.data.system_info[0] : null;
     },
 
-    // Получение истории системной информации
-    getSystemInfoHistory: async (computerId, skip = 0, limit = 100) => {
+    // Получение истории системной информации (постранично, от новых к старым).
+    // nextCursor передаётся в следующий вызов; null - страниц больше нет
+    getSystemInfoHistory: async (computerId, { cursor, since, until, limit = 100 } = {}) => {
         const response = await axios.get(
             `${API_URL}/computers/${computerId}/system-info/history`,
-            { params: { skip, limit } }
+            { params: { cursor, since, until, limit } }
         );
-        return response.data;
+        return {
+            items: response.data,
+            nextCursor: response.headers['x-next-cursor'] || null
+        };
+    },
+
+    // Подписка на новые замеры одного компьютера (или всех, если computerId не задан).
+    // Возвращает функцию отписки; EventSource сам переподключается при обрыве
+    subscribeToSystemInfo: (computerId, onSystemInfo, onError) => {
+        const url = new URL(`${API_URL}/stream`);
+        if (computerId !== undefined && computerId !== null) {
+            url.searchParams.set('computer_id', computerId);
+        }
+        const source = new EventSource(url.toString());
+        source.addEventListener('system_info', (event) => {
+            onSystemInfo(JSON.parse(event.data));
+        });
+        if (onError) {
+            source.onerror = onError;
+        }
+        return () => source.close();
     }
 };
 